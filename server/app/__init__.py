@@ -1,18 +1,111 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS
 
 def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=True)
-    CORS(app)
-    
+    # Let browser clients read the ETag to revalidate POSTed requests
+    CORS(app, expose_headers=['ETag'])
+
+    app.config.from_mapping(
+        # Path to the RFID log: CSV, columnar *.store directory or indexed *.sqlite database (see log_sources.open_log_source)
+        RFID_LOG_PATH=os.environ.get('RFID_LOG_PATH'),
+        # Log format when no path is given (server/RFID_logs.<suffix>, GYM_DATA_DIR/<gym_id>.<suffix>): csv, store or sqlite
+        RFID_LOG_BACKEND=os.environ.get('RFID_LOG_BACKEND', 'csv'),
+        # Directory of per-site logs (<gym_id>.csv, .store or .sqlite per RFID_LOG_BACKEND) for multi-gym deployments (unset = single site)
+        GYM_DATA_DIR=os.environ.get('GYM_DATA_DIR'),
+        # Comma-separated sites this process serves (unset = every site in GYM_DATA_DIR)
+        GYM_IDS=os.environ.get('GYM_IDS'),
+        # Site used when a request doesn't name one (unset = the only served site, or 'default')
+        DEFAULT_GYM_ID=os.environ.get('DEFAULT_GYM_ID'),
+        # Directory of the memory-mapped log snapshot shared by all worker processes (unset = per-process copy)
+        SHARED_SNAPSHOT_DIR=os.environ.get('SHARED_SNAPSHOT_DIR'),
+        # Seconds between checks for log changes to publish to the shared snapshot
+        SHARED_SNAPSHOT_INTERVAL=float(os.environ.get('SHARED_SNAPSHOT_INTERVAL', 1.0)),
+        # Seconds to gather concurrent swipes into one append
+        SWIPE_COMMIT_INTERVAL=float(os.environ.get('SWIPE_COMMIT_INTERVAL', 0.05)),
+        # Max seconds between fsyncs of the log (0 = fsync every commit)
+        SWIPE_FSYNC_INTERVAL=float(os.environ.get('SWIPE_FSYNC_INTERVAL', 1.0)),
+        # Max cached score results and their max age in seconds (0 = no TTL)
+        SCORE_CACHE_SIZE=int(os.environ.get('SCORE_CACHE_SIZE', 4096)),
+        SCORE_CACHE_TTL=float(os.environ.get('SCORE_CACHE_TTL', 3600)),
+        # Background processes used for model training jobs
+        TRAINING_WORKERS=int(os.environ.get('TRAINING_WORKERS', 1)),
+        # Memory budget in MB for streaming (chunked) training; 0 = load the whole log and fit in memory
+        TRAINING_MEMORY_MB=float(os.environ.get('TRAINING_MEMORY_MB', 0)),
+        # Add a Server-Timing header with per-stage durations to gym API responses
+        SERVER_TIMING=os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes'),
+        # Seconds between checks of streamed scores for changes made outside this process
+        SCORE_STREAM_INTERVAL=float(os.environ.get('SCORE_STREAM_INTERVAL', 1.0)),
+        # Seconds of silence after which a score stream sends a keepalive comment
+        SCORE_STREAM_KEEPALIVE=float(os.environ.get('SCORE_STREAM_KEEPALIVE', 15.0)),
+        # Max open score streams per process
+        SCORE_STREAM_MAX_SUBSCRIBERS=int(os.environ.get('SCORE_STREAM_MAX_SUBSCRIBERS', 10000)),
+        # Swipes this many seconds or less after the previous one are repeat taps of the same card
+        SESSION_DEBOUNCE_SECONDS=int(os.environ.get('SESSION_DEBOUNCE_SECONDS', 60)),
+        # A gap longer than this many seconds between swipes starts a new gym session
+        SESSION_MAX_GAP_SECONDS=int(os.environ.get('SESSION_MAX_GAP_SECONDS', 4 * 3600)),
+        # Days of raw swipes to keep; older days are compacted into daily summaries (0 = keep all).
+        # Only for SQLite logs (RFID_LOG_BACKEND=sqlite or *.sqlite paths) without SHARED_SNAPSHOT_DIR; startup fails otherwise
+        RETENTION_DAYS=int(os.environ.get('RETENTION_DAYS', 0)),
+        # Seconds between compaction runs when RETENTION_DAYS is set
+        COMPACTION_INTERVAL=float(os.environ.get('COMPACTION_INTERVAL', 3600.0)),
+        # Gzip gym API responses of at least this many bytes for clients that accept it (0 = never)
+        GZIP_MIN_SIZE=int(os.environ.get('GZIP_MIN_SIZE', 1024)),
+    )
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+
+    # Sites (gyms) served by this process, each with its own logs and models
+    from app.utils.sites import init_sites
+    init_sites(app)
+
+    # How swipes are grouped into sessions for the session features
+    from app.utils.features import SessionWindow, set_session_window
+    set_session_window(SessionWindow(app.config['SESSION_DEBOUNCE_SECONDS'], app.config['SESSION_MAX_GAP_SECONDS']))
+
+    # Fold swipes older than RETENTION_DAYS into daily summaries in the background
+    # (a retention the logs can't support fails startup here, before the stores load)
+    from app.utils.compaction import init_compaction
+    init_compaction(app)
+
+    # Load the RFID logs once so requests don't re-read the CSV
+    from app.utils.log_store import init_log_store
+    init_log_store(app)
+
+    # Score results cached per (site, UID, data version, model version, date)
+    from app.utils.score_cache import init_score_cache
+    init_score_cache(app)
+
+    # Group-commit writer for swipes posted to the API
+    from app.utils.swipe_writer import init_swipe_writer
+    init_swipe_writer(app)
+
+    # Model training runs in a background process pool
+    from app.utils.training_jobs import init_training_jobs
+    init_training_jobs(app)
+
+    # orjson-backed JSON responses when it is installed
+    from app.utils.responses import init_responses
+    init_responses(app)
+
+    # Live score pushes to clients subscribed over /score-stream
+    from app.utils.score_feed import init_score_feeds
+    init_score_feeds(app)
+
+    # Prometheus metrics on /metrics
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+
     # Import routes after app creation to avoid circular imports
     from app.routes.gym_routes import gymBP
-    
+
     # Register blueprint with proper prefix
     app.register_blueprint(gymBP, url_prefix='/gym/v1')
-    
+
     @app.route('/')
     def home():
         return {"message": "Gym Consistency API is running"}
-    
+
     return app
@@ -1,23 +1,84 @@
-from flask import Blueprint, request, jsonify, make_response
-import pandas as pd
-import os
-from app.utils.gym_utils import calculate_consistency_score, train_models_from_data
+import datetime
+
+from flask import Blueprint, Response, current_app, request, jsonify, make_response, stream_with_context, url_for
+from app.utils.features import DAY_NAMES, day_number
+from app.utils.gym_utils import calculate_consistency_score, calculate_consistency_scores, calculate_score_history, score_version
+from app.utils.leaderboard import get_leaderboard
+from app.utils.log_store import get_log_store
+from app.utils.metrics import record_request, start_request_timer
+from app.utils.occupancy import PERIODS, period_label
+from app.utils.model_registry import get_model_registry
+from app.utils.responses import compress_response, make_etag, not_modified, with_etag
+from app.utils.score_cache import get_score_cache
+from app.utils.score_feed import KEEPALIVE_EVENT, SubscriberLimitError, get_score_feed
+from app.utils.sites import UnknownGymError, get_site, get_sites
+from app.utils.swipe_writer import get_swipe_writer, make_swipe_row
+from app.utils.training_jobs import get_training_jobs
 
 # Create the blueprint with proper configuration
 gymBP = Blueprint('gym', __name__)
 
-@gymBP.route('/score', methods=['POST', 'OPTIONS'])
+# Most points a single score-history request may ask for
+MAX_HISTORY_POINTS = 1000
+
+# Most members a single leaderboard page may list
+MAX_LEADERBOARD_LIMIT = 1000
+
+class InvalidRequestError(ValueError):
+    """
+    Raised for a request body or parameter of the wrong type (answered with a 400).
+    """
+
+def _gym_id(data=None):
+    """
+    Read the site a request is for from ?gym_id= or the JSON body.
+    
+    Every endpoint takes an optional gym_id; without one the default site is used.
+    
+    Raises:
+        InvalidRequestError: If the body isn't a JSON object or gym_id isn't a string
+        UnknownGymError: If this worker doesn't serve the site (answered with a 404)
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise InvalidRequestError("Request body must be a JSON object")
+    gym_id = request.args.get('gym_id') or data.get('gym_id')
+    if gym_id is not None and not isinstance(gym_id, str):
+        raise InvalidRequestError("gym_id must be a string")
+    return get_site(gym_id or None).gym_id
+
+@gymBP.errorhandler(InvalidRequestError)
+def handle_invalid_request(error):
+    return jsonify({"error": str(error)}), 400
+
+@gymBP.errorhandler(UnknownGymError)
+def handle_unknown_gym(error):
+    return jsonify({"error": str(error)}), 404
+
+# Request timing for every gym endpoint (exported on /metrics)
+gymBP.before_request(start_request_timer)
+gymBP.after_request(record_request)
+# Registered last so it runs first, and the request timing includes compression
+gymBP.after_request(compress_response)
+
+@gymBP.route('/score', methods=['GET', 'POST', 'OPTIONS'])
 def get_consistency_score():
     """
     Calculate ML-enhanced consistency score for a gym user based on their RFID logs.
     
-    Request body:
+    Request body (or the same fields as query parameters on GET):
     {
-        "uid": "AA6A06B0"  # RFID UID of the user
+        "uid": "AA6A06B0",  # RFID UID of the user
+        "as_of": "2025-03-01",  # Optional: score as of the end of this day
+        "gym_id": "downtown"  # Optional: site of the user (defaults to the default site)
     }
     
     Returns:
-        JSON response with consistency score, user classification, and insights
+        JSON response with consistency score, user classification, and insights.
+        Scores carry an ETag derived from the user's data version and the model
+        version; a request with a matching If-None-Match gets a 304 without the
+        score being computed.
     """
     # Handle OPTIONS request (preflight)
     if request.method == 'OPTIONS':
@@ -27,18 +88,249 @@ def get_consistency_score():
         response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
         return response
         
-    # Handle POST request
-    data = request.get_json()
+    # Handle GET/POST request
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
     uid = data.get('uid', '')
     
+    if not uid or not isinstance(uid, str):
+        return jsonify({"error": "UID is required"}), 400
+    
+    as_of = data.get('as_of')
+    if as_of:
+        try:
+            as_of = datetime.date.fromisoformat(as_of)
+        except (TypeError, ValueError):
+            return jsonify({"error": "as_of must be a YYYY-MM-DD date"}), 400
+    gym_id = _gym_id(data)
+    
+    # Everything the score depends on; unchanged since the client's copy means no recompute
+    etag = make_etag('score', *score_version(uid, as_of or None, gym_id))
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    
+    result = calculate_consistency_score(uid, as_of or None, gym_id)
+    if "error" in result:
+        # Don't let clients hold on to a failure
+        return jsonify(result)
+    return with_etag(jsonify(result), etag)
+
+@gymBP.route('/score-history', methods=['GET', 'OPTIONS'])
+def get_score_history():
+    """
+    A user's consistency score over time, e.g. week by week for a progress chart.
+    
+    Query parameters:
+        uid: RFID UID of the user
+        start, end: Optional YYYY-MM-DD range (defaults to the year up to today)
+        step: Days between points (default 7)
+        gym_id: Optional site of the user
+    
+    Returns:
+        JSON response with one score payload (plus its date) per point, oldest first
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    uid = request.args.get('uid', '')
     if not uid:
         return jsonify({"error": "UID is required"}), 400
+    gym_id = _gym_id()
+    
+    try:
+        today = datetime.date.today()
+        step = int(request.args.get('step', 7))
+        if step < 1:
+            raise ValueError("step must be at least 1 day")
+        end = datetime.date.fromisoformat(request.args['end']) if request.args.get('end') else today
+        start = datetime.date.fromisoformat(request.args['start']) if request.args.get('start') else end - datetime.timedelta(days=364)
+        if start > end:
+            raise ValueError("start must not be after end")
+        if (end - start).days // step + 1 > MAX_HISTORY_POINTS:
+            raise ValueError(f"Score history is limited to {MAX_HISTORY_POINTS} points")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    result = calculate_consistency_score(uid)
+    result = calculate_score_history(uid, start, end, step, gym_id)
     return jsonify(result)
 
+@gymBP.route('/leaderboard', methods=['GET', 'OPTIONS'])
+def get_leaderboard_page():
+    """
+    Gym-wide consistency leaderboard, best scores first.
+    
+    Query parameters:
+        limit: Members to list (default 10)
+        offset: Members to skip, for paging (default 0)
+        gym_id: Optional site
+    
+    Returns:
+        JSON response with {"rank", "uid", "score"} per member (members on the same
+        score share a rank and are listed by UID), the member count and the scoring date
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    gym_id = _gym_id()
+    try:
+        limit = int(request.args.get('limit', 10))
+        offset = int(request.args.get('offset', 0))
+        if not 1 <= limit <= MAX_LEADERBOARD_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LEADERBOARD_LIMIT}")
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(get_leaderboard(gym_id).top(limit, offset))
+
+@gymBP.route('/rank', methods=['GET', 'OPTIONS'])
+def get_member_rank():
+    """
+    A member's standing among all members of the gym, e.g. "top 12% of members".
+    
+    Query parameters:
+        uid: RFID UID of the user
+        gym_id: Optional site of the user
+    
+    Returns:
+        JSON response with the member's score, rank, the member count, top_percent
+        (share of members ranked at or above them) and percentile (share scoring lower)
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    uid = request.args.get('uid', '')
+    if not uid:
+        return jsonify({"error": "UID is required"}), 400
+    
+    return jsonify(get_leaderboard(_gym_id()).rank(uid))
+
+@gymBP.route('/score-stream', methods=['GET', 'OPTIONS'])
+def stream_score():
+    """
+    Live consistency score of a user as Server-Sent Events.
+    
+    Query parameters:
+        uid: RFID UID of the user
+        gym_id: Optional site of the user
+    
+    Returns:
+        text/event-stream with a "score" event (the /score payload) right away and
+        again whenever the score changes (a swipe, a retrain, the day rolling
+        over). Each event's id is the /score ETag; a reconnecting EventSource
+        sends it back as Last-Event-ID and isn't resent a score it already has.
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,Last-Event-ID')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    uid = request.args.get('uid', '')
+    if not uid:
+        return jsonify({"error": "UID is required"}), 400
+    feed = get_score_feed(_gym_id())
+    
+    try:
+        channel = feed.subscribe(uid)
+    except SubscriberLimitError as e:
+        return jsonify({"error": str(e)}), 503
+    
+    keepalive = current_app.config['SCORE_STREAM_KEEPALIVE']
+    last_event_id = request.headers.get('Last-Event-ID')
+    
+    def events():
+        seq = 0
+        while True:
+            seq, etag, event = channel.wait(seq, keepalive)
+            if event is None:
+                yield KEEPALIVE_EVENT
+            elif etag != last_event_id:
+                yield event
+    
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Runs when the client disconnects, even if the stream never started
+    response.call_on_close(lambda: feed.unsubscribe(channel))
+    return response
+
+@gymBP.route('/scores', methods=['POST', 'OPTIONS'])
+def get_consistency_scores():
+    """
+    Calculate consistency scores for many gym users in one call.
+    
+    Request body:
+    {
+        "uids": ["AA6A06B0", "23FF6AAD"],  # RFID UIDs, or "all" for every user
+        "gym_id": "downtown"  # Optional: site of the users
+    }
+    
+    Returns:
+        JSON response with one score payload per UID. Clients sending
+        "Accept: application/x-ndjson" get the payloads streamed one per line,
+        which is recommended for large batches.
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,Accept')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+        
+    # Handle POST request
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    uids = data.get('uids')
+    gym_id = _gym_id(data)
+    
+    if uids == 'all':
+        uids = None
+    elif not isinstance(uids, list) or not uids or not all(isinstance(uid, str) for uid in uids):
+        return jsonify({"error": "uids must be a non-empty list of RFID UIDs or \"all\""}), 400
+    
+    results = ({"uid": uid, **result} for uid, result in calculate_consistency_scores(uids, gym_id))
+    
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        dumps = current_app.json.dumps
+        lines = (dumps(result) + '\n' for result in results)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+    
+    return jsonify({"scores": list(results)})
+
 @gymBP.route('/available-rfids', methods=['GET', 'OPTIONS'])
 def get_available_rfids():
+    """
+    List every UID in the logs with its record count.
+    
+    Returns:
+        JSON response with one {"uid", "records"} entry per UID, ordered by UID.
+        Carries an ETag derived from the dataset version, so polling clients get a
+        304 until a swipe is recorded or the logs are reloaded.
+    """
     # Handle OPTIONS request (preflight)
     if request.method == 'OPTIONS':
         response = make_response()
@@ -47,45 +339,301 @@ def get_available_rfids():
         response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
         return response
         
+    gym_id = _gym_id()
     try:
-        # Use absolute path to the CSV file
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        csv_path = os.path.join(base_dir, 'RFID_logs.csv')
-        
-        # Check if file exists
-        if not os.path.exists(csv_path):
-            csv_path = os.path.join(os.getcwd(), 'RFID_logs.csv')
-        
-        # Load RFID logs
-        df = pd.read_csv(csv_path)
+        store = get_log_store(gym_id)
+        etag = make_etag('rfids', gym_id, store.dataset_version())
+        response = not_modified(etag)
+        if response is not None:
+            return response
         
-        # Get unique UIDs
-        uids = df['UID'].unique().tolist()
-        
-        # Count occurrences of each UID
-        uid_counts = df['UID'].value_counts().to_dict()
+        # Per-UID counts come straight from the store's UID intern table and offsets,
+        # already ordered by UID
+        uid_counts = store.uid_counts()
         
         # Format response
         result = [
-            {"uid": uid, "records": uid_counts.get(uid, 0)} 
-            for uid in sorted(uids)
+            {"uid": uid, "records": records} 
+            for uid, records in uid_counts.items()
         ]
         
-        return jsonify({"rfids": result})
+        return with_etag(jsonify({"rfids": result}), etag)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _date_range(span, default_days, max_days=None):
+    """
+    Read optional ?start=YYYY-MM-DD&end=YYYY-MM-DD query parameters as day numbers.
+    
+    Defaults to the last default_days days that have data, or to everything from
+    the first day with data if default_days is None.
+    
+    Raises:
+        ValueError: On malformed dates, an inverted range, or one longer than max_days
+    """
+    end = request.args.get('end')
+    start = request.args.get('start')
+    end_day = day_number(datetime.date.fromisoformat(end)) if end else span[1]
+    if start:
+        start_day = day_number(datetime.date.fromisoformat(start))
+    else:
+        start_day = span[0] if default_days is None else end_day - default_days + 1
+    
+    if start_day > end_day:
+        raise ValueError("start must not be after end")
+    if max_days is not None and end_day - start_day + 1 > max_days:
+        raise ValueError(f"Date range is limited to {max_days} days")
+    return start_day, end_day
+
+@gymBP.route('/occupancy/hourly', methods=['GET', 'OPTIONS'])
+def get_hourly_occupancy():
+    """
+    Gym occupancy per (date, hour): distinct members who swiped in during each hour.
+    
+    Query parameters:
+        start, end: Date range (YYYY-MM-DD, inclusive); defaults to the last 7 days with data
+    
+    Returns:
+        JSON response with 24 hourly counts per date
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    occupancy = get_log_store(_gym_id()).get_occupancy()
+    span = occupancy.span()
+    if span is None:
+        return jsonify({"days": []})
+    
+    try:
+        start_day, end_day = _date_range(span, default_days=7, max_days=366)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    days = [
+        {"date": period_label('day', day), "hours": hours, "total": sum(hours)}
+        for day, hours in occupancy.date_hourly(start_day, end_day)
+    ]
+    return jsonify({"start": period_label('day', start_day), "end": period_label('day', end_day), "days": days})
+
+@gymBP.route('/occupancy/weekday-hourly', methods=['GET', 'OPTIONS'])
+def get_weekday_hourly_occupancy():
+    """
+    Gym load heatmap per (weekday, hour).
+    
+    Query parameters:
+        start, end: Optional date range (YYYY-MM-DD, inclusive); all-time by default
+    
+    Returns:
+        JSON response with total visit-hours and the average per occurrence of each
+        weekday, 24 values per weekday
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    occupancy = get_log_store(_gym_id()).get_occupancy()
+    start_day = end_day = None
+    if request.args.get('start') or request.args.get('end'):
+        try:
+            start_day, end_day = _date_range(occupancy.span() or (0, 0), default_days=None)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    totals, weekday_counts = occupancy.weekday_hours(start_day, end_day)
+    weekdays = {
+        day_name: {
+            "days": count,
+            "total": hours,
+            "average": [round(value / count, 2) if count else 0 for value in hours],
+        }
+        for day_name, hours, count in zip(DAY_NAMES, totals, weekday_counts)
+    }
+    return jsonify({"weekdays": weekdays})
+
+@gymBP.route('/occupancy/active-members', methods=['GET', 'OPTIONS'])
+def get_active_members():
+    """
+    Distinct members who visited per day, week (starting Monday) or month.
+    
+    Query parameters:
+        period: "day" (default), "week" or "month"
+        start, end: Date range (YYYY-MM-DD, inclusive); defaults to the last 30 days,
+            12 weeks or 12 months with data
+    
+    Returns:
+        JSON response with one member count per period
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        return jsonify({"error": f"period must be one of: {', '.join(PERIODS)}"}), 400
+    
+    occupancy = get_log_store(_gym_id()).get_occupancy()
+    span = occupancy.span()
+    if span is None:
+        return jsonify({"period": period, "counts": []})
+    
+    try:
+        start_day, end_day = _date_range(span, default_days={'day': 30, 'week': 84, 'month': 365}[period], max_days=3660)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    counts = [
+        {"period": period_label(period, key), "members": members}
+        for key, members in occupancy.active_members(period, start_day, end_day)
+    ]
+    return jsonify({"period": period, "counts": counts})
+
+@gymBP.route('/swipes', methods=['POST', 'OPTIONS'])
+def record_swipes():
+    """
+    Record one or more RFID swipes in the gym log.
+    
+    Request body (single swipe):
+    {
+        "uid": "AA6A06B0",                   # RFID UID of the user
+        "timestamp": "2025-04-19T11:15:10"   # Optional, defaults to now
+    }
+    
+    Request body (batch):
+    {
+        "swipes": [{"uid": "AA6A06B0", "timestamp": "2025-04-19T11:15:10"}, ...]
+    }
+    
+    Both forms take an optional "gym_id" naming the site the swipes happened at.
+    
+    Returns:
+        JSON response with the number of swipes recorded and the new data version
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+        
+    # Handle POST request
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    swipes = data.get('swipes', [data])
+    gym_id = _gym_id(data)
     
+    if not isinstance(swipes, list) or not swipes or not all(isinstance(swipe, dict) for swipe in swipes):
+        return jsonify({"error": "swipes must be a non-empty list of objects"}), 400
+    
+    try:
+        rows = [make_swipe_row(swipe.get('uid'), swipe.get('timestamp')) for swipe in swipes]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        get_swipe_writer(gym_id).submit(rows)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    
+    return jsonify({"recorded": len(rows), "data_version": get_log_store(gym_id).version}), 201
+
+@gymBP.route('/sites', methods=['GET', 'OPTIONS'])
+def get_gym_sites():
+    """
+    List the sites (gyms) this worker serves.
+    
+    Returns:
+        JSON response with each site's id, member count and model version
+    """
+    # Handle OPTIONS request (preflight)
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+        return response
+    
+    sites = []
+    for gym_id in get_sites():
+        models = get_model_registry(gym_id).get()
+        sites.append({
+            "gym_id": gym_id,
+            "members": len(get_log_store(gym_id).uid_counts()),
+            "model_version": models.version if models else None,
+        })
+    return jsonify({"sites": sites})
+
+@gymBP.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Report hit/miss counters of the score result cache.
+    
+    Returns:
+        JSON response with cache statistics
+    """
+    return jsonify(get_score_cache().stats())
 
 @gymBP.route('/v1/train-models', methods=['POST'])
 def train_models():
     """
     Admin endpoint to train or retrain the ML models based on current data.
     
+    Training runs in a background process; poll the returned job's status URL.
+    Only the requested site's models (?gym_id= or "gym_id" in the body) are retrained.
+    
     Returns:
-        JSON response with training status
+        JSON response with the queued training job
     """
+    site = get_site(_gym_id(request.get_json(silent=True)))
     try:
-        result = train_models_from_data()
-        return jsonify({"message": "Models trained successfully", "details": result})
+        job = get_training_jobs().submit(site)
+        response = jsonify({
+            "message": "Model training started",
+            "job": job,
+            "status_url": url_for('gym.get_training_job', job_id=job["job_id"])
+        })
+        return response, 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@gymBP.route('/v1/train-models', methods=['GET'])
+def list_training_jobs():
+    """
+    Admin endpoint listing recent training jobs, optionally for one site (?gym_id=).
+    
+    Returns:
+        JSON response with the status of recent jobs, newest first
+    """
+    jobs = get_training_jobs().list()
+    if request.args.get('gym_id'):
+        gym_id = _gym_id()
+        jobs = [job for job in jobs if job["gym_id"] == gym_id]
+    return jsonify({"jobs": jobs})
+
+@gymBP.route('/v1/train-models/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """
+    Admin endpoint reporting a training job's status, progress, timing and dataset size.
+    
+    Returns:
+        JSON response with the job status
+    """
+    job = get_training_jobs().get(job_id)
+    if job is None:
+        return jsonify({"error": f"No training job with id: {job_id}"}), 404
+    return jsonify(job)
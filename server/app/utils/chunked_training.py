@@ -0,0 +1,362 @@
+import datetime
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.utils.features import AGGREGATE_COLUMNS, FEATURE_COLUMNS, finalize_features
+from app.utils.log_sources import SQLiteLogSource
+
+# Rough working-set sizes used to turn a memory budget into chunk and batch sizes
+CSV_CHUNK_BYTES_PER_ROW = 600
+FEATURE_BATCH_BYTES_PER_ROW = 8 * len(FEATURE_COLUMNS) * 6
+MIN_CHUNK_ROWS = 10_000
+MIN_BATCH_ROWS = 1_024
+
+# Share of the budget given to each working set; the rest is left for per-user state
+CHUNK_BUDGET_SHARE = 0.5
+BATCH_BUDGET_SHARE = 0.25
+
+# Passes of MiniBatchKMeans.partial_fit over the users
+KMEANS_EPOCHS = 10
+
+# (code, day) pairs are packed into one int64 key: code in the high 32 bits
+_DAY_BITS = 32
+
+
+def chunk_sizes(memory_mb):
+    """
+    Split a memory budget into log chunk and feature batch sizes.
+
+    Returns:
+        tuple: (rows per log chunk, users per fitting batch)
+    """
+    budget = memory_mb * 1024 * 1024
+    chunk_rows = max(MIN_CHUNK_ROWS, int(budget * CHUNK_BUDGET_SHARE / CSV_CHUNK_BYTES_PER_ROW))
+    batch_rows = max(MIN_BATCH_ROWS, int(budget * BATCH_BUDGET_SHARE / FEATURE_BATCH_BYTES_PER_ROW))
+    return chunk_rows, batch_rows
+
+
+def _visit_keys(codes, days):
+    # Distinct (user, day) visits, sorted by user then day
+    return np.unique((codes.astype(np.int64) << _DAY_BITS) | days)
+
+
+class VisitAccumulator:
+    """
+    Per-user visit aggregates reduced from the log one chunk at a time.
+
+    Holds the same aggregates as features.aggregate_visits as arrays indexed by
+    user code, so memory grows with the number of users, not swipes. Visit gaps
+    are extended chunk by chunk, which is exact as long as each user's swipes
+    arrive in time order. Users with an earlier swipe showing up in a later chunk
+    are marked and recomputed exactly in a second, filtered pass (rescan).
+    """
+
+    def __init__(self):
+        self.uids = []
+        self._codes = {}
+        self.swipes_seen = 0
+        self._arrays = {column: np.zeros(0, dtype=np.float64 if column.startswith('gap_s') else np.int64) for column in AGGREGATE_COLUMNS}
+        self.out_of_order = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.uids)
+
+    def _grow(self, size):
+        capacity = len(self.out_of_order)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        for column, values in self._arrays.items():
+            self._arrays[column] = np.concatenate((values, np.zeros(capacity - len(values), dtype=values.dtype)))
+        self.out_of_order = np.concatenate((self.out_of_order, np.zeros(capacity - len(self.out_of_order), dtype=bool)))
+
+    def _encode(self, chunk_uids, add=True):
+        # Map a chunk's UIDs to stable codes across chunks (-1 for unknown UIDs when not adding)
+        local_codes, uniques = pd.factorize(chunk_uids)
+        codes = np.empty(len(uniques), dtype=np.int64)
+        for i, uid in enumerate(uniques.tolist()):
+            code = self._codes.get(uid)
+            if code is None:
+                if not add:
+                    code = -1
+                else:
+                    code = self._codes[uid] = len(self.uids)
+                    self.uids.append(uid)
+            codes[i] = code
+        self._grow(len(self.uids))
+        return codes[local_codes]
+
+    def add(self, chunk):
+        """
+        Fold one chunk of normalized logs into the aggregates.
+
+        Args:
+            chunk (DataFrame): Swipes with 'UID' and a parsed 'Timestamp' column
+        """
+        if chunk.empty:
+            return
+        time_of_day = np.digitize(chunk['Timestamp'].dt.hour.to_numpy(), [12, 18])
+        self._add(
+            self._encode(chunk['UID']),
+            chunk['Timestamp'].to_numpy().astype('datetime64[D]').astype(np.int64),
+            np.eye(3, dtype=np.int64)[time_of_day],
+        )
+
+    def add_summaries(self, summaries):
+        """
+        Fold a batch of daily summaries (features.DAY_SUMMARY_COLUMNS) into the aggregates.
+
+        Each counts as its day's swipes at once; add them before the raw swipes,
+        as their days are older.
+        """
+        if summaries.empty:
+            return
+        self._add(
+            self._encode(summaries['UID']),
+            summaries['day'].to_numpy().astype(np.int64),
+            summaries[['morning', 'afternoon', 'evening']].to_numpy(dtype=np.int64),
+        )
+
+    def _add(self, codes, days, time_of_day):
+        # Rows of (user code, day, swipes per time of day)
+        swipes = time_of_day.sum(axis=1)
+        self.swipes_seen += int(swipes.sum())
+        a = self._arrays
+
+        # Swipe-level counts: order doesn't matter, so they just add up
+        users, inverse = np.unique(codes, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n_users = len(users)
+        a['swipes'][users] += np.bincount(inverse, weights=swipes, minlength=n_users).astype(np.int64)
+        for i, column in enumerate(('morning', 'afternoon', 'evening')):
+            a[column][users] += np.bincount(inverse, weights=time_of_day[:, i], minlength=n_users).astype(np.int64)
+        day_of_week = (days + 3) % 7  # 1970-01-01 was a Thursday; 0=Monday
+        for i in range(7):
+            selected = day_of_week == i
+            a[f'dow_{i}'][users] += np.bincount(inverse[selected], weights=swipes[selected], minlength=n_users).astype(np.int64)
+
+        # This chunk's visits per user: first/last day, count and the gaps between them
+        keys = _visit_keys(codes, days)
+        visit_users = keys >> _DAY_BITS
+        visit_dates = keys & ((1 << _DAY_BITS) - 1)
+        starts = np.flatnonzero(np.concatenate(([True], visit_users[1:] != visit_users[:-1])))
+        ends = np.concatenate((starts[1:], [len(keys)])) - 1
+        chunk_first = visit_dates[starts]
+        chunk_last = visit_dates[ends]
+        chunk_visits = ends - starts + 1
+
+        same_user = visit_users[1:] == visit_users[:-1]
+        gap_positions = np.searchsorted(users, visit_users[1:][same_user])
+        gaps = np.diff(visit_dates)[same_user].astype(np.float64)
+        inner_count = np.bincount(gap_positions, minlength=n_users)
+        inner_sum = np.bincount(gap_positions, weights=gaps, minlength=n_users)
+        inner_sumsq = np.bincount(gap_positions, weights=gaps ** 2, minlength=n_users)
+
+        # Join each user's chunk onto what came before
+        previous_visits = a['visit_days'][users]
+        previous_last = a['last_day'][users]
+        new = previous_visits == 0
+        in_order = ~new & (chunk_first >= previous_last)
+        self.out_of_order[users[~new & ~in_order]] = True
+
+        bridge = in_order & (chunk_first > previous_last)
+        bridge_gap = np.where(bridge, chunk_first - previous_last, 0).astype(np.float64)
+        a['gap_count'][users] += inner_count + bridge
+        a['gap_sum'][users] += inner_sum + bridge_gap
+        a['gap_sumsq'][users] += inner_sumsq + bridge_gap ** 2
+        # A chunk starting on the previous last day doesn't add a visit for that day
+        a['visit_days'][users] += chunk_visits - (in_order & ~bridge)
+        a['first_day'][users] = np.where(new, chunk_first, np.minimum(a['first_day'][users], chunk_first))
+        a['last_day'][users] = np.where(new, chunk_last, np.maximum(previous_last, chunk_last))
+
+    def out_of_order_users(self):
+        return int(self.out_of_order[:len(self.uids)].sum())
+
+    def rescan(self, chunks, summaries=()):
+        """
+        Recompute the visit aggregates of out-of-order users exactly.
+
+        Args:
+            chunks (iterable): The same log chunks again; only the flagged users' rows are kept
+            summaries (iterable): The same batches of daily summaries again
+        """
+        flagged = self.out_of_order[:len(self.uids)]
+        if not flagged.any():
+            return
+
+        keys = []
+        for uids, days in itertools.chain(
+            ((chunk['UID'], chunk['Timestamp'].to_numpy().astype('datetime64[D]').astype(np.int64)) for chunk in chunks),
+            ((batch['UID'], batch['day'].to_numpy().astype(np.int64)) for batch in summaries),
+        ):
+            codes = self._encode(uids, add=False)
+            keep = codes >= 0
+            keep[keep] = flagged[codes[keep]]
+            if keep.any():
+                keys.append(_visit_keys(codes[keep], days[keep]))
+
+        keys = np.unique(np.concatenate(keys))
+        visit_users = keys >> _DAY_BITS
+        visit_dates = keys & ((1 << _DAY_BITS) - 1)
+        users, starts, visits = np.unique(visit_users, return_index=True, return_counts=True)
+        ends = starts + visits - 1
+
+        same_user = visit_users[1:] == visit_users[:-1]
+        gap_positions = np.searchsorted(users, visit_users[1:][same_user])
+        gaps = np.diff(visit_dates)[same_user].astype(np.float64)
+
+        a = self._arrays
+        a['visit_days'][users] = visits
+        a['first_day'][users] = visit_dates[starts]
+        a['last_day'][users] = visit_dates[ends]
+        a['gap_count'][users] = np.bincount(gap_positions, minlength=len(users))
+        a['gap_sum'][users] = np.bincount(gap_positions, weights=gaps, minlength=len(users))
+        a['gap_sumsq'][users] = np.bincount(gap_positions, weights=gaps ** 2, minlength=len(users))
+        self.out_of_order[users] = False
+
+    def aggregates(self, start, stop):
+        """
+        Get a slice of users as a features.AGGREGATE_COLUMNS frame indexed by UID.
+        """
+        # The arrays have spare capacity past the last user
+        stop = min(stop, len(self.uids))
+        return pd.DataFrame(
+            {column: values[start:stop] for column, values in self._arrays.items()},
+            index=pd.Index(self.uids[start:stop], name='UID'),
+        )
+
+
+def _summary_batches(source, batch_rows):
+    # Daily summaries of compacted days (only SQLite logs are compacted)
+    if isinstance(source, SQLiteLogSource):
+        return source.iter_summaries(batch_rows)
+    return ()
+
+
+def _training_batches(accumulator, batch_rows, today):
+    # Feature rows of the trainable users (3+ visit days), batch by batch
+    for start in range(0, len(accumulator), batch_rows):
+        features = finalize_features(accumulator.aggregates(start, start + batch_rows), today)
+        features = features[features['visit_days'] >= 3]
+        if not features.empty:
+            yield features[FEATURE_COLUMNS].to_numpy()
+
+
+def train_models_chunked(source, memory_mb, progress=None, registry=None):
+    """
+    Train the scoring models without loading the whole log into memory.
+
+    The log is read in chunks and reduced to per-user aggregates, the scaler is
+    fitted with StandardScaler.partial_fit and the clusters with
+    MiniBatchKMeans.partial_fit over batches of users. Chunk and batch sizes are
+    derived from memory_mb; per-user state (a few hundred bytes per user) comes
+    on top of that. The artifacts are a StandardScaler and a KMeans-compatible
+    model, so they are saved and served exactly like the in-memory ones.
+
+    Args:
+        source: Log source with iter_chunks (see log_sources.open_log_source)
+        memory_mb (float): Memory budget for the chunk and batch working sets
+        progress (callable): Called with the name of each stage as it starts
+        registry (ModelRegistry): Where to save the models (defaults to the shared registry)
+
+    Returns:
+        dict: Training status with the new model version, dataset size and stage timings
+    """
+    from app.utils.model_registry import get_model_registry
+
+    timings = {}
+
+    def stage(name):
+        if progress is not None:
+            progress(name)
+        timings[name] = time.perf_counter()
+
+    def finish_stage(name):
+        timings[name] = round(time.perf_counter() - timings[name], 4)
+
+    try:
+        chunk_rows, batch_rows = chunk_sizes(memory_mb)
+
+        # Reduce the log to per-user aggregates one chunk at a time
+        stage('load')
+        accumulator = VisitAccumulator()
+        chunks = 0
+        # Compacted days first: they're older than every raw swipe
+        for summaries in _summary_batches(source, chunk_rows):
+            accumulator.add_summaries(summaries)
+            chunks += 1
+        for chunk in source.iter_chunks(chunk_rows):
+            accumulator.add(chunk)
+            chunks += 1
+        finish_stage('load')
+
+        if not len(accumulator):
+            return {"error": "No data available for training"}
+
+        out_of_order_users = accumulator.out_of_order_users()
+        if out_of_order_users:
+            stage('rescan')
+            accumulator.rescan(source.iter_chunks(chunk_rows), _summary_batches(source, chunk_rows))
+            finish_stage('rescan')
+
+        today = datetime.datetime.now().date()
+        dataset = {
+            "swipes": accumulator.swipes_seen,
+            "users": len(accumulator),
+            "chunks": chunks,
+            "chunk_rows": chunk_rows,
+            "batch_rows": batch_rows,
+            "out_of_order_users": out_of_order_users,
+            "memory_budget_mb": memory_mb,
+        }
+
+        # sklearn is only needed for fitting; serving scores with numpy alone
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
+        # Scale features: one pass of partial_fit over the users
+        stage('features')
+        scaler = StandardScaler()
+        trained_users = 0
+        for X in _training_batches(accumulator, batch_rows, today):
+            scaler.partial_fit(X)
+            trained_users += len(X)
+        dataset["trained_users"] = trained_users
+        finish_stage('features')
+
+        if trained_users < 4:
+            return {"error": "Not enough data to train models", "dataset": dataset}
+
+        # Train mini-batch K-means over several passes of the scaled users
+        stage('fit')
+        kmeans = MiniBatchKMeans(n_clusters=4, random_state=42, batch_size=batch_rows, n_init=3)
+        pending = None
+        for _ in range(KMEANS_EPOCHS):
+            for X in _training_batches(accumulator, batch_rows, today):
+                X_scaled = scaler.transform(X)
+                if not hasattr(kmeans, 'cluster_centers_'):
+                    # The first partial_fit seeds the centroids, so it needs at least one per cluster
+                    pending = X_scaled if pending is None else np.vstack((pending, X_scaled))
+                    if len(pending) < kmeans.n_clusters:
+                        continue
+                    X_scaled, pending = pending, None
+                kmeans.partial_fit(X_scaled)
+        finish_stage('fit')
+
+        # Save models and swap them in for serving
+        stage('save')
+        model_version = (registry or get_model_registry()).save(kmeans, scaler)
+        finish_stage('save')
+
+        return {
+            "success": "Models trained successfully",
+            "model_version": model_version,
+            "dataset": dataset,
+            "timings": timings
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,187 @@
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+UIDS_FILENAME = 'uids.bin'
+OFFSETS_FILENAME = 'offsets.i64'
+TIMESTAMPS_FILENAME = 'ts.i64'
+
+
+class UIDIndex(Mapping):
+    """
+    Read-only {uid: (start, stop)} view over a sorted UID intern table and its row offsets.
+
+    Lookups are a binary search over the arrays, so no per-UID dict is built.
+    """
+
+    def __init__(self, uids, offsets):
+        self.uids = uids
+        self.offsets = offsets
+
+    def __getitem__(self, uid):
+        key = uid.encode('ascii', 'replace')
+        position = int(np.searchsorted(self.uids, key))
+        if position >= len(self.uids) or self.uids[position] != key:
+            raise KeyError(uid)
+        return int(self.offsets[position]), int(self.offsets[position + 1])
+
+    def __iter__(self):
+        return iter(np.char.decode(self.uids, 'ascii').tolist())
+
+    def __len__(self):
+        return len(self.uids)
+
+    def items(self):
+        return zip(
+            np.char.decode(self.uids, 'ascii').tolist(),
+            zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist()),
+        )
+
+
+class CompactLogs:
+    """
+    Swipes in a compact typed layout, grouped by UID.
+
+        uids         Intern table: the sorted distinct (upper-case) UIDs as
+                     fixed-width ASCII; a UID's code is its position
+        offsets      Row offset of each UID's first swipe, plus the total, int64
+        timestamps   Swipe times as int64 epoch seconds, grouped by UID
+
+    A row's UID is implied by the range it falls in, so nothing per row is a
+    Python object: a swipe costs 8 bytes. Calendar fields (date, weekday, hour)
+    are derived from the timestamps when they are needed.
+    """
+
+    def __init__(self, uids, offsets, timestamps):
+        self.uids = uids
+        self.offsets = offsets
+        self.timestamps = timestamps
+        self.index = UIDIndex(uids, offsets)
+        self._decoded = None
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype='S1'), np.zeros(1, dtype='<i8'), np.empty(0, dtype='<i8'))
+
+    @classmethod
+    def from_arrays(cls, timestamps, codes, uids):
+        """
+        Build from per-row codes into any UID table.
+
+        Args:
+            timestamps (ndarray): Epoch seconds per row
+            codes (ndarray): Per-row position in uids
+            uids (array): UID table; may be unsorted, mixed-case or hold duplicates
+        """
+        if not len(codes):
+            return cls.empty()
+
+        # Re-intern into a sorted, upper-case table, keeping only UIDs that have rows
+        table, remap = np.unique(np.char.upper(np.asarray(uids, dtype=str)), return_inverse=True)
+        codes = remap.reshape(-1)[codes]
+        used, codes = np.unique(codes, return_inverse=True)
+        codes = codes.reshape(-1)
+        table = table[used]
+
+        order = np.argsort(codes, kind='stable')
+        offsets = np.zeros(len(table) + 1, dtype='<i8')
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(table)))
+        width = max(1, int(np.char.str_len(table).max()))
+        return cls(
+            np.char.encode(table, 'ascii', 'replace').astype(f'S{width}'),
+            offsets,
+            np.asarray(timestamps, dtype='<i8')[order],
+        )
+
+    @classmethod
+    def from_logs(cls, logs):
+        """
+        Build from normalized logs ('UID' and a parsed 'Timestamp' column).
+        """
+        codes, uids = pd.factorize(logs['UID'])
+        known = codes >= 0
+        timestamps = logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+        return cls.from_arrays(timestamps[known], codes[known], np.asarray(uids, dtype=str))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def decoded_uids(self):
+        """
+        Get the intern table as strings, indexed by code (decoded once, it's one entry per member).
+        """
+        if self._decoded is None:
+            self._decoded = self.uids.astype(str)
+        return self._decoded
+
+    def counts(self):
+        """
+        Get the number of rows per UID code.
+        """
+        return np.diff(self.offsets)
+
+    def row_codes(self):
+        """
+        Get every row's UID code.
+        """
+        return np.repeat(np.arange(len(self.uids)), self.counts())
+
+    def rows(self, start, stop):
+        """
+        Get one UID's contiguous row range as a normalized DataFrame.
+        """
+        if stop <= start:
+            return pd.DataFrame({'UID': np.array([], dtype=object), 'Timestamp': np.array([], dtype='datetime64[s]')})
+        code = int(np.searchsorted(self.offsets, start, side='right')) - 1
+        return pd.DataFrame({
+            'UID': np.full(stop - start, self.uids[code].decode('ascii'), dtype=object),
+            'Timestamp': np.asarray(self.timestamps[start:stop]).astype('datetime64[s]'),
+        })
+
+    def take(self, ranges):
+        """
+        Get several row ranges as one DataFrame, or every row if ranges is None.
+
+        The UID column is categorical over the intern table, so it holds an
+        integer code per row rather than a string.
+        """
+        if ranges is None:
+            positions = slice(None)
+            codes = self.row_codes()
+        else:
+            positions = np.concatenate([np.arange(start, stop) for start, stop in ranges]) if ranges else np.array([], dtype=np.int64)
+            codes = np.searchsorted(self.offsets, positions, side='right') - 1
+        return pd.DataFrame({
+            'UID': pd.Categorical.from_codes(codes, categories=self.decoded_uids()),
+            'Timestamp': np.asarray(self.timestamps[positions]).astype('datetime64[s]'),
+        })
+
+    def merged(self, logs):
+        """
+        Get a new CompactLogs with extra normalized rows folded in.
+        """
+        codes, uids = pd.factorize(logs['UID'])
+        known = codes >= 0
+        timestamps = logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+        return CompactLogs.from_arrays(
+            np.concatenate((self.timestamps, timestamps[known])),
+            np.concatenate((self.row_codes(), codes[known] + len(self.uids))),
+            np.concatenate((self.decoded_uids(), np.asarray(uids, dtype=str))),
+        )
+
+    def write(self, directory):
+        """
+        Write the three arrays to a directory (see shared_snapshot for the layout).
+        """
+        self.uids.tofile(os.path.join(directory, UIDS_FILENAME))
+        self.offsets.tofile(os.path.join(directory, OFFSETS_FILENAME))
+        self.timestamps.tofile(os.path.join(directory, TIMESTAMPS_FILENAME))
+
+
+def load_compact(source):
+    """
+    Load a log source straight into CompactLogs, without per-row strings.
+    """
+    return CompactLogs.from_arrays(*source.load_arrays())
@@ -0,0 +1,110 @@
+import atexit
+import datetime
+import threading
+
+from app.utils.features import day_number
+from app.utils.log_sources import SQLiteLogSource, open_log_source
+from app.utils.metrics import stage_timer
+from app.utils.sites import get_sites
+
+
+def compact_source(source, retention_days, today=None):
+    """
+    Fold a log's swipes from days more than retention_days ago into daily summaries.
+
+    Only whole days are compacted, so the swipes of today and the retention_days
+    before it stay raw. The features only need per-day counts and hour histograms
+    for closed days, so scores don't change; session totals are kept per day, and
+    a session running across the cutoff is counted as two.
+
+    Args:
+        source (SQLiteLogSource): Log to compact
+        retention_days (int): Days of raw swipes to keep before today
+        today (date): Defaults to the current date
+
+    Returns:
+        int: Number of swipes compacted
+    """
+    today = today or datetime.date.today()
+    with stage_timer('compaction'):
+        return source.compact((day_number(today) - retention_days) * 86400)
+
+
+class Compactor:
+    """
+    Compacts one site's log every interval seconds in a background thread.
+
+    Every worker may run one: compaction is a single write transaction, so once
+    one worker has folded a day the others find nothing left to do. Stores notice
+    the change through the log's signature and reload on their next request.
+    """
+
+    def __init__(self, source, retention_days, interval=3600.0):
+        self.source = source
+        self.retention_days = retention_days
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            return compact_source(self.source, self.retention_days)
+        except FileNotFoundError:
+            return 0
+
+    def start(self):
+        """
+        Compact once right away, then keep compacting in the background.
+        """
+        self._thread = threading.Thread(target=self._run, name='log-compactor', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Log compaction error: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def init_compaction(app):
+    """
+    Start a compactor for each site, if RETENTION_DAYS is set.
+
+    Retention is a SQLite-only setting: the CSV and columnar logs are append-only
+    files, and shared snapshots only hold raw swipes.
+
+    Returns:
+        dict: {gym_id: Compactor}
+
+    Raises:
+        ValueError: If RETENTION_DAYS is set and a site's log isn't a SQLite
+            database, or SHARED_SNAPSHOT_DIR is set
+    """
+    retention_days = app.config['RETENTION_DAYS']
+    compactors = {}
+    if not retention_days:
+        return compactors
+
+    sites = get_sites()
+    for gym_id, site in sites.items():
+        if not isinstance(open_log_source(site.log_path), SQLiteLogSource):
+            raise ValueError(f"RETENTION_DAYS needs a SQLite log (RFID_LOG_BACKEND=sqlite), but site {gym_id!r} logs to {site.log_path}")
+        if site.snapshot_dir:
+            raise ValueError("RETENTION_DAYS can't be combined with SHARED_SNAPSHOT_DIR")
+
+    for gym_id, site in sites.items():
+        compactor = Compactor(open_log_source(site.log_path), retention_days, app.config['COMPACTION_INTERVAL'])
+        compactor.start()
+        atexit.register(compactor.close)
+        compactors[gym_id] = compactor
+
+    app.extensions['log_compactors'] = compactors
+    return compactors
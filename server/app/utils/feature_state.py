@@ -0,0 +1,174 @@
+import bisect
+
+import numpy as np
+
+from app.utils.features import SESSION_AGGREGATE_COLUMNS, aggregate_sessions, aggregate_visits, day_number, feature_values, get_session_window, sessionize
+
+
+class UserFeatureState:
+    """
+    Online per-user visit aggregates, updated in O(1) as swipes arrive.
+
+    Holds the same aggregates as features.aggregate_visits (plus the sorted visit
+    days, so back-dated swipes can be slotted in), and leaves the time-dependent
+    parts (total_days, days_since_last_visit) to query time.
+
+    Session totals (features.aggregate_sessions) are kept for the closed sessions
+    plus the latest one, which later swipes extend or close. They can only be
+    updated for swipes arriving in time order; add reports a back-dated one so the
+    caller can rebuild the state from the log.
+    """
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.swipes = 0
+        self.visit_dates = []
+        self.gap_count = 0
+        self.gap_sum = 0
+        self.gap_sumsq = 0
+        self.time_of_day = [0, 0, 0]
+        self.day_of_week = [0] * 7
+        # Totals of closed sessions, and [start, end, taps] of the latest one
+        self.closed_sessions = [0, 0, 0, 0]
+        self.session = None
+
+    @classmethod
+    def from_logs(cls, uid, user_logs, summaries=None):
+        """
+        Build the state from a user's existing log rows and daily summaries
+        (features.DAY_SUMMARY_COLUMNS) of compacted days.
+        """
+        state = cls(uid)
+        if user_logs.empty and (summaries is None or summaries.empty):
+            return state
+
+        aggregates = aggregate_visits(user_logs, summaries).iloc[0]
+        state.swipes = int(aggregates['swipes'])
+        days = user_logs['Timestamp'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        if summaries is not None:
+            days = np.concatenate((days, summaries['day'].to_numpy().astype(np.int64)))
+        state.visit_dates = np.unique(days).tolist()
+        state.gap_count = int(aggregates['gap_count'])
+        state.gap_sum = int(aggregates['gap_sum'])
+        state.gap_sumsq = int(aggregates['gap_sumsq'])
+        state.time_of_day = [int(aggregates[column]) for column in ('morning', 'afternoon', 'evening')]
+        state.day_of_week = [int(aggregates[f'dow_{i}']) for i in range(7)]
+
+        totals = aggregate_sessions(user_logs, summaries=summaries).iloc[0]
+        state.closed_sessions = [int(totals[column]) for column in SESSION_AGGREGATE_COLUMNS]
+        sessions = sessionize(user_logs)[0]
+        if len(sessions):
+            # The latest session stays open for later swipes to extend
+            state.session = sessions[['start', 'end', 'taps']].to_numpy()[-1].tolist()
+            state._close_session(*state.session, sign=-1)
+        return state
+
+    def _close_session(self, start, end, taps, sign=1):
+        paired = taps >= 2
+        totals = self.closed_sessions
+        totals[0] += sign
+        totals[1] += sign * taps
+        totals[2] += sign * paired
+        totals[3] += sign * (end - start) * paired
+
+    def _add_gap(self, gap, sign=1):
+        self.gap_count += sign
+        self.gap_sum += sign * gap
+        self.gap_sumsq += sign * gap * gap
+
+    def add(self, day, hour, timestamp):
+        """
+        Record one swipe.
+
+        Args:
+            day (int): Day of the swipe as days since the Unix epoch
+            hour (int): Hour of the swipe (0-23)
+            timestamp (int): Time of the swipe as epoch seconds
+
+        Returns:
+            bool: False if the swipe is older than the user's latest one, in which
+                case the session totals are stale and the state should be rebuilt
+        """
+        self.swipes += 1
+        self.time_of_day[0 if hour < 12 else 1 if hour < 18 else 2] += 1
+        self.day_of_week[(day + 3) % 7] += 1  # 1970-01-01 was a Thursday
+        self._add_visit(day)
+        return self._add_session_swipe(timestamp)
+
+    def _add_session_swipe(self, timestamp):
+        if self.session is None:
+            self.session = [timestamp, timestamp, 1]
+            return True
+
+        start, end, taps = self.session
+        if timestamp < end:
+            return False
+        window = get_session_window()
+        gap = timestamp - end
+        if gap > window.max_gap:
+            self._close_session(start, end, taps)
+            self.session = [timestamp, timestamp, 1]
+        else:
+            self.session = [start, timestamp, taps + (gap > window.debounce)]
+        return True
+
+    def _add_visit(self, day):
+        visit_dates = self.visit_dates
+        if not visit_dates or day > visit_dates[-1]:
+            # Common case: a new latest visit day
+            if visit_dates:
+                self._add_gap(day - visit_dates[-1])
+            visit_dates.append(day)
+            return
+
+        position = bisect.bisect_left(visit_dates, day)
+        if position < len(visit_dates) and visit_dates[position] == day:
+            # Another swipe on a day already counted as a visit
+            return
+
+        # Back-dated visit: split the gap it falls into
+        if position > 0:
+            self._add_gap(visit_dates[position] - visit_dates[position - 1], -1)
+            self._add_gap(day - visit_dates[position - 1])
+        self._add_gap(visit_dates[position] - day)
+        visit_dates.insert(position, day)
+
+    def aggregates(self):
+        """
+        Get the state as a row of features.AGGREGATE_COLUMNS and SESSION_AGGREGATE_COLUMNS.
+        """
+        row = {
+            'swipes': self.swipes,
+            'visit_days': len(self.visit_dates),
+            'first_day': self.visit_dates[0],
+            'last_day': self.visit_dates[-1],
+            'gap_count': self.gap_count,
+            'gap_sum': self.gap_sum,
+            'gap_sumsq': self.gap_sumsq,
+            'morning': self.time_of_day[0],
+            'afternoon': self.time_of_day[1],
+            'evening': self.time_of_day[2],
+        }
+        for i in range(7):
+            row[f'dow_{i}'] = self.day_of_week[i]
+
+        sessions, taps, paired, dwell_seconds = self.closed_sessions
+        if self.session is not None:
+            start, end, session_taps = self.session
+            sessions += 1
+            taps += session_taps
+            paired += session_taps >= 2
+            dwell_seconds += (end - start) * (session_taps >= 2)
+        row.update(sessions=sessions, taps=taps, paired_sessions=paired, dwell_seconds=dwell_seconds)
+        return row
+
+    def features(self, today):
+        """
+        Derive the user's features as of a date.
+
+        Returns:
+            dict: Same features as build_feature_matrix produces for this user
+        """
+        # The formulas of finalize_features on scalars, without a one-row DataFrame
+        values = feature_values(self.aggregates(), day_number(today))
+        return {column: value.item() for column, value in values.items()}
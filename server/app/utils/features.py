@@ -0,0 +1,533 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Column order of the vector fed to the scaler and clustering model
+FEATURE_COLUMNS = [
+    'frequency',
+    'consistency',
+    'days_since_last_visit',
+    'morning_ratio',
+    'afternoon_ratio',
+    'evening_ratio',
+] + [f'day_{day_name}_ratio' for day_name in DAY_NAMES]
+
+# Per-user raw aggregates every feature is derived from
+AGGREGATE_COLUMNS = [
+    'swipes',
+    'visit_days',
+    'first_day',
+    'last_day',
+    'gap_count',
+    'gap_sum',
+    'gap_sumsq',
+    'morning',
+    'afternoon',
+    'evening',
+] + [f'dow_{i}' for i in range(7)]
+
+# Per-user session aggregates (see sessionize); optional alongside AGGREGATE_COLUMNS
+SESSION_AGGREGATE_COLUMNS = ['sessions', 'taps', 'paired_sessions', 'dwell_seconds']
+
+# Session features finalize_features adds when the session aggregates are present.
+# They aren't model inputs, so models trained on FEATURE_COLUMNS keep working.
+SESSION_FEATURE_COLUMNS = [
+    'sessions',
+    'duplicate_taps',
+    'duplicate_tap_ratio',
+    'paired_sessions',
+    'avg_session_minutes',
+    'dwell_hours',
+]
+
+# Daily summaries of compacted history (see compaction): one row per member per
+# closed day with the day's swipes, their split by time of day, a bitmask of the
+# hours of the day with any swipes (bit h for hour h), and the totals of the
+# sessions that began that day. The aggregates take them alongside raw swipes.
+DAY_SUMMARY_COLUMNS = ['UID', 'day', 'swipes', 'morning', 'afternoon', 'evening', 'hours'] + SESSION_AGGREGATE_COLUMNS
+
+# Swipes at most `debounce` seconds after the previous one are repeat taps of the
+# same card; a swipe more than `max_gap` seconds after the previous one starts a
+# new session (so an entry and an exit tap within max_gap form one session)
+SessionWindow = namedtuple('SessionWindow', ['debounce', 'max_gap'])
+DEFAULT_SESSION_WINDOW = SessionWindow(60, 4 * 3600)
+
+_session_window = DEFAULT_SESSION_WINDOW
+
+
+def set_session_window(window):
+    """
+    Set the session window used by sessionize and the per-user feature state.
+    """
+    global _session_window
+
+    if window.debounce < 0 or window.max_gap < window.debounce:
+        raise ValueError(f"Invalid session window: {window}")
+    _session_window = SessionWindow(*window)
+
+
+def get_session_window():
+    return _session_window
+
+
+def parse_timestamps(logs):
+    """
+    Parse the Date and Time columns of the raw logs into a single datetime column.
+    """
+    return pd.to_datetime(logs['Date'] + ' ' + logs['Time'], format='%Y-%m-%d %H:%M:%S')
+
+
+def day_number(date):
+    """
+    Convert a date to days since the Unix epoch.
+    """
+    return int(np.datetime64(date, 'D').astype(np.int64))
+
+
+def _merge_codes(codes, uids, summaries):
+    # Re-code rows coded into sorted uids, and the summaries' UIDs, into one sorted UID table
+    uids = np.asarray(uids, dtype=object)  # plain strings, even for a categorical UID
+    if summaries is None:
+        return codes, None, uids
+    summary_codes, summary_uids = pd.factorize(summaries['UID'], sort=True)
+    summary_uids = np.asarray(summary_uids, dtype=object)
+    merged = np.union1d(uids, summary_uids)
+    return np.searchsorted(merged, uids)[codes], np.searchsorted(merged, summary_uids)[summary_codes], merged
+
+
+def aggregate_visits(logs, summaries=None):
+    """
+    Reduce raw swipes to per-user visit aggregates in a single vectorized pass.
+
+    Args:
+        logs (DataFrame): Swipes with 'UID' and a parsed 'Timestamp' column
+        summaries (DataFrame): Daily summaries of compacted days (DAY_SUMMARY_COLUMNS)
+            to count in with the swipes
+
+    Returns:
+        DataFrame: AGGREGATE_COLUMNS indexed by UID (sorted)
+    """
+    codes, uids = pd.factorize(logs['UID'], sort=True)
+    codes, summary_codes, uids = _merge_codes(codes, uids, summaries)
+    n_users = len(uids)
+    timestamps = logs['Timestamp']
+
+    days = timestamps.to_numpy().astype('datetime64[D]').astype(np.int64)
+    hours = timestamps.dt.hour.to_numpy()
+    day_of_week = (days + 3) % 7  # 1970-01-01 was a Thursday; 0=Monday, 6=Sunday
+
+    # Swipe-level counts: time of day (morning < 12, afternoon < 18, evening) and weekday
+    swipes = np.bincount(codes, minlength=n_users)
+    time_of_day = np.digitize(hours, [12, 18])
+    tod_counts = np.bincount(codes * 3 + time_of_day, minlength=n_users * 3).reshape(n_users, 3)
+    dow_counts = np.bincount(codes * 7 + day_of_week, minlength=n_users * 7).reshape(n_users, 7)
+
+    if summaries is not None:
+        # A summary adds a whole day at once: its swipes all fall on the day's weekday
+        summary_days = summaries['day'].to_numpy().astype(np.int64)
+        summary_swipes = summaries['swipes'].to_numpy()
+        swipes = swipes + np.bincount(summary_codes, weights=summary_swipes, minlength=n_users).astype(np.int64)
+        for i, column in enumerate(('morning', 'afternoon', 'evening')):
+            tod_counts[:, i] += np.bincount(summary_codes, weights=summaries[column].to_numpy(), minlength=n_users).astype(np.int64)
+        dow_counts += np.bincount(
+            summary_codes * 7 + (summary_days + 3) % 7, weights=summary_swipes, minlength=n_users * 7
+        ).astype(np.int64).reshape(n_users, 7)
+        codes = np.concatenate((codes, summary_codes))
+        days = np.concatenate((days, summary_days))
+
+    # Distinct (user, day) pairs, sorted by user then day (multiple scans in one day = one visit)
+    first = days.min() if len(days) else 0
+    span = (days.max() - first + 1) if len(days) else 1
+    visit_keys = np.unique(codes.astype(np.int64) * span + (days - first))
+    visit_users = visit_keys // span
+    visit_dates = visit_keys % span + first
+
+    visit_days = np.bincount(visit_users, minlength=n_users)
+    group_starts = np.concatenate(([0], np.cumsum(visit_days)[:-1]))
+    group_ends = group_starts + visit_days - 1
+
+    # Gaps between consecutive visit days of the same user
+    same_user = visit_users[1:] == visit_users[:-1]
+    gap_users = visit_users[1:][same_user]
+    gaps = np.diff(visit_dates)[same_user].astype(np.float64)
+
+    aggregates = pd.DataFrame({
+        'swipes': swipes,
+        'visit_days': visit_days,
+        'first_day': visit_dates[group_starts] if n_users else [],
+        'last_day': visit_dates[group_ends] if n_users else [],
+        'gap_count': np.bincount(gap_users, minlength=n_users),
+        'gap_sum': np.bincount(gap_users, weights=gaps, minlength=n_users),
+        'gap_sumsq': np.bincount(gap_users, weights=gaps ** 2, minlength=n_users),
+        'morning': tod_counts[:, 0],
+        'afternoon': tod_counts[:, 1],
+        'evening': tod_counts[:, 2],
+    }, index=pd.Index(uids, name='UID'))
+
+    for i in range(7):
+        aggregates[f'dow_{i}'] = dow_counts[:, i]
+
+    return aggregates
+
+
+def _session_bounds(codes, seconds, window):
+    # For swipes sorted by (user, time): the first and last row of every session,
+    # and the running count of distinct taps (swipes that aren't repeats of the
+    # previous one) up to each row
+    gaps = np.diff(seconds)
+    starts = np.ones(len(seconds), dtype=bool)
+    starts[1:] = (codes[1:] != codes[:-1]) | (gaps > window.max_gap)
+    taps = starts.copy()
+    taps[1:] |= gaps > window.debounce
+
+    first = np.flatnonzero(starts)
+    last = np.empty_like(first)
+    last[:-1] = first[1:] - 1
+    last[-1:] = len(seconds) - 1
+    return first, last, np.cumsum(taps)
+
+
+def sessionize(logs, window=None):
+    """
+    Split every user's swipes into sessions in one vectorized pass.
+
+    The swipes are sorted once by (UID, time); differences between neighbours then
+    mark session boundaries (a new UID or a gap over max_gap) and repeat taps (a gap
+    of at most debounce), and per-session totals are segment reductions. A session
+    with two or more distinct taps is taken as an entry/exit pair, and its duration
+    as the time spent in the gym.
+
+    Args:
+        logs (DataFrame): Swipes with 'UID' and a parsed 'Timestamp' column
+        window (SessionWindow): Defaults to the configured window
+
+    Returns:
+        tuple: (sessions, uids) - one row per session ordered by UID then start,
+            with 'user' (code into uids), 'start' and 'end' (epoch seconds), 'taps'
+            (distinct taps) and 'swipes'; and the sorted UIDs
+    """
+    window = window or _session_window
+    codes, uids = pd.factorize(logs['UID'], sort=True)
+    seconds = logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+
+    order = np.lexsort((seconds, codes))
+    codes = codes[order]
+    seconds = seconds[order]
+    first, last, tap_counts = _session_bounds(codes, seconds, window)
+
+    sessions = pd.DataFrame({
+        'user': codes[first],
+        'start': seconds[first],
+        'end': seconds[last],
+        'taps': tap_counts[last] - tap_counts[first] + 1,
+        'swipes': last - first + 1,
+    })
+    return sessions, uids
+
+
+def aggregate_sessions(logs, window=None, summaries=None):
+    """
+    Reduce every user's sessions to per-user totals, plus the session totals of
+    any daily summaries (DAY_SUMMARY_COLUMNS).
+
+    Returns:
+        DataFrame: SESSION_AGGREGATE_COLUMNS indexed by UID (sorted, like aggregate_visits)
+    """
+    sessions, uids = sessionize(logs, window)
+    users, summary_users, uids = _merge_codes(sessions['user'].to_numpy(), uids, summaries)
+    n_users = len(uids)
+    paired = sessions['taps'].to_numpy() >= 2
+    durations = (sessions['end'] - sessions['start']).to_numpy()
+
+    aggregates = pd.DataFrame({
+        'sessions': np.bincount(users, minlength=n_users),
+        'taps': np.bincount(users, weights=sessions['taps'].to_numpy(), minlength=n_users).astype(np.int64),
+        'paired_sessions': np.bincount(users, weights=paired, minlength=n_users).astype(np.int64),
+        'dwell_seconds': np.bincount(users, weights=durations * paired, minlength=n_users).astype(np.int64),
+    }, index=pd.Index(uids, name='UID'))
+
+    if summaries is not None:
+        for column in SESSION_AGGREGATE_COLUMNS:
+            aggregates[column] += np.bincount(summary_users, weights=summaries[column].to_numpy(), minlength=n_users).astype(np.int64)
+    return aggregates
+
+
+def summarize_days(logs, window=None):
+    """
+    Reduce raw swipes to one summary per member per day, for compaction.
+
+    Everything the visit features need survives: the day, the swipe count and
+    the swipes per hour. Sessions are totalled under the day they started.
+
+    Args:
+        logs (DataFrame): Raw swipes with 'UID' and a parsed 'Timestamp' column
+        window (SessionWindow): Defaults to the configured window
+
+    Returns:
+        tuple: (summaries, hour_counts) - DAY_SUMMARY_COLUMNS, one row per
+            (UID, day) in order, and the swipes per hour of each as an n x 24 array
+    """
+    codes, uids = pd.factorize(logs['UID'], sort=True)
+    seconds = logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    days = seconds // 86400
+    first = days.min() if len(days) else 0
+    span = (days.max() - first + 1) if len(days) else 1
+
+    keys, inverse = np.unique(codes.astype(np.int64) * span + (days - first), return_inverse=True)
+    n_keys = len(keys)
+    hour_counts = np.bincount(inverse.reshape(-1) * 24 + (seconds // 3600) % 24, minlength=n_keys * 24).reshape(n_keys, 24)
+
+    sessions, _ = sessionize(logs, window)
+    session_keys = np.searchsorted(keys, sessions['user'].to_numpy() * span + (sessions['start'].to_numpy() // 86400 - first))
+    paired = sessions['taps'].to_numpy() >= 2
+    session_totals = np.column_stack((
+        np.bincount(session_keys, minlength=n_keys),
+        np.bincount(session_keys, weights=sessions['taps'].to_numpy(), minlength=n_keys),
+        np.bincount(session_keys, weights=paired, minlength=n_keys),
+        np.bincount(session_keys, weights=(sessions['end'] - sessions['start']).to_numpy() * paired, minlength=n_keys),
+    )).astype(np.int64)
+
+    summaries = day_summaries(np.asarray(uids, dtype=object)[keys // span], keys % span + first, hour_counts, session_totals)
+    return summaries, hour_counts
+
+
+def day_summaries(uids, days, hour_counts, session_totals):
+    """
+    Build daily summaries (DAY_SUMMARY_COLUMNS) from per-day hour histograms.
+
+    Args:
+        uids (array): UID of each summary
+        days (array): Day number of each summary
+        hour_counts (ndarray): Swipes per hour of the day, n x 24
+        session_totals (ndarray): SESSION_AGGREGATE_COLUMNS, n x 4
+
+    Returns:
+        DataFrame: DAY_SUMMARY_COLUMNS; int32 counts (int64 dwell_seconds), so a
+            long compacted history stays small in memory
+    """
+    hour_counts = np.asarray(hour_counts, dtype=np.int32).reshape(-1, 24)
+    session_totals = np.asarray(session_totals, dtype=np.int64).reshape(-1, len(SESSION_AGGREGATE_COLUMNS))
+    # Time of day boundaries as in aggregate_visits: morning < 12, afternoon < 18
+    time_of_day = np.add.reduceat(hour_counts, [0, 12, 18], axis=1, dtype=np.int32)
+    summaries = pd.DataFrame({
+        'UID': uids,
+        'day': np.asarray(days, dtype=np.int32),
+        'swipes': time_of_day.sum(axis=1, dtype=np.int32),
+        'morning': time_of_day[:, 0],
+        'afternoon': time_of_day[:, 1],
+        'evening': time_of_day[:, 2],
+        'hours': (hour_counts > 0).astype(np.int32) @ (1 << np.arange(24, dtype=np.int32)),
+    })
+    for i, column in enumerate(SESSION_AGGREGATE_COLUMNS):
+        summaries[column] = session_totals[:, i].astype(np.int64 if column == 'dwell_seconds' else np.int32)
+    return summaries
+
+
+def finalize_features(aggregates, today):
+    """
+    Derive the model and scoring features from per-user aggregates.
+
+    Everything time-dependent (total_days, days_since_last_visit) is computed here
+    so the same aggregates can be scored against any date.
+
+    Args:
+        aggregates (DataFrame): AGGREGATE_COLUMNS indexed by UID
+        today (date or ndarray): Reference date for the time-dependent features,
+            or a day number per row
+
+    Returns:
+        DataFrame: Features indexed by UID, including FEATURE_COLUMNS
+    """
+    today_number = today if isinstance(today, np.ndarray) else day_number(today)
+    return pd.DataFrame(feature_values(aggregates, today_number), index=aggregates.index)
+
+
+def feature_values(aggregates, today_number):
+    """
+    Compute the features of finalize_features as arrays.
+
+    Works on columns of many users or on one user's scalars alike, so a single
+    user's features don't pay for building a DataFrame.
+
+    Args:
+        aggregates (DataFrame or dict): AGGREGATE_COLUMNS (and optionally
+            SESSION_AGGREGATE_COLUMNS), as columns or as one user's values
+        today_number (int or ndarray): Reference day number, or one per row
+
+    Returns:
+        dict: {feature: ndarray}, in finalize_features column order (0-d for scalars)
+    """
+    swipes = np.asarray(aggregates['swipes'], dtype=np.float64)
+    visit_days = np.asarray(aggregates['visit_days'])
+    gap_count = np.asarray(aggregates['gap_count'], dtype=np.float64)
+    gap_sum = np.asarray(aggregates['gap_sum'], dtype=np.float64)
+    gap_sumsq = np.asarray(aggregates['gap_sumsq'], dtype=np.float64)
+    dow_counts = np.stack([np.asarray(aggregates[f'dow_{i}']) for i in range(7)], axis=-1)
+
+    total_days = today_number - np.asarray(aggregates['first_day']) + 1
+    has_gaps = gap_count > 0
+    safe_count = np.where(has_gaps, gap_count, 1)
+
+    # Population std of the gaps; exact zero when every gap is the same length
+    avg_gap = np.where(has_gaps, gap_sum / safe_count, 0.0)
+    variance = np.where(has_gaps, (gap_count * gap_sumsq - gap_sum ** 2) / safe_count ** 2, 0.0)
+    gap_std = np.sqrt(np.maximum(variance, 0.0))
+
+    # Higher consistency with lower std dev; a single visit day has no regularity yet
+    consistency = np.where(has_gaps, np.where(gap_std > 0, 1 / (1 + gap_std), 1.0), 0.0)
+
+    safe_swipes = np.where(swipes > 0, swipes, 1)
+    features = {
+        'frequency': visit_days / total_days,
+        'visit_days': visit_days,
+        'total_days': total_days,
+        'avg_gap': avg_gap,
+        'gap_std': gap_std,
+        'consistency': consistency,
+        'days_visited': (dow_counts > 0).sum(axis=-1),
+        'morning_ratio': np.asarray(aggregates['morning']) / safe_swipes,
+        'afternoon_ratio': np.asarray(aggregates['afternoon']) / safe_swipes,
+        'evening_ratio': np.asarray(aggregates['evening']) / safe_swipes,
+        'days_since_last_visit': today_number - np.asarray(aggregates['last_day']),
+    }
+
+    for i, day_name in enumerate(DAY_NAMES):
+        features[f'day_{day_name}_ratio'] = dow_counts[..., i] / safe_swipes
+
+    if 'sessions' in aggregates:
+        # Session structure: repeat taps, entry/exit pairs and time spent per visit
+        taps = np.asarray(aggregates['taps'])
+        paired = np.asarray(aggregates['paired_sessions'])
+        dwell_seconds = np.asarray(aggregates['dwell_seconds'], dtype=np.float64)
+        features['sessions'] = np.asarray(aggregates['sessions'])
+        features['duplicate_taps'] = np.asarray(aggregates['swipes']) - taps
+        features['duplicate_tap_ratio'] = features['duplicate_taps'] / safe_swipes
+        features['paired_sessions'] = paired
+        features['avg_session_minutes'] = np.where(paired > 0, dwell_seconds / np.where(paired > 0, paired, 1) / 60, 0.0)
+        features['dwell_hours'] = dwell_seconds / 3600
+
+    return features
+
+
+def _prefix_sums(values):
+    # prefix[k] is the sum of the first k values
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def aggregate_history(logs, days, summaries=None):
+    """
+    Reduce one user's swipes to their visit aggregates as of each of several days.
+
+    Uses prefix sums over the user's swipes and visit days (counts, time-of-day and
+    weekday tallies, and the running sums of visit gaps), so any number of days
+    costs one sort of the user's rows plus a binary search per day.
+
+    Args:
+        logs (DataFrame): One user's swipes with a parsed 'Timestamp' column
+        days (array): Day numbers to evaluate, ascending
+        summaries (DataFrame): The user's daily summaries of compacted days
+            (DAY_SUMMARY_COLUMNS), each counted from its day on
+
+    Returns:
+        DataFrame: AGGREGATE_COLUMNS and SESSION_AGGREGATE_COLUMNS indexed by day
+            number, only for days on or after the first visit
+    """
+    timestamps = logs['Timestamp'].sort_values()
+    seconds = timestamps.to_numpy().astype('datetime64[s]').astype(np.int64)
+    swipe_days = seconds // 86400
+    time_of_day = np.eye(3, dtype=np.int64)[np.digitize(timestamps.dt.hour.to_numpy(), [12, 18])]
+    if summaries is not None:
+        # A summary is one row holding its day's swipes per time of day
+        summaries = summaries.sort_values('day', kind='stable')
+        summary_days = summaries['day'].to_numpy().astype(np.int64)
+        row_days = np.concatenate((swipe_days, summary_days))
+        order = np.argsort(row_days, kind='stable')
+        row_days = row_days[order]
+        time_of_day = np.concatenate((time_of_day, summaries[['morning', 'afternoon', 'evening']].to_numpy(dtype=np.int64)))[order]
+    else:
+        row_days = swipe_days
+    days = np.asarray(days, dtype=np.int64)
+    days = days[days >= row_days[0]] if len(row_days) else days[:0]
+
+    # Rows on or before each day, and running swipe / time-of-day / weekday tallies
+    rows = np.searchsorted(row_days, days, side='right')
+    tod_counts = np.zeros((len(row_days) + 1, 3), dtype=np.int64)
+    tod_counts[1:] = np.cumsum(time_of_day, axis=0)
+    dow_counts = np.zeros((len(row_days) + 1, 7), dtype=np.int64)
+    dow_counts[1:] = np.cumsum(np.eye(7, dtype=np.int64)[(row_days + 3) % 7] * time_of_day.sum(axis=1)[:, None], axis=0)
+
+    # Visit days on or before each day; the gaps between them telescope, so only
+    # the sum of squares needs a prefix sum
+    visit_dates = np.unique(row_days)
+    visit_days = np.searchsorted(visit_dates, days, side='right')
+    gaps = np.diff(visit_dates).astype(np.float64)
+    gap_sumsq = np.concatenate(([0.0], np.cumsum(gaps ** 2)))
+    last_day = visit_dates[visit_days - 1] if len(days) else visit_dates[:0]
+
+    aggregates = pd.DataFrame({
+        'swipes': tod_counts[rows].sum(axis=1),
+        'visit_days': visit_days,
+        'first_day': np.full(len(days), visit_dates[0] if len(visit_dates) else 0),
+        'last_day': last_day,
+        'gap_count': visit_days - 1,
+        'gap_sum': (last_day - (visit_dates[0] if len(visit_dates) else 0)).astype(np.float64),
+        'gap_sumsq': gap_sumsq[visit_days - 1] if len(days) else np.zeros(0),
+        'morning': tod_counts[rows, 0],
+        'afternoon': tod_counts[rows, 1],
+        'evening': tod_counts[rows, 2],
+    }, index=pd.Index(days, name='day'))
+
+    for i in range(7):
+        aggregates[f'dow_{i}'] = dow_counts[rows, i]
+
+    # Sessions as of each day. Those that ended before the day's last swipe are
+    # prefix sums over sessions; the one in progress is cut at that swipe, so the
+    # result matches sessionizing the truncated log
+    first, last, tap_counts = _session_bounds(np.zeros(len(seconds), dtype=np.int64), seconds, _session_window)
+    session_taps = tap_counts[last] - tap_counts[first] + 1
+    session_paired = session_taps >= 2
+    session_dwell = (seconds[last] - seconds[first]) * session_paired
+
+    # Last swipe on or before each day (none yet while there are only summaries)
+    cut = np.searchsorted(swipe_days, days, side='right') - 1
+    started = cut >= 0
+    cut = np.maximum(cut, 0)
+    current = np.maximum(np.searchsorted(first, cut, side='right') - 1, 0)
+    if len(first):
+        current_taps = np.where(started, tap_counts[cut] - tap_counts[first[current]] + 1, 0)
+        current_dwell = seconds[cut] - seconds[first[current]]
+    else:
+        current_taps = current_dwell = np.zeros(len(days), dtype=np.int64)
+    current_paired = current_taps >= 2
+    closed = np.where(started, current, 0)
+    aggregates['sessions'] = closed + started
+    aggregates['taps'] = _prefix_sums(session_taps)[closed] + current_taps
+    aggregates['paired_sessions'] = _prefix_sums(session_paired)[closed] + current_paired
+    aggregates['dwell_seconds'] = _prefix_sums(session_dwell)[closed] + current_dwell * current_paired
+
+    if summaries is not None:
+        summary_rows = np.searchsorted(summary_days, days, side='right')
+        for column in SESSION_AGGREGATE_COLUMNS:
+            aggregates[column] += _prefix_sums(summaries[column].to_numpy(dtype=np.int64))[summary_rows]
+
+    return aggregates
+
+
+def build_feature_matrix(logs, today, summaries=None):
+    """
+    Build the feature matrix for every UID in the logs at once, including the
+    session features.
+
+    Args:
+        logs (DataFrame): Swipes with 'UID' and a parsed 'Timestamp' column
+        today (date): Reference date for the time-dependent features
+        summaries (DataFrame): Daily summaries of compacted days (DAY_SUMMARY_COLUMNS)
+
+    Returns:
+        DataFrame: Features indexed by UID, including FEATURE_COLUMNS and SESSION_FEATURE_COLUMNS
+    """
+    aggregates = aggregate_visits(logs, summaries).join(aggregate_sessions(logs, summaries=summaries))
+    return finalize_features(aggregates, today)
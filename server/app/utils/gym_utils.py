@@ -1,232 +1,377 @@
-import pandas as pd
 import numpy as np
 import datetime
-from collections import defaultdict
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-import joblib
-import os
+import time
+from app.utils.features import FEATURE_COLUMNS, aggregate_history, build_feature_matrix, day_number, finalize_features
+from app.utils.log_store import get_log_store
+from app.utils.metrics import stage_timer
+from app.utils.model_registry import get_model_registry
+from app.utils.score_cache import get_score_cache
 
-# Get the directory where your script is located
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-csv_path = os.path.join(BASE_DIR, 'RFID_logs.csv')
+# Day numbers count days since 1970-01-01
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
 
-def calculate_consistency_score(uid):
+def calculate_consistency_score(uid, as_of=None, gym_id=None):
     """
     Calculate a consistency score out of 100 for a specific gym user based on their RFID logs.
+    
+    Args:
+        uid (str): RFID UID of the user
+        as_of (date): Score the user as they stood at the end of this day
+            (only earlier swipes count); defaults to today
+        gym_id (str): Site the user belongs to (defaults to the default site)
     """
     try:
-        # Use absolute path to the CSV file
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        csv_path = os.path.join(base_dir, 'RFID_logs.csv')
-        
-        if not os.path.exists(csv_path):
-            csv_path = os.path.join(os.getcwd(), 'RFID_logs.csv')
-            
-        # Load RFID logs
-        df = pd.read_csv(csv_path)
-        
         # Normalize UIDs to uppercase for case-insensitive comparison
         uid = uid.upper()
-        df['UID'] = df['UID'].str.upper()
-        
-        # Filter data for the specific user
-        user_data = df[df['UID'] == uid]
-        
-        if user_data.empty:
+        store = get_log_store(gym_id)
+        today = datetime.datetime.now().date()
+        if as_of is not None and as_of < today:
+            # Swipes after as_of must not count, so the running accumulator can't be used
+            history = calculate_score_history(uid, as_of, as_of, gym_id=gym_id)
+            if "error" in history:
+                return history
+            if not history["points"]:
+                return {"error": f"No gym attendance records found for RFID: {uid} as of {as_of.isoformat()}"}
+            result = dict(history["points"][0])
+            del result["date"]
+            return result
+        today = as_of or today
+        with stage_timer('model_load'):
+            models = get_model_registry(gym_id).get()
+        
+        # Reuse the last result until the user swipes again, the models change or the day rolls over
+        cache = get_score_cache()
+        with stage_timer('cache_lookup'):
+            cache_key = (store.gym_id, uid, store.user_version(uid), models.version if models else None, today)
+            result = cache.get(cache_key)
+        if result is not None:
+            return result
+        
+        # Read the user's incrementally maintained feature accumulator; only the
+        # time-dependent parts are computed against today
+        with stage_timer('features'):
+            features = store.get_user_features(uid, today)
+        
+        if features is None:
             return {"error": f"No gym attendance records found for RFID: {uid}"}
-            
-        # Continue with existing code...
         
-        # Filter logs for the specific user
-        user_logs = user_data.copy()
+        # Apply ML model enhancement using the cached models
+        ml_score = apply_ml_model(features, models, gym_id)
         
-        if user_logs.empty:
-            return {"score": 0, "message": "No gym activity found for this user"}
-        
-        # Convert date strings to datetime objects
-        user_logs['DateTime'] = pd.to_datetime(user_logs['Date'] + ' ' + user_logs['Time'])
-        user_logs['Date'] = pd.to_datetime(user_logs['Date'])
+        result = build_score_result(features, ml_score, models)
+        cache.set(cache_key, result)
+        return result
         
-        # Group by date to count visits per day (multiple scans in one day = one visit)
-        daily_visits = user_logs.groupby(user_logs['Date'].dt.date).size()
+    except Exception as e:
+        return {"score": 0, "error": str(e)}
+
+
+def score_version(uid, as_of=None, gym_id=None):
+    """
+    Get everything a user's score depends on, without computing it.
+    
+    Args:
+        uid (str): RFID UID of the user
+        as_of (date): Scoring date (defaults to today)
+        gym_id (str): Site the user belongs to (defaults to the default site)
+    
+    Returns:
+        tuple: (site, UID, the user's data version, model version, scoring date);
+            equal tuples mean an identical score payload
+    """
+    store = get_log_store(gym_id)
+    models = get_model_registry(gym_id).get()
+    return (
+        store.gym_id, uid.upper(), store.user_version(uid),
+        models.version if models else None, as_of or datetime.date.today(),
+    )
+
+
+def calculate_consistency_scores(uids=None, gym_id=None):
+    """
+    Calculate consistency scores for many users at once.
+    
+    The feature matrix is built once for the whole batch and the ML model is applied
+    to all rows in a single vectorized call.
+    
+    Args:
+        uids (list): RFID UIDs to score, or None to score every user in the logs
+        gym_id (str): Site the users belong to (defaults to the default site)
         
-        # Calculate base metrics
+    Yields:
+        tuple: (uid, result) with the same result payload as calculate_consistency_score
+    """
+    store = get_log_store(gym_id)
+    
+    if uids is None:
+        logs, summaries = store.history()
+        uids = store.uid_counts().keys()
+    else:
+        # Normalize and de-duplicate while keeping the requested order
+        uids = list(dict.fromkeys(uid.upper() for uid in uids))
+        logs, summaries = store.get_users_history(uids)
+    
+    try:
         today = datetime.datetime.now().date()
-        earliest_visit = min(daily_visits.index)
-        total_days = (today - earliest_visit).days + 1
-        visit_days = len(daily_visits)
-        
-        # Extract visit patterns
-        user_logs['hour'] = user_logs['DateTime'].dt.hour
-        user_logs['day_of_week'] = user_logs['DateTime'].dt.dayofweek  # 0=Monday, 6=Sunday
-        
-        # Feature extraction for ML model
-        
-        # 1. Frequency features
-        frequency = visit_days / total_days
-        
-        # 2. Regularity features - how consistent are the days between visits
-        visit_dates = sorted(daily_visits.index)
-        if len(visit_dates) > 1:
-            gaps = [(visit_dates[i+1] - visit_dates[i]).days for i in range(len(visit_dates)-1)]
-            avg_gap = sum(gaps) / len(gaps)
-            gap_std = np.std(gaps) if len(gaps) > 1 else 0
-            consistency = 1 / (1 + gap_std) if gap_std > 0 else 1  # Higher consistency with lower std dev
+        with stage_timer('batch_features'):
+            features = build_feature_matrix(logs, today, summaries)
+        with stage_timer('model_load'):
+            models = get_model_registry(gym_id).get()
+        ml_scores = dict(zip(features.index, apply_ml_model_batch(features[FEATURE_COLUMNS].to_numpy(), models, gym_id)))
+        all_features = features.to_dict('index')
+    except Exception as e:
+        for uid in uids:
+            yield uid, {"score": 0, "error": str(e)}
+        return
+    
+    for uid in uids:
+        if uid not in all_features:
+            yield uid, {"error": f"No gym attendance records found for RFID: {uid}"}
         else:
-            avg_gap = 0
-            gap_std = 0
-            consistency = 0
-            
-        # 3. Time of day preference
-        morning_visits = len(user_logs[user_logs['hour'] < 12])
-        afternoon_visits = len(user_logs[(user_logs['hour'] >= 12) & (user_logs['hour'] < 18)])
-        evening_visits = len(user_logs[user_logs['hour'] >= 18])
-        
-        # 4. Day of week pattern
-        day_counts = user_logs.groupby('day_of_week').size()
-        days_visited = len(day_counts)
-        
-        # 5. Recent activity
-        last_visit_date = max(daily_visits.index)
-        days_since_last_visit = (today - last_visit_date).days
-        
-        # Generate user features for ML model
-        features = {
-            'frequency': frequency,
-            'visit_days': visit_days, 
-            'total_days': total_days,
-            'avg_gap': avg_gap,
-            'gap_std': gap_std,
-            'consistency': consistency,
-            'days_visited': days_visited,
-            'morning_ratio': morning_visits / len(user_logs) if len(user_logs) > 0 else 0,
-            'afternoon_ratio': afternoon_visits / len(user_logs) if len(user_logs) > 0 else 0,
-            'evening_ratio': evening_visits / len(user_logs) if len(user_logs) > 0 else 0,
-            'days_since_last_visit': days_since_last_visit
-        }
+            yield uid, build_score_result(all_features[uid], float(ml_scores[uid]), models)
+
+
+def calculate_score_history(uid, start, end, step_days=7, gym_id=None):
+    """
+    Calculate a user's consistency score as of a series of past dates in one pass.
+    
+    The points fall every step_days days ending on `end`. Scores are computed from
+    prefix sums over the user's swipes (see features.aggregate_history), and the
+    ML model is applied to all points in one vectorized call, so a year of weekly
+    points costs about the same as a single score.
+    
+    Args:
+        uid (str): RFID UID of the user
+        start (date): Earliest date to score
+        end (date): Latest date to score
+        step_days (int): Days between points
+        gym_id (str): Site the user belongs to (defaults to the default site)
         
-        # Add day of week proportions
-        for i in range(7):
-            day_name = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][i]
-            features[f'day_{day_name}_ratio'] = day_counts.get(i, 0) / len(user_logs) if len(user_logs) > 0 else 0
-            
-        # Calculate traditional score based on heuristics (similar to original implementation)
-        frequency_score = min(40, (frequency * 100) * 0.4)
-        
-        regularity_score = min(30, (days_visited / 7) * 15 + (1 - min(1, gap_std / 10)) * 15)
-        
-        recency_score = 0
-        if days_since_last_visit == 0:
-            recency_score = 30
-        elif days_since_last_visit <= 2:
-            recency_score = 25
-        elif days_since_last_visit <= 5:
-            recency_score = 15
-        elif days_since_last_visit <= 10:
-            recency_score = 10
-        else:
-            recency_score = max(0, 30 - days_since_last_visit)
+    Returns:
+        dict: {"uid", "points": [score payload plus "date"]}, skipping dates before the first swipe
+    """
+    try:
+        uid = uid.upper()
+        store = get_log_store(gym_id)
+        with stage_timer('model_load'):
+            models = get_model_registry(gym_id).get()
+        
+        cache = get_score_cache()
+        with stage_timer('cache_lookup'):
+            cache_key = ('history', store.gym_id, uid, store.user_version(uid), models.version if models else None, start, end, step_days)
+            result = cache.get(cache_key)
+        if result is not None:
+            return result
+        
+        # Swipes after the last point don't count (a range query on indexed backends)
+        user_logs, summaries = store.get_user_history(uid, end=end + datetime.timedelta(days=1))
+        if user_logs.empty and (summaries is None or summaries.empty) and uid not in store.uid_counts():
+            return {"error": f"No gym attendance records found for RFID: {uid}"}
         
-        traditional_score = frequency_score + regularity_score + recency_score
+        with stage_timer('history_features'):
+            days = np.arange(day_number(end), day_number(start) - 1, -step_days)[::-1]
+            aggregates = aggregate_history(user_logs, days, summaries)
+            features = finalize_features(aggregates, aggregates.index.to_numpy())
         
-        # Apply ML model enhancement
-        ml_score = apply_ml_model(features)
+        ml_scores = apply_ml_model_batch(features[FEATURE_COLUMNS].to_numpy(), models, gym_id)
+        points = [
+            {
+                "date": datetime.date.fromordinal(EPOCH_ORDINAL + day).isoformat(),
+                **build_score_result(point_features, float(ml_score), models),
+            }
+            for (day, point_features), ml_score in zip(features.to_dict('index').items(), ml_scores)
+        ]
         
-        # Blend traditional and ML scores
-        final_score = round(0.7 * traditional_score + 0.3 * ml_score)
+        result = {"uid": uid, "points": points}
+        cache.set(cache_key, result)
+        return result
         
-        # User profile classification through clustering
-        user_type, user_insights = classify_user_profile(features)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def build_score_result(features, ml_score, models):
+    """
+    Blend heuristic and ML scores and assemble the score response for one user.
+    
+    Args:
+        features (dict): User features extracted from gym visit data
+        ml_score (float): Score from apply_ml_model
+        models (ModelBundle): Models that produced ml_score (None for the heuristic fallback)
         
-        # Prepare response with comprehensive insights
-        result = {
-            "score": final_score,
-            "user_type": user_type,
-            "insights": user_insights,
-            "frequency": {
-                "days_visited": visit_days,
-                "total_days": total_days,
-                "percentage": round(frequency * 100, 1),
-                "score": round(frequency_score)
-            },
-            "regularity": {
-                "distinct_days": days_visited,
-                "avg_gap_between_visits": round(avg_gap, 1),
-                "consistency_metric": round(consistency * 100, 1),
-                "score": round(regularity_score),
-                "day_pattern": {
-                    "Monday": round(features["day_Monday_ratio"] * 100),
-                    "Tuesday": round(features["day_Tuesday_ratio"] * 100),
-                    "Wednesday": round(features["day_Wednesday_ratio"] * 100),
-                    "Thursday": round(features["day_Thursday_ratio"] * 100),
-                    "Friday": round(features["day_Friday_ratio"] * 100),
-                    "Saturday": round(features["day_Saturday_ratio"] * 100),
-                    "Sunday": round(features["day_Sunday_ratio"] * 100)
-                },
-                "time_pattern": {
-                    "morning": round(features["morning_ratio"] * 100),
-                    "afternoon": round(features["afternoon_ratio"] * 100),
-                    "evening": round(features["evening_ratio"] * 100)
-                }
+    Returns:
+        dict: Score, classification and insights for the user
+    """
+    visit_days = features['visit_days']
+    total_days = features['total_days']
+    frequency = features['frequency']
+    avg_gap = features['avg_gap']
+    consistency = features['consistency']
+    days_visited = features['days_visited']
+    days_since_last_visit = features['days_since_last_visit']
+    
+    # The same blend the leaderboard ranks by, on a one-row input
+    scores = score_components({column: [features[column]] for column in BLEND_COLUMNS}, [ml_score])
+    frequency_score = float(scores['frequency'][0])
+    regularity_score = float(scores['regularity'][0])
+    recency_score = float(scores['recency'][0])
+    final_score = int(scores['score'][0])
+    
+    # User profile classification through clustering
+    with stage_timer('classify'):
+        user_type, user_insights = classify_user_profile(features)
+    
+    # Prepare response with comprehensive insights
+    result = {
+        "score": final_score,
+        "user_type": user_type,
+        "insights": user_insights,
+        "frequency": {
+            "days_visited": visit_days,
+            "total_days": total_days,
+            "percentage": round(frequency * 100, 1),
+            "score": round(frequency_score)
+        },
+        "regularity": {
+            "distinct_days": days_visited,
+            "avg_gap_between_visits": round(avg_gap, 1),
+            "consistency_metric": round(consistency * 100, 1),
+            "score": round(regularity_score),
+            "day_pattern": {
+                "Monday": round(features["day_Monday_ratio"] * 100),
+                "Tuesday": round(features["day_Tuesday_ratio"] * 100),
+                "Wednesday": round(features["day_Wednesday_ratio"] * 100),
+                "Thursday": round(features["day_Thursday_ratio"] * 100),
+                "Friday": round(features["day_Friday_ratio"] * 100),
+                "Saturday": round(features["day_Saturday_ratio"] * 100),
+                "Sunday": round(features["day_Sunday_ratio"] * 100)
             },
-            "recency": {
-                "days_since_last_visit": days_since_last_visit,
-                "score": round(recency_score)
+            "time_pattern": {
+                "morning": round(features["morning_ratio"] * 100),
+                "afternoon": round(features["afternoon_ratio"] * 100),
+                "evening": round(features["evening_ratio"] * 100)
             }
+        },
+        "recency": {
+            "days_since_last_visit": days_since_last_visit,
+            "score": round(recency_score)
+        },
+        "model_version": models.version if models else None
+    }
+    
+    # Session details when the features were built with them (see features.sessionize)
+    if 'sessions' in features:
+        result["sessions"] = {
+            "count": features['sessions'],
+            "duplicate_taps": features['duplicate_taps'],
+            "paired": features['paired_sessions'],
+            "avg_duration_minutes": round(features['avg_session_minutes'], 1),
+            "total_dwell_hours": round(features['dwell_hours'], 1)
         }
+    
+    return result
+
+
+# Features the blended score depends on (see score_components)
+BLEND_COLUMNS = ['frequency', 'days_visited', 'gap_std', 'days_since_last_visit']
+
+
+def score_components(features, ml_scores):
+    """
+    Blend heuristic and ML scores for many users at once.
+    
+    This is the only implementation of the score formula: build_score_result
+    calls it with one row, the leaderboard with every member.
+    
+    Args:
+        features (DataFrame): BLEND_COLUMNS, one row per user (or a dict of columns)
+        ml_scores (ndarray): Scores from apply_ml_model_batch for the same rows
         
-        return result
+    Returns:
+        dict: Arrays of the "frequency", "regularity" and "recency" heuristic
+            scores and the integer blended "score", one entry per row
+    """
+    frequency = np.asarray(features['frequency'], dtype=np.float64)
+    days_visited = np.asarray(features['days_visited'], dtype=np.float64)
+    gap_std = np.asarray(features['gap_std'], dtype=np.float64)
+    days_since_last_visit = np.asarray(features['days_since_last_visit'], dtype=np.float64)
+    
+    # Calculate traditional score based on heuristics (similar to original implementation)
+    frequency_score = np.minimum(40, (frequency * 100) * 0.4)
+    regularity_score = np.minimum(30, (days_visited / 7) * 15 + (1 - np.minimum(1, gap_std / 10)) * 15)
+    recency_score = np.select(
+        [days_since_last_visit == 0, days_since_last_visit <= 2, days_since_last_visit <= 5, days_since_last_visit <= 10],
+        [30, 25, 15, 10],
+        default=np.maximum(0, 30 - days_since_last_visit),
+    )
+    
+    traditional_score = frequency_score + regularity_score + recency_score
+    # Blend traditional and ML scores; np.round rounds half to even, like round()
+    final_score = np.round(0.7 * traditional_score + 0.3 * np.asarray(ml_scores, dtype=np.float64)).astype(np.int64)
+    return {"frequency": frequency_score, "regularity": regularity_score, "recency": recency_score, "score": final_score}
+
+
+def final_scores(features, ml_scores):
+    """
+    Compute the blended score of build_score_result for many users at once.
+    
+    Args:
+        features (DataFrame): Features from finalize_features, one row per user
+        ml_scores (ndarray): Scores from apply_ml_model_batch for the same rows
         
-    except Exception as e:
-        return {"score": 0, "error": str(e)}
+    Returns:
+        ndarray: Integer scores, one per row
+    """
+    return score_components(features, ml_scores)['score']
 
 
-def apply_ml_model(features):
+def apply_ml_model(features, models=None, gym_id=None):
     """
     Apply a machine learning model to enhance the consistency score.
     If the model doesn't exist yet, falls back to a heuristic approach.
     
     Args:
         features (dict): User features extracted from gym visit data
+        models (ModelBundle): Loaded model and scaler (defaults to the site's current bundle)
+        gym_id (str): Site whose models to use when models isn't given
         
     Returns:
         float: ML-enhanced score from 0-100
     """
-    model_path = 'app/models/gym_consistency_model.joblib'
-    scaler_path = 'app/models/gym_consistency_scaler.joblib'
+    # Convert features to vector
+    feature_vector = np.array([features[column] for column in FEATURE_COLUMNS]).reshape(1, -1)
+    
+    return float(apply_ml_model_batch(feature_vector, models, gym_id)[0])
+
+
+def apply_ml_model_batch(feature_matrix, models=None, gym_id=None):
+    """
+    Apply the machine learning model to many users in one vectorized call.
+    If the model doesn't exist yet, falls back to a heuristic approach.
+    
+    Args:
+        feature_matrix (ndarray): One row per user, columns in FEATURE_COLUMNS order
+        models (ModelBundle): Loaded model and scaler (defaults to the site's current bundle)
+        gym_id (str): Site whose models to use when models isn't given
+        
+    Returns:
+        ndarray: ML-enhanced scores from 0-100, one per row
+    """
+    frequency = feature_matrix[:, FEATURE_COLUMNS.index('frequency')]
     
     try:
+        if models is None:
+            models = get_model_registry(gym_id).get()
+        
         # Check if model exists
-        if os.path.exists(model_path) and os.path.exists(scaler_path):
-            # Load model and scaler
-            model = joblib.load(model_path)
-            scaler = joblib.load(scaler_path)
-            
-            # Convert features to vector
-            feature_vector = np.array([
-                features['frequency'],
-                features['consistency'],
-                features['days_since_last_visit'],
-                features['morning_ratio'],
-                features['afternoon_ratio'],
-                features['evening_ratio'],
-                features['day_Monday_ratio'],
-                features['day_Tuesday_ratio'],
-                features['day_Wednesday_ratio'],
-                features['day_Thursday_ratio'],
-                features['day_Friday_ratio'],
-                features['day_Saturday_ratio'],
-                features['day_Sunday_ratio']
-            ]).reshape(1, -1)
-            
+        if models is not None:
             # Scale features
-            scaled_features = scaler.transform(feature_vector)
+            with stage_timer('scale'):
+                scaled_features = models.scaler.transform(feature_matrix)
             
             # Get prediction from model (assumes model outputs a score from 0-100)
-            score = float(model.predict(scaled_features)[0])
-            
-            return score
+            with stage_timer('predict'):
+                return models.model.predict(scaled_features).astype(float)
         else:
             # If model doesn't exist, fall back to a synthetic score based on features
             frequency_weight = 45
@@ -234,23 +379,18 @@ def apply_ml_model(features):
             recency_weight = 25
             
             # Frequency component
-            frequency_component = features['frequency'] * 100
+            frequency_component = frequency * 100
             
             # Consistency component
-            consistency_component = features['consistency'] * 100
+            consistency_component = feature_matrix[:, FEATURE_COLUMNS.index('consistency')] * 100
             
             # Recency component (higher score for more recent visits)
-            recency_days = features['days_since_last_visit']
-            if recency_days == 0:
-                recency_component = 100
-            elif recency_days <= 2:
-                recency_component = 80
-            elif recency_days <= 5:
-                recency_component = 60
-            elif recency_days <= 10:
-                recency_component = 40
-            else:
-                recency_component = max(0, 100 - recency_days * 3)
+            recency_days = feature_matrix[:, FEATURE_COLUMNS.index('days_since_last_visit')]
+            recency_component = np.select(
+                [recency_days == 0, recency_days <= 2, recency_days <= 5, recency_days <= 10],
+                [100, 80, 60, 40],
+                default=np.maximum(0, 100 - recency_days * 3)
+            )
                 
             # Combine components
             synthetic_score = (
@@ -263,7 +403,7 @@ def apply_ml_model(features):
     except Exception as e:
         print(f"ML model error: {e}")
         # Fallback if anything fails
-        return features['frequency'] * 100
+        return frequency * 100
 
 
 def classify_user_profile(features):
@@ -350,107 +490,83 @@ def classify_user_profile(features):
     return user_type, insights
 
 
-def train_models_from_data():
+def train_models_from_data(store=None, progress=None, registry=None):
     """
     Train ML models for scoring and clustering based on existing data.
+    
+    Args:
+        store (RFIDLogStore): Logs to train on (defaults to the shared log store)
+        progress (callable): Called with the name of each stage as it starts
+        registry (ModelRegistry): Where to save the models (defaults to the shared registry)
+        
+    Returns:
+        dict: Training status with the new model version, dataset size and stage timings
     """
+    timings = {}
+    
+    def stage(name):
+        if progress is not None:
+            progress(name)
+        timings[name] = time.perf_counter()
+    
+    def finish_stage(name):
+        timings[name] = round(time.perf_counter() - timings[name], 4)
+    
     try:
-        # Use absolute path to the CSV file
-        csv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'RFID_logs.csv')
-        
-        # Load RFID logs
-        df = pd.read_csv(csv_path)
+        # Load RFID logs from the shared log store
+        stage('load')
+        df, summaries = (store or get_log_store()).history()
+        finish_stage('load')
         
-        if df.empty:
+        if df.empty and (summaries is None or summaries.empty):
             return {"error": "No data available for training"}
             
-        # Get unique users
-        unique_uids = df['UID'].unique()
+        # Extract features for all users in one pass
+        stage('features')
+        today = datetime.datetime.now().date()
+        features = build_feature_matrix(df, today, summaries)
+        dataset = {
+            "swipes": len(df) + (int(summaries['swipes'].sum()) if summaries is not None else 0),
+            "users": len(features),
+            "sessions": int(features['sessions'].sum()),
+            "duplicate_taps": int(features['duplicate_taps'].sum())
+        }
         
-        # Extract features for all users
-        all_features = []
+        # Skip users with too few visits
+        features = features[features['visit_days'] >= 3]
+        dataset["trained_users"] = len(features)
+        finish_stage('features')
         
-        for uid in unique_uids:
-            user_logs = df[df['UID'] == uid].copy()
+        if features.empty:
+            return {"error": "Not enough data to train models", "dataset": dataset}
             
-            # Convert date strings to datetime objects
-            user_logs['DateTime'] = pd.to_datetime(user_logs['Date'] + ' ' + user_logs['Time'])
-            user_logs['Date'] = pd.to_datetime(user_logs['Date'])
-            
-            # Group by date to count visits per day
-            daily_visits = user_logs.groupby(user_logs['Date'].dt.date).size()
-            
-            # Skip users with too few visits
-            if len(daily_visits) < 3:
-                continue
-                
-            # Calculate metrics (similar to those in calculate_consistency_score function)
-            today = datetime.datetime.now().date()
-            earliest_visit = min(daily_visits.index)
-            total_days = (today - earliest_visit).days + 1
-            visit_days = len(daily_visits)
-            
-            # Extract features
-            frequency = visit_days / total_days
-            
-            # Gaps between visits
-            visit_dates = sorted(daily_visits.index)
-            gaps = [(visit_dates[i+1] - visit_dates[i]).days for i in range(len(visit_dates)-1)]
-            avg_gap = sum(gaps) / len(gaps) if gaps else 0
-            gap_std = np.std(gaps) if len(gaps) > 1 else 0
-            consistency = 1 / (1 + gap_std) if gap_std > 0 else 1
-            
-            # Time and day patterns
-            user_logs['hour'] = user_logs['DateTime'].dt.hour
-            user_logs['day_of_week'] = user_logs['DateTime'].dt.dayofweek
-            
-            morning_visits = len(user_logs[user_logs['hour'] < 12])
-            afternoon_visits = len(user_logs[(user_logs['hour'] >= 12) & (user_logs['hour'] < 18)])
-            evening_visits = len(user_logs[user_logs['hour'] >= 18])
-            
-            day_counts = user_logs.groupby('day_of_week').size()
-            days_visited = len(day_counts)
-            
-            # Recent activity
-            last_visit_date = max(daily_visits.index)
-            days_since_last_visit = (today - last_visit_date).days
-            
-            # Create feature vector
-            feature_vector = [
-                frequency,
-                consistency,
-                days_since_last_visit,
-                morning_visits / len(user_logs) if len(user_logs) > 0 else 0,
-                afternoon_visits / len(user_logs) if len(user_logs) > 0 else 0,
-                evening_visits / len(user_logs) if len(user_logs) > 0 else 0
-            ]
-            
-            # Add day of week ratios
-            for i in range(7):
-                feature_vector.append(day_counts.get(i, 0) / len(user_logs) if len(user_logs) > 0 else 0)
-                
-            all_features.append(feature_vector)
+        X = features[FEATURE_COLUMNS].to_numpy()
         
-        if not all_features:
-            return {"error": "Not enough data to train models"}
-            
-        # Convert to numpy array
-        X = np.array(all_features)
+        # sklearn is only needed for fitting; serving scores with numpy alone
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import StandardScaler
         
         # Scale features
+        stage('fit')
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
         
         # Train K-means clustering model
         kmeans = KMeans(n_clusters=4, random_state=42)
         kmeans.fit(X_scaled)
-        
-        # Save models
-        os.makedirs('app/models', exist_ok=True)
-        joblib.dump(kmeans, 'app/models/gym_consistency_model.joblib')
-        joblib.dump(scaler, 'app/models/gym_consistency_scaler.joblib')
-        
-        return {"success": "Models trained successfully"}
+        finish_stage('fit')
+        
+        # Save models and swap them in for serving
+        stage('save')
+        model_version = (registry or get_model_registry()).save(kmeans, scaler)
+        finish_stage('save')
+        
+        return {
+            "success": "Models trained successfully",
+            "model_version": model_version,
+            "dataset": dataset,
+            "timings": timings
+        }
         
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -0,0 +1,310 @@
+import bisect
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.utils.features import FEATURE_COLUMNS, aggregate_visits, finalize_features
+from app.utils.gym_utils import apply_ml_model_batch, final_scores
+from app.utils.log_store import get_log_store
+from app.utils.metrics import stage_timer
+from app.utils.model_registry import get_model_registry
+from app.utils.sites import get_site
+
+# Scores are blended into integers in [0, MAX_SCORE]
+MAX_SCORE = 100
+
+
+class ScoreIndex:
+    """
+    Members ordered by score (highest first, ties by UID).
+
+    Scores are small integers, so members sit in one bucket per score, each kept
+    sorted by UID, and a Fenwick tree over the bucket sizes counts the members
+    above any score. Rank and percentile are a prefix sum, and the bucket holding
+    the n-th member is found by descending the tree, so all of them take
+    O(log MAX_SCORE); listing k members from there takes O(k). Moving a member to
+    another score is two tree updates plus a bisect into the bucket.
+
+    Positions count down from the top: position 0 holds score MAX_SCORE.
+    """
+
+    def __init__(self, max_score=MAX_SCORE):
+        self.max_score = max_score
+        self.size = max_score + 1
+        self._tree = [0] * (self.size + 1)
+        self._buckets = [[] for _ in range(self.size)]
+        self._scores = {}
+
+    @classmethod
+    def from_scores(cls, uids, scores, max_score=MAX_SCORE):
+        """
+        Build an index for many members at once.
+
+        Args:
+            uids (array): Member UIDs
+            scores (ndarray): Integer score per member
+        """
+        index = cls(max_score)
+        uids = np.asarray(uids, dtype=object)
+        positions = max_score - np.clip(np.asarray(scores, dtype=np.int64), 0, max_score)
+        order = np.lexsort((uids.astype(str), positions))
+        uids = uids[order].tolist()
+        positions = positions[order]
+
+        counts = np.bincount(positions, minlength=index.size)
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        for position in np.flatnonzero(counts).tolist():
+            index._buckets[position] = uids[bounds[position]:bounds[position + 1]]
+        index._scores = dict(zip(uids, (max_score - positions).tolist()))
+
+        # Linear-time Fenwick construction: push each node's total up to its parent
+        tree = [0] + counts.tolist()
+        for i in range(1, index.size + 1):
+            parent = i + (i & -i)
+            if parent <= index.size:
+                tree[parent] += tree[i]
+        index._tree = tree
+        return index
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, uid):
+        return uid in self._scores
+
+    def score(self, uid):
+        return self._scores.get(uid)
+
+    def _add(self, position, delta):
+        i = position + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _above(self, position):
+        # Members in positions [0, position), i.e. with a higher score
+        total = 0
+        i = position
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _find(self, order):
+        # Position holding the order-th member (0-based) and the members before it
+        position = 0
+        before = 0
+        step = 1 << (self.size.bit_length() - 1)
+        while step:
+            candidate = position + step
+            if candidate <= self.size and before + self._tree[candidate] <= order:
+                position = candidate
+                before += self._tree[candidate]
+            step >>= 1
+        return position, before
+
+    def set(self, uid, score):
+        """
+        Insert a member or move them to a new score.
+        """
+        score = min(max(int(score), 0), self.max_score)
+        old = self._scores.get(uid)
+        if old == score:
+            return
+        if old is not None:
+            self.remove(uid)
+        position = self.max_score - score
+        bisect.insort(self._buckets[position], uid)
+        self._add(position, 1)
+        self._scores[uid] = score
+
+    def remove(self, uid):
+        score = self._scores.pop(uid, None)
+        if score is None:
+            return
+        position = self.max_score - score
+        bucket = self._buckets[position]
+        del bucket[bisect.bisect_left(bucket, uid)]
+        self._add(position, -1)
+
+    def rank(self, uid):
+        """
+        Get a member's rank (1 = best; members on the same score share a rank).
+
+        Returns:
+            tuple: (rank, members scoring lower), or None if the UID isn't indexed
+        """
+        score = self._scores.get(uid)
+        if score is None:
+            return None
+        position = self.max_score - score
+        above = self._above(position)
+        return above + 1, len(self._scores) - above - len(self._buckets[position])
+
+    def top(self, limit, offset=0):
+        """
+        List members from the offset-th best onwards.
+
+        Returns:
+            list: (rank, uid, score) tuples, at most limit of them
+        """
+        if offset >= len(self._scores) or limit <= 0:
+            return []
+        position, before = self._find(offset)
+        skip = offset - before
+        members = []
+        while position < self.size and len(members) < limit:
+            bucket = self._buckets[position]
+            score = self.max_score - position
+            for uid in bucket[skip:skip + limit - len(members)]:
+                members.append((before + 1, uid, score))
+            before += len(bucket)
+            skip = 0
+            position += 1
+        return members
+
+
+class Leaderboard:
+    """
+    Every member's current score for one site, kept in a ScoreIndex.
+
+    Per-member visit aggregates are built once from the whole log. After that the
+    log store's append listener marks members whose rows changed, and only those
+    are re-aggregated and rescored on the next query. Scores also depend on the
+    date (recency, days since the first visit) and the model, so on the first
+    query of a new day, or after a retrain, every member is rescored in one
+    batched, vectorized pass over the stored aggregates without re-reading the log.
+    A full reload of the log rebuilds everything.
+    """
+
+    def __init__(self, gym_id, store):
+        self.gym_id = gym_id
+        self.store = store
+        self._index = ScoreIndex()
+        self._aggregates = None
+        self._load_signature = None
+        self._scored_for = None
+        self._lock = threading.Lock()
+        # Filled by the store listener; separate lock, since that runs under the store's lock
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+
+    def notify(self, uids):
+        """
+        Log store listener: mark members whose rows changed.
+        """
+        with self._dirty_lock:
+            self._dirty.update(uids)
+
+    def _score(self, aggregates, models, today):
+        features = finalize_features(aggregates, today)
+        ml_scores = apply_ml_model_batch(features[FEATURE_COLUMNS].to_numpy(), models, self.gym_id)
+        return final_scores(features, ml_scores)
+
+    def _refresh(self):
+        # Bring the index up to date with the log, the models and today's date (caller holds _lock)
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        load_signature = self.store.dataset_version()[0]
+        models = get_model_registry(self.gym_id).get()
+        scored_for = (models.version if models else None, datetime.date.today())
+
+        if self._aggregates is None or load_signature != self._load_signature:
+            with stage_timer('leaderboard_build'):
+                self._aggregates = aggregate_visits(*self.store.history())
+            self._load_signature = load_signature
+            self._scored_for = None
+        elif dirty:
+            with stage_timer('leaderboard_update'):
+                changed = aggregate_visits(*self.store.get_users_history(list(dirty)))
+                existing = changed.index.intersection(self._aggregates.index)
+                self._aggregates.loc[existing] = changed.loc[existing]
+                added = changed.index.difference(self._aggregates.index)
+                if len(added):
+                    self._aggregates = pd.concat([self._aggregates, changed.loc[added]])
+                if scored_for == self._scored_for:
+                    for uid, score in zip(changed.index, self._score(changed, models, scored_for[1]).tolist()):
+                        self._index.set(uid, score)
+
+        if scored_for != self._scored_for:
+            # Nightly decay / retrain: rescore everyone in one batch
+            with stage_timer('leaderboard_rescore'):
+                scores = self._score(self._aggregates, models, scored_for[1])
+                self._index = ScoreIndex.from_scores(self._aggregates.index.to_numpy(), scores)
+            self._scored_for = scored_for
+
+    def top(self, limit=10, offset=0):
+        """
+        Get a page of the leaderboard.
+
+        Returns:
+            dict: {"members": [{"rank", "uid", "score"}], "total": member count, "date"}
+        """
+        try:
+            with self._lock:
+                self._refresh()
+                members = self._index.top(limit, offset)
+                return {
+                    "members": [{"rank": rank, "uid": uid, "score": score} for rank, uid, score in members],
+                    "total": len(self._index),
+                    "date": self._scored_for[1].isoformat(),
+                }
+        except Exception as e:
+            return {"error": str(e)}
+
+    def rank(self, uid):
+        """
+        Get a member's standing, e.g. "top 12% of members".
+
+        Returns:
+            dict: Score, rank, member count, the share of members ranked at or above
+                them (top_percent) and the share scoring lower (percentile)
+        """
+        try:
+            uid = uid.upper()
+            with self._lock:
+                self._refresh()
+                standing = self._index.rank(uid)
+                if standing is None:
+                    return {"error": f"No gym attendance records found for RFID: {uid}"}
+                rank, below = standing
+                total = len(self._index)
+                return {
+                    "uid": uid,
+                    "score": self._index.score(uid),
+                    "rank": rank,
+                    "members": total,
+                    "top_percent": round(100 * rank / total, 1),
+                    "percentile": round(100 * below / total, 1),
+                    "date": self._scored_for[1].isoformat(),
+                }
+        except Exception as e:
+            return {"error": str(e)}
+
+
+_leaderboards = {}
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard(gym_id=None):
+    """
+    Get a site's leaderboard, creating it (but not yet building it) on first use.
+
+    Args:
+        gym_id (str): Site id, or None for the default site
+
+    Raises:
+        UnknownGymError: If this process doesn't serve the site
+    """
+    site = get_site(gym_id)
+    store = get_log_store(site.gym_id)
+    leaderboard = _leaderboards.get(site.gym_id)
+    if leaderboard is None or leaderboard.store is not store:
+        with _leaderboard_lock:
+            leaderboard = _leaderboards.get(site.gym_id)
+            if leaderboard is None or leaderboard.store is not store:
+                leaderboard = _leaderboards[site.gym_id] = Leaderboard(site.gym_id, store)
+                store.add_listener(leaderboard.notify)
+    return leaderboard
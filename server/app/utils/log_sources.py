@@ -0,0 +1,895 @@
+import csv
+import os
+import sqlite3
+import threading
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from app.utils.features import SESSION_AGGREGATE_COLUMNS, day_summaries, parse_timestamps, summarize_days
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process write lock, run a single writer
+    fcntl = None
+
+LOG_COLUMNS = ['Month', 'Week', 'Day', 'Date', 'Time', 'UID']
+
+# Directory containing RFID_logs.csv (the server/ folder)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNAR_SUFFIX = '.store'
+UIDS_FILENAME = 'uids.txt'
+TIMESTAMPS_FILENAME = 'ts.i64'
+UID_CODES_FILENAME = 'uid.u32'
+WRITE_LOCK_FILENAME = 'write.lock'
+
+SQLITE_SUFFIX = '.sqlite'
+
+# RFID_LOG_BACKEND values and the suffix of their log paths
+LOG_BACKENDS = {'csv': '.csv', 'store': COLUMNAR_SUFFIX, 'sqlite': SQLITE_SUFFIX}
+# UIDs per query when looking up many users (stays under SQLite's bound-parameter limit)
+SQLITE_BATCH_UIDS = 500
+# Daily summaries fetched at a time when reading them all
+SQLITE_SUMMARY_BATCH = 100_000
+
+# Per-day counts packed in daily_summary.counts as little-endian int32: the swipes
+# in each hour of the day, then the session totals (features.SESSION_AGGREGATE_COLUMNS).
+# One value per row keeps reading millions of summaries cheap.
+SUMMARY_COUNTS = 24 + len(SESSION_AGGREGATE_COLUMNS)
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS swipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL,
+    ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS swipes_uid_ts ON swipes (uid, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', lower(hex(randomblob(8))));
+CREATE TABLE IF NOT EXISTS daily_summary (
+    uid TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    swipes INTEGER NOT NULL,
+    counts BLOB NOT NULL,
+    PRIMARY KEY (uid, day)
+) WITHOUT ROWID;
+"""
+
+
+def _unpack_counts(blobs):
+    # daily_summary.counts values as (n x 24 hour counts, n x 4 session totals)
+    counts = np.frombuffer(b''.join(blobs), dtype='<i4').reshape(-1, SUMMARY_COUNTS).astype(np.int32)
+    return counts[:, :24], counts[:, 24:]
+
+
+def _summary_arrays(rows):
+    # (uid, day, counts) rows of daily_summary as (uids, days, n x 24 hour counts, n x 4 session totals)
+    uids, days, blobs = zip(*rows) if rows else ((), (), ())
+    return (np.array(uids, dtype=object), np.array(days, dtype=np.int64), *_unpack_counts(blobs))
+
+
+def _summary_rows(uids, days, hour_counts, session_totals):
+    # The inverse of _summary_arrays, as (uid, day, swipes, counts) parameters for INSERT INTO daily_summary
+    counts = np.ascontiguousarray(np.hstack((hour_counts, session_totals)), dtype='<i4')
+    return zip(list(uids), days.tolist(), hour_counts.sum(axis=1).tolist(), [row.tobytes() for row in counts])
+
+
+def _lock_for_writing(f):
+    # Exclusive flock on an open file, held until it is closed: the RFID listener
+    # and the server's swipe writer can append to the same log from two processes
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def log_suffix(backend):
+    """
+    Get the path suffix of a log backend ('csv', 'store' or 'sqlite').
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    suffix = LOG_BACKENDS.get(backend)
+    if suffix is None:
+        raise ValueError(f"Unknown log backend {backend!r} (expected one of {', '.join(LOG_BACKENDS)})")
+    return suffix
+
+
+def resolve_log_path(log_path=None, backend='csv'):
+    """
+    Resolve the RFID log location.
+
+    An explicit path wins, whatever its format. Otherwise the log is
+    RFID_logs.<suffix> of the configured backend next to the server; a CSV log
+    is also looked for in the CWD. Other files that happen to sit next to the
+    server are never picked up.
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    if log_path:
+        return log_path
+
+    suffix = log_suffix(backend)
+    if suffix != '.csv':
+        return os.path.join(BASE_DIR, 'RFID_logs' + suffix)
+
+    csv_path = os.path.join(BASE_DIR, 'RFID_logs.csv')
+    if not os.path.exists(csv_path):
+        csv_path = os.path.join(os.getcwd(), 'RFID_logs.csv')
+    return csv_path
+
+
+def normalize_logs(df):
+    """
+    Reduce raw log rows to normalized (upper-case) UIDs and parsed timestamps.
+
+    Month/Week/Day/Date/Time are redundant once the timestamp is parsed, so they
+    are not kept in memory.
+    """
+    return pd.DataFrame({
+        'UID': df['UID'].str.upper().to_numpy(),
+        'Timestamp': parse_timestamps(df).to_numpy(),
+    })
+
+
+def to_log_rows(logs):
+    """
+    Expand normalized logs back into [Month, Week, Day, Date, Time, UID] rows.
+    """
+    timestamps = logs['Timestamp'].dt
+    return pd.DataFrame({
+        'Month': timestamps.strftime('%B'),
+        'Week': timestamps.strftime('%U'),
+        'Day': timestamps.strftime('%A'),
+        'Date': timestamps.strftime('%Y-%m-%d'),
+        'Time': timestamps.strftime('%H:%M:%S'),
+        'UID': logs['UID'],
+    })
+
+
+class CSVLogSource:
+    """
+    The original six-column text log (RFID_logs.csv).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def signature(self):
+        """
+        Get a cheap fingerprint of the log that changes whenever it is written.
+
+        Raises:
+            FileNotFoundError: If the log doesn't exist
+        """
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """
+        Load the whole log.
+
+        Returns:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns
+        """
+        df = pd.read_csv(self.path, dtype={'Week': str, 'UID': str})
+
+        # Drop failed reads (swipes logged without a UID)
+        df = df.dropna(subset=['UID'])
+        return normalize_logs(df)
+
+    def load_arrays(self):
+        """
+        Load the log as typed columns, without holding a Python string per row.
+
+        Date, Time and UID are parsed as categoricals, so each distinct value is
+        converted once and rows only carry integer codes.
+
+        Returns:
+            tuple: (epoch seconds as int64, UID codes, UID table)
+        """
+        df = pd.read_csv(self.path, usecols=['Date', 'Time', 'UID'], dtype='category')
+
+        date_codes = df['Date'].cat.codes.to_numpy()
+        time_codes = df['Time'].cat.codes.to_numpy()
+        uid_codes = df['UID'].cat.codes.to_numpy()
+        # Drop failed reads (swipes logged without a UID) and incomplete rows
+        complete = (uid_codes >= 0) & (date_codes >= 0) & (time_codes >= 0)
+
+        dates = pd.to_datetime(df['Date'].cat.categories.astype(str), format='%Y-%m-%d')
+        times = pd.to_timedelta(df['Time'].cat.categories.astype(str))
+        date_seconds = dates.to_numpy().astype('datetime64[s]').astype(np.int64)
+        time_seconds = times.to_numpy().astype('timedelta64[s]').astype(np.int64)
+
+        timestamps = date_seconds[date_codes[complete]] + time_seconds[time_codes[complete]]
+        uids = df['UID'].cat.categories.astype(str).to_numpy(dtype=str)
+        return timestamps, uid_codes[complete], uids
+
+    def iter_chunks(self, chunk_rows):
+        """
+        Read the log in chunks of at most chunk_rows rows, so it never has to fit in memory.
+
+        Yields:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns
+        """
+        # Month/Week/Day are derived from the timestamp, so only Date/Time/UID are parsed
+        for df in pd.read_csv(self.path, dtype={'UID': str}, usecols=['Date', 'Time', 'UID'], chunksize=chunk_rows):
+            df = df.dropna(subset=['UID'])
+            if not df.empty:
+                yield normalize_logs(df)
+
+    def append(self, rows):
+        """
+        Append [Month, Week, Day, Date, Time, UID] rows with a single write.
+
+        Writers in other processes are locked out until the rows are flushed, so
+        their rows never interleave.
+        """
+        with open(self.path, 'a', newline='') as f:
+            _lock_for_writing(f)
+            # Checked under the lock so only the first writer adds the header
+            write_header = os.fstat(f.fileno()).st_size == 0
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(LOG_COLUMNS)
+            writer.writerows(rows)
+
+    def fsync(self):
+        with open(self.path, 'a') as f:
+            os.fsync(f.fileno())
+
+
+class ColumnarLogSource:
+    """
+    Binary columnar log partitioned by month.
+
+    Layout of the store directory:
+        uids.txt          Intern table, line i is the UID with code i
+        YYYY-MM/ts.i64    Swipe times as little-endian int64 epoch seconds
+        YYYY-MM/uid.u32   Swipe UIDs as little-endian uint32 codes
+        write.lock        Held by a writer while it interns UIDs and appends
+
+    Columns are raw arrays, so appends are plain byte appends and loads are a
+    single read per column with no parsing. Writers in several processes take
+    turns through the lock file, so a code is never handed out twice and the
+    two columns of a partition stay row-aligned.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._uid_codes = None
+        self._uids_size = 0
+        self._dirty_files = set()
+
+    def _partitions(self):
+        return sorted(
+            entry.path for entry in os.scandir(self.path)
+            if entry.is_dir() and len(entry.name) == 7 and entry.name[4] == '-'
+        )
+
+    def signature(self):
+        """
+        Get a cheap fingerprint of the store that changes whenever it is written.
+
+        Raises:
+            FileNotFoundError: If the store doesn't exist
+        """
+        paths = [os.path.join(self.path, UIDS_FILENAME)]
+        for partition in self._partitions():
+            paths.append(os.path.join(partition, TIMESTAMPS_FILENAME))
+            paths.append(os.path.join(partition, UID_CODES_FILENAME))
+
+        stats = [os.stat(path) for path in paths if os.path.exists(path)]
+        if not stats:
+            raise FileNotFoundError(f"No columnar RFID log at {self.path}")
+        return (len(stats), max(stat.st_mtime_ns for stat in stats), sum(stat.st_size for stat in stats))
+
+    def load_uids(self):
+        """
+        Get the UID intern table as an array indexed by code.
+        """
+        uids_path = os.path.join(self.path, UIDS_FILENAME)
+        if not os.path.exists(uids_path):
+            return np.array([], dtype=str)
+        with open(uids_path) as f:
+            return np.array(f.read().split(), dtype=str)
+
+    def load_arrays(self):
+        """
+        Load the raw columns.
+
+        Returns:
+            tuple: (epoch seconds as int64, UID codes as uint32, UID intern table)
+        """
+        timestamps = []
+        codes = []
+        for partition in self._partitions():
+            partition_timestamps = np.fromfile(os.path.join(partition, TIMESTAMPS_FILENAME), dtype='<i8')
+            partition_codes = np.fromfile(os.path.join(partition, UID_CODES_FILENAME), dtype='<u4')
+
+            # Ignore the unmatched end of a torn append
+            length = min(len(partition_timestamps), len(partition_codes))
+            timestamps.append(partition_timestamps[:length])
+            codes.append(partition_codes[:length])
+
+        uids = self.load_uids()
+        if not timestamps:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.uint32), uids
+        return np.concatenate(timestamps), np.concatenate(codes), uids
+
+    def load(self):
+        """
+        Load the whole log.
+
+        Returns:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns
+        """
+        timestamps, codes, uids = self.load_arrays()
+        return pd.DataFrame({
+            'UID': uids[codes] if len(codes) else np.array([], dtype=object),
+            'Timestamp': pd.to_datetime(timestamps, unit='s'),
+        })
+
+    def iter_chunks(self, chunk_rows):
+        """
+        Read the store in chunks of at most chunk_rows rows, so it never has to fit in memory.
+
+        Yields:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns
+        """
+        uids = self.load_uids()
+        for partition in self._partitions():
+            timestamps_path = os.path.join(partition, TIMESTAMPS_FILENAME)
+            codes_path = os.path.join(partition, UID_CODES_FILENAME)
+            # Ignore the unmatched end of a torn append
+            length = min(os.path.getsize(timestamps_path) // 8, os.path.getsize(codes_path) // 4)
+
+            for start in range(0, length, chunk_rows):
+                count = min(chunk_rows, length - start)
+                timestamps = np.fromfile(timestamps_path, dtype='<i8', count=count, offset=start * 8)
+                codes = np.fromfile(codes_path, dtype='<u4', count=count, offset=start * 4)
+                if codes.max() >= len(uids):
+                    # UIDs interned by a writer since the table was read
+                    uids = self.load_uids()
+                yield pd.DataFrame({
+                    'UID': uids[codes].astype(object),
+                    'Timestamp': pd.to_datetime(timestamps, unit='s'),
+                })
+
+    def _write_lock(self):
+        # An open lock file holding the store's write lock until it is closed
+        os.makedirs(self.path, exist_ok=True)
+        lock_file = open(os.path.join(self.path, WRITE_LOCK_FILENAME), 'a')
+        _lock_for_writing(lock_file)
+        return lock_file
+
+    def intern_uids(self, uids):
+        """
+        Map UID strings to their codes, adding unseen UIDs to the intern table.
+
+        Returns:
+            ndarray: uint32 code per UID
+        """
+        with self._write_lock():
+            return self._intern_uids(uids)
+
+    def _intern_uids(self, uids):
+        # Re-read the table if another writer extended it
+        uids_path = os.path.join(self.path, UIDS_FILENAME)
+        uids_size = os.path.getsize(uids_path) if os.path.exists(uids_path) else 0
+        if self._uid_codes is None or uids_size != self._uids_size:
+            self._uid_codes = {uid: code for code, uid in enumerate(self.load_uids())}
+            self._uids_size = uids_size
+
+        unique_uids, first_seen, inverse = np.unique(np.asarray(uids, dtype=str), return_index=True, return_inverse=True)
+        # New codes are assigned in order of first appearance
+        new_uids = [uid for uid in unique_uids[np.argsort(first_seen)].tolist() if uid not in self._uid_codes]
+        if new_uids:
+            # New UIDs are interned before any data references their codes
+            with open(uids_path, 'a') as f:
+                f.write(''.join(uid + '\n' for uid in new_uids))
+            self._uids_size = os.path.getsize(uids_path)
+            self._dirty_files.add(uids_path)
+            for uid in new_uids:
+                self._uid_codes[uid] = len(self._uid_codes)
+
+        unique_codes = np.array([self._uid_codes[uid] for uid in unique_uids.tolist()], dtype='<u4')
+        return unique_codes[inverse.reshape(-1)] if len(unique_codes) else unique_codes
+
+    def append_codes(self, timestamps, codes):
+        """
+        Append swipes given as epoch seconds and already-interned UID codes.
+        """
+        with self._write_lock():
+            self._append_codes(timestamps, codes)
+
+    def _append_codes(self, timestamps, codes):
+        timestamps = np.asarray(timestamps, dtype='<i8')
+        codes = np.asarray(codes, dtype='<u4')
+        months = timestamps.astype('datetime64[s]').astype('datetime64[M]')
+
+        for month in np.unique(months):
+            partition = os.path.join(self.path, str(month))
+            os.makedirs(partition, exist_ok=True)
+            in_month = months == month
+            for filename, values in ((TIMESTAMPS_FILENAME, timestamps), (UID_CODES_FILENAME, codes)):
+                file_path = os.path.join(partition, filename)
+                with open(file_path, 'ab') as f:
+                    f.write(values[in_month].tobytes())
+                self._dirty_files.add(file_path)
+
+    def append_arrays(self, timestamps, uids):
+        """
+        Append swipes given as epoch seconds and UID strings.
+        """
+        # One lock for both steps, so no other writer runs in between
+        with self._write_lock():
+            self._append_codes(timestamps, self._intern_uids(uids))
+
+    def append(self, rows):
+        """
+        Append [Month, Week, Day, Date, Time, UID] rows.
+        """
+        logs = normalize_logs(pd.DataFrame(rows, columns=LOG_COLUMNS))
+        self.append_arrays(
+            logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64),
+            logs['UID'].tolist(),
+        )
+
+    def fsync(self):
+        for file_path in self._dirty_files:
+            with open(file_path, 'ab') as f:
+                os.fsync(f.fileno())
+        self._dirty_files.clear()
+
+
+class SQLiteLogSource:
+    """
+    Swipes in an indexed SQLite database.
+
+    Schema:
+        swipes   (id, uid, ts): one row per swipe; upper-case UID and epoch
+                 seconds, indexed on (uid, ts)
+        meta     (key, value): database id and a generation bumped by anything
+                 that deletes rows
+        daily_summary  (uid, day, swipes, counts): swipes of closed days folded
+                 in by compact, one row per member per day; counts packs the
+                 swipes per hour and the session totals (see SUMMARY_COUNTS)
+
+    The database runs in WAL mode, so the RFID listener, the server's swipe writer
+    and any number of readers in other processes can use it at once. Each thread
+    gets its own connection. A user's rows, a time range of them and the per-UID
+    counts are answered from the (uid, ts) index without reading the whole table.
+
+    Once old swipes are compacted, the rows read back are only the raw swipes;
+    the daily summaries are read separately as features.DAY_SUMMARY_COLUMNS
+    frames (load_history, user_history, users_history, iter_summaries) and go
+    straight into the aggregates.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # Every thread's connection, so close() can release them all
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit mode; writes open their own transactions. Connections are
+            # only used by the thread that opened them, but may be closed by another
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # With WAL, commits are made durable at checkpoints (see fsync)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'daily_summary'").fetchone() is None:
+                # Safe to race with another process creating it
+                connection.executescript(SQLITE_SCHEMA)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def signature(self):
+        """
+        Get a cheap fingerprint of the database that changes whenever it is written.
+
+        It is read from the data itself (database id, deletion generation and the
+        last swipe id), so every process sees the same signature for the same
+        contents, and it ends with a count that only grows as swipes are added.
+
+        Raises:
+            FileNotFoundError: If the database doesn't exist
+        """
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"No SQLite RFID log at {self.path}")
+        database_id, generation, last_id = self._connection().execute(
+            "SELECT (SELECT value FROM meta WHERE key = 'database_id'),"
+            " (SELECT value FROM meta WHERE key = 'generation'),"
+            " (SELECT seq FROM sqlite_sequence WHERE name = 'swipes')"
+        ).fetchone()
+        return (database_id, generation or 0, last_id or 0)
+
+    def _read(self, read, *args):
+        # Run read(connection, *args) in one read transaction, so all its queries see the same snapshot
+        connection = self._connection()
+        connection.execute('BEGIN')
+        try:
+            return read(connection, *args)
+        finally:
+            connection.execute('COMMIT')
+
+    @staticmethod
+    def _read_arrays(connection):
+        counts = connection.execute('SELECT uid, COUNT(*) FROM swipes GROUP BY uid ORDER BY uid').fetchall()
+        total = sum(count for _, count in counts)
+        cursor = connection.execute('SELECT ts FROM swipes ORDER BY uid, ts')
+        timestamps = np.fromiter((row[0] for row in cursor), dtype=np.int64, count=total)
+
+        uids = np.array([uid for uid, _ in counts], dtype=str)
+        codes = np.repeat(np.arange(len(counts)), [count for _, count in counts])
+        return timestamps, codes, uids
+
+    def load_arrays(self):
+        """
+        Load every raw swipe grouped by UID, reading the (uid, ts) index in order.
+
+        Returns:
+            tuple: (epoch seconds as int64, UID codes, sorted UID table)
+        """
+        return self._read(self._read_arrays)
+
+    @staticmethod
+    def _read_summaries(connection, where='', params=(), batch_rows=SQLITE_SUMMARY_BATCH):
+        # Daily summaries as DAY_SUMMARY_COLUMNS frames of at most batch_rows rows, ordered by (uid, day)
+        cursor = connection.execute(
+            f"SELECT uid, day, counts FROM daily_summary {where} ORDER BY uid, day", params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                return
+            uids, days, hour_counts, session_totals = _summary_arrays(rows)
+            yield day_summaries(uids, days, hour_counts, session_totals)
+
+    @classmethod
+    def _summaries(cls, connection, where='', params=()):
+        frames = list(cls._read_summaries(connection, where, params))
+        if not frames:
+            return day_summaries(np.array([], dtype=object), [], np.zeros((0, 24)), np.zeros((0, 4)))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    @classmethod
+    def _read_history(cls, connection):
+        arrays = cls._read_arrays(connection)
+
+        # Summaries are read without their UIDs and get a categorical one instead:
+        # there can be one for every member-day of the history
+        counts = connection.execute('SELECT uid, COUNT(*) FROM daily_summary GROUP BY uid ORDER BY uid').fetchall()
+        codes = np.repeat(np.arange(len(counts), dtype=np.int32), [count for _, count in counts])
+        frames = []
+        read = 0
+        cursor = connection.execute('SELECT day, counts FROM daily_summary ORDER BY uid, day')
+        while True:
+            rows = cursor.fetchmany(SQLITE_SUMMARY_BATCH)
+            if not rows:
+                break
+            days = np.fromiter(map(itemgetter(0), rows), dtype=np.int32, count=len(rows))
+            frames.append(day_summaries(codes[read:read + len(rows)], days, *_unpack_counts(map(itemgetter(1), rows))))
+            read += len(rows)
+
+        summaries = pd.concat(frames, ignore_index=True) if frames else cls._summaries(connection, 'WHERE 0')
+        summaries['UID'] = pd.Categorical.from_codes(codes[:read], categories=[uid for uid, _ in counts])
+        return arrays, summaries
+
+    def load_history(self):
+        """
+        Load every raw swipe and every daily summary from one snapshot, so a
+        compaction running meanwhile can't count a day twice or drop it.
+
+        Returns:
+            tuple: (load_arrays tuple, features.DAY_SUMMARY_COLUMNS frame with a
+                categorical UID, ordered by UID and day)
+        """
+        return self._read(self._read_history)
+
+    def load(self):
+        """
+        Load the whole log.
+
+        Returns:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns of the raw
+                swipes (see load_history for the compacted days)
+        """
+        timestamps, codes, uids = self.load_arrays()
+        return pd.DataFrame({
+            'UID': uids[codes].astype(object) if len(codes) else np.array([], dtype=object),
+            'Timestamp': pd.to_datetime(timestamps, unit='s'),
+        })
+
+    def load_summary_swipes(self):
+        """
+        Recreate swipes for the compacted days: as many as each hour had, at the
+        start of that hour (the times within it weren't kept).
+
+        Returns:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns
+        """
+        frames = []
+        cursor = self._connection().execute('SELECT uid, day, counts FROM daily_summary')
+        while True:
+            rows = cursor.fetchmany(SQLITE_SUMMARY_BATCH)
+            if not rows:
+                break
+            uids, days, hour_counts, _ = _summary_arrays(rows)
+            row, hour = np.nonzero(hour_counts)
+            repeats = hour_counts[row, hour]
+            frames.append(pd.DataFrame({
+                'UID': np.repeat(uids[row], repeats),
+                'Timestamp': np.repeat(days[row] * 86400 + hour * 3600, repeats).astype('datetime64[s]'),
+            }))
+        if not frames:
+            return pd.DataFrame({'UID': np.array([], dtype=object), 'Timestamp': np.array([], dtype='datetime64[s]')})
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_summaries(self, batch_rows):
+        """
+        Read the daily summaries in batches of at most batch_rows rows.
+
+        Yields:
+            DataFrame: features.DAY_SUMMARY_COLUMNS
+        """
+        yield from self._read_summaries(self._connection(), batch_rows=batch_rows)
+
+    def iter_chunks(self, chunk_rows):
+        """
+        Read the raw swipes in chunks of at most chunk_rows rows, in insertion
+        order, so the database never has to fit in memory (see iter_summaries
+        for the compacted days).
+
+        Yields:
+            DataFrame: Normalized 'UID' and 'Timestamp' columns
+        """
+        cursor = self._connection().execute('SELECT uid, ts FROM swipes ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            uids, timestamps = zip(*rows)
+            yield pd.DataFrame({
+                'UID': np.array(uids, dtype=object),
+                'Timestamp': pd.to_datetime(np.array(timestamps, dtype=np.int64), unit='s'),
+            })
+
+    def user_timestamps(self, uid, start=None, end=None, max_id=None):
+        """
+        Get one user's swipe times from the (uid, ts) index.
+
+        Args:
+            uid (str): Upper-case RFID UID
+            start (int): Only swipes at or after this epoch second
+            end (int): Only swipes before this epoch second
+            max_id (int): Only swipes with an id up to this one (rows written by then)
+
+        Returns:
+            ndarray: Epoch seconds as int64, ascending
+        """
+        query = 'SELECT ts FROM swipes WHERE uid = ?'
+        params = [uid]
+        for condition, value in (('ts >= ?', start), ('ts < ?', end), ('id <= ?', max_id)):
+            if value is not None:
+                query += ' AND ' + condition
+                params.append(int(value))
+        cursor = self._connection().execute(query + ' ORDER BY ts', params)
+        return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+
+    def users_arrays(self, uids):
+        """
+        Get several users' swipes.
+
+        Args:
+            uids (list): Upper-case RFID UIDs
+
+        Returns:
+            tuple: (epoch seconds as int64, UIDs as an object array)
+        """
+        connection = self._connection()
+        rows = []
+        for i in range(0, len(uids), SQLITE_BATCH_UIDS):
+            batch = uids[i:i + SQLITE_BATCH_UIDS]
+            rows.extend(connection.execute(
+                f"SELECT uid, ts FROM swipes WHERE uid IN ({','.join('?' * len(batch))}) ORDER BY uid, ts", batch
+            ))
+        if not rows:
+            return np.array([], dtype=np.int64), np.array([], dtype=object)
+        found, timestamps = zip(*rows)
+        return np.array(timestamps, dtype=np.int64), np.array(found, dtype=object)
+
+    def user_summaries(self, uid, start_day=None, end_day=None):
+        """
+        Get one user's daily summaries, optionally for days in [start_day, end_day).
+
+        Returns:
+            DataFrame: features.DAY_SUMMARY_COLUMNS ordered by day
+        """
+        where = 'WHERE uid = ?'
+        params = [uid]
+        for condition, value in (('day >= ?', start_day), ('day < ?', end_day)):
+            if value is not None:
+                where += ' AND ' + condition
+                params.append(int(value))
+        return self._summaries(self._connection(), where, params)
+
+    def users_summaries(self, uids):
+        """
+        Get several users' daily summaries.
+
+        Returns:
+            DataFrame: features.DAY_SUMMARY_COLUMNS ordered by UID and day
+        """
+        connection = self._connection()
+        frames = [
+            self._summaries(connection, f"WHERE uid IN ({','.join('?' * len(batch))})", batch)
+            for batch in (uids[i:i + SQLITE_BATCH_UIDS] for i in range(0, len(uids), SQLITE_BATCH_UIDS))
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else self._summaries(connection, 'WHERE 0')
+
+    def user_history(self, uid, start=None, end=None, max_id=None):
+        """
+        Get one user's swipe times (see user_timestamps) and the summaries of the
+        compacted days that start in [start, end), from one snapshot.
+
+        Returns:
+            tuple: (epoch seconds as int64, features.DAY_SUMMARY_COLUMNS frame)
+        """
+        return self._read(lambda connection: (
+            self.user_timestamps(uid, start, end, max_id),
+            self.user_summaries(
+                uid,
+                -(-start // 86400) if start is not None else None,
+                -(-end // 86400) if end is not None else None,
+            ),
+        ))
+
+    def users_history(self, uids):
+        """
+        Get several users' swipes (see users_arrays) and daily summaries, from one snapshot.
+
+        Returns:
+            tuple: (epoch seconds as int64, UIDs as an object array, features.DAY_SUMMARY_COLUMNS frame)
+        """
+        return self._read(lambda connection: (*self.users_arrays(uids), self.users_summaries(uids)))
+
+    def uid_counts(self):
+        """
+        Count the swipes per UID from the (uid, ts) index and the daily summaries.
+
+        Returns:
+            dict: {uid: record count}, ordered by UID
+        """
+        return dict(self._connection().execute(
+            'SELECT uid, SUM(count) FROM ('
+            ' SELECT uid, COUNT(*) AS count FROM swipes GROUP BY uid'
+            ' UNION ALL SELECT uid, SUM(swipes) FROM daily_summary GROUP BY uid'
+            ') GROUP BY uid ORDER BY uid'
+        ))
+
+    def compact(self, before):
+        """
+        Fold raw swipes older than a cutoff into the daily summaries and delete them.
+
+        Members are compacted SQLITE_BATCH_UIDS at a time, each batch in its own
+        write transaction: memory stays bounded on a large backlog, writers only
+        wait for one batch, and readers see either a member's raw swipes or their
+        summaries. Days that already have a summary (a late, back-dated swipe)
+        are merged into it.
+
+        Args:
+            before (int): Epoch second of a midnight; swipes before it are compacted
+
+        Returns:
+            int: Number of swipes compacted
+        """
+        connection = self._connection()
+        uids = [uid for (uid,) in connection.execute('SELECT DISTINCT uid FROM swipes WHERE ts < ?', (int(before),))]
+        compacted = 0
+        for i in range(0, len(uids), SQLITE_BATCH_UIDS):
+            batch = uids[i:i + SQLITE_BATCH_UIDS]
+            where = f"uid IN ({', '.join('?' * len(batch))}) AND ts < ?"
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                rows = connection.execute(f'SELECT uid, ts FROM swipes WHERE {where}', (*batch, int(before))).fetchall()
+                if not rows:
+                    continue
+
+                batch_uids, timestamps = zip(*rows)
+                summaries, hour_counts = summarize_days(pd.DataFrame({
+                    'UID': np.array(batch_uids, dtype=object),
+                    'Timestamp': np.array(timestamps, dtype=np.int64).astype('datetime64[s]'),
+                }))
+                summary_uids = summaries['UID'].to_numpy()
+                days = summaries['day'].to_numpy().astype(np.int64)
+                session_totals = summaries[SESSION_AGGREGATE_COLUMNS].to_numpy(dtype=np.int64)
+                existing = connection.execute(
+                    f"SELECT uid, day, counts FROM daily_summary"
+                    f" WHERE uid IN ({', '.join('?' * len(batch))}) AND day >= ?",
+                    (*batch, int(days.min())),
+                ).fetchall()
+                if existing:
+                    # Add the histograms and session totals of days summarized before
+                    old_uids, old_days, old_hours, old_totals = _summary_arrays(existing)
+                    merged = pd.DataFrame(np.hstack((
+                        np.concatenate((old_hours, hour_counts)), np.concatenate((old_totals, session_totals)),
+                    ))).groupby([np.concatenate((old_uids, summary_uids)), np.concatenate((old_days, days))]).sum()
+                    summary_uids = merged.index.get_level_values(0).to_numpy()
+                    days = merged.index.get_level_values(1).to_numpy()
+                    hour_counts = merged.to_numpy()[:, :24]
+                    session_totals = merged.to_numpy()[:, 24:]
+                connection.executemany(
+                    'INSERT OR REPLACE INTO daily_summary (uid, day, swipes, counts) VALUES (?, ?, ?, ?)',
+                    _summary_rows(summary_uids, days, hour_counts, session_totals),
+                )
+                connection.execute(f'DELETE FROM swipes WHERE {where}', (*batch, int(before)))
+                # Deleting rows doesn't move the last swipe id, so readers need the generation to notice
+                connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('generation', 1)"
+                    " ON CONFLICT (key) DO UPDATE SET value = value + 1"
+                )
+            compacted += len(rows)
+        return compacted
+
+    def append_arrays(self, timestamps, uids):
+        """
+        Insert swipes given as epoch seconds and UID strings, in one transaction.
+        """
+        uids = np.char.upper(np.asarray(uids, dtype=str)).tolist()
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO swipes (uid, ts) VALUES (?, ?)',
+                zip(uids, np.asarray(timestamps, dtype=np.int64).tolist()),
+            )
+
+    def append(self, rows):
+        """
+        Append [Month, Week, Day, Date, Time, UID] rows.
+        """
+        logs = normalize_logs(pd.DataFrame(rows, columns=LOG_COLUMNS))
+        self.append_arrays(
+            logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64),
+            logs['UID'].tolist(),
+        )
+
+    def fsync(self):
+        # Copy the WAL into the database; the checkpoint syncs both files
+        self._connection().execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+def open_log_source(log_path=None):
+    """
+    Open the RFID log at a path, picking the format from the path.
+
+    Args:
+        log_path (str): A CSV file, a columnar store directory (*.store) or a
+            SQLite database (*.sqlite); defaults to resolve_log_path()
+    """
+    log_path = resolve_log_path(log_path)
+    if log_path.endswith(COLUMNAR_SUFFIX) or os.path.isdir(log_path):
+        return ColumnarLogSource(log_path)
+    if log_path.endswith(SQLITE_SUFFIX):
+        return SQLiteLogSource(log_path)
+    return CSVLogSource(log_path)
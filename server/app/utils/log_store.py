@@ -0,0 +1,625 @@
+import atexit
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.utils.compact_logs import CompactLogs
+from app.utils.feature_state import UserFeatureState
+from app.utils.log_sources import SQLiteLogSource, open_log_source
+from app.utils.metrics import stage_timer
+from app.utils.occupancy import OccupancyCubes
+from app.utils.shared_snapshot import SharedSnapshot, SnapshotPublisher, current_signature
+from app.utils.sites import DEFAULT_GYM_ID, UnknownGymError, get_site, get_sites
+
+class RFIDLogStore:
+    """
+    Resident copy of the RFID logs, kept grouped by normalized (upper-case) UID.
+
+    The rows are held as CompactLogs: an intern table of UIDs and an int64 epoch
+    second per swipe, with no per-row Python objects. An offset index maps each UID
+    to its contiguous row range, so a per-user lookup is a slice instead of a scan
+    over the whole gym history. DataFrames are only materialized for the rows a
+    caller asks for. The log (CSV or columnar, see log_sources) is only re-read
+    when its signature (mtime/size) changes.
+
+    Swipes appended in-process go to a small per-UID tail that is folded into the
+    sorted base once it grows past MERGE_THRESHOLD rows. Per-user feature
+    accumulators are built on first use and then updated with every appended swipe.
+    """
+
+    MERGE_THRESHOLD = 10000
+
+    def __init__(self, log_path=None, gym_id=DEFAULT_GYM_ID):
+        self.source = open_log_source(log_path)
+        self.gym_id = gym_id
+        self.version = 0
+        # Bumped on every full (re)load; per-UID versions count appends since then
+        self.generation = 0
+        self._user_versions = {}
+        self._appends = 0
+        self._signature = None
+        # Signature of the last full load, the same in every process that loaded it
+        self._load_signature = None
+        self._lock = threading.RLock()
+        # (CompactLogs, {uid: (start, stop)}, {uid: tail rows}) swapped in as a single reference
+        empty = CompactLogs.empty()
+        self._snapshot = (empty, empty.index, {})
+        self._tail_rows = 0
+        self._states = {}
+        self._occupancy = None
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """
+        Call listener(uids) with the set of UIDs after every append.
+
+        Listeners run under the store lock, so they should only note the change.
+        Full reloads aren't announced; compare user_version to catch those.
+        """
+        self._listeners.append(listener)
+
+    def refresh(self):
+        """
+        Reload the logs if they changed on disk since the last load.
+
+        Returns:
+            bool: True if a reload happened
+        """
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+
+        with self._lock:
+            if signature == self._signature:
+                return False
+            self._load(signature)
+        return True
+
+    def _current_signature(self):
+        return self.source.signature()
+
+    def _load(self, signature):
+        with stage_timer('log_load'):
+            arrays = self.source.load_arrays()
+        with stage_timer('log_index'):
+            base = CompactLogs.from_arrays(*arrays)
+        self._install(base, base.index, signature)
+
+    def _install(self, base, index, signature):
+        # Swap in freshly loaded rows and drop everything derived from the old ones
+        self._snapshot = (base, index, {})
+        self._tail_rows = 0
+        self._states = {}
+        self._occupancy = None
+        self._user_versions = {}
+        self._appends = 0
+        self._signature = signature
+        self._load_signature = signature
+        self.generation += 1
+        self.version += 1
+
+    def append(self, rows, signature=None):
+        """
+        Add newly written swipes without re-reading the file.
+
+        Args:
+            rows (DataFrame): Normalized swipes (see normalize_logs)
+            signature (tuple): Source signature after the rows were written, so the
+                write isn't mistaken for an external change
+        """
+        with self._lock:
+            # Occupancy cubes check back-dated swipes against the rows from before this append
+            if self._occupancy is not None:
+                snapshot = self._snapshot
+                self._occupancy.add(rows, lambda uid: self._user_history(snapshot, uid))
+
+            self._add_rows(rows)
+            for uid in rows['UID'].unique().tolist():
+                self._user_versions[uid] = self._user_versions.get(uid, 0) + 1
+            self._appends += 1
+
+            # Keep already-built feature accumulators current, one O(1) update per swipe
+            if self._states:
+                seconds = rows['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+                days = seconds // 86400
+                hours = rows['Timestamp'].dt.hour.to_numpy()
+                for uid, day, hour, timestamp in zip(rows['UID'], days.tolist(), hours.tolist(), seconds.tolist()):
+                    state = self._states.get(uid)
+                    if state is not None and not state.add(day, hour, timestamp):
+                        # Back-dated swipe: rebuilt from the rows on the next query
+                        del self._states[uid]
+
+            if signature is not None:
+                self._signature = signature
+            self.version += 1
+
+            if self._listeners:
+                uids = set(rows['UID'])
+                for listener in self._listeners:
+                    listener(uids)
+
+    def _add_rows(self, rows):
+        # Put appended rows in the per-UID tail, folding it into the base once it's large
+        base, index, tail = self._snapshot
+        tail = dict(tail)
+        for uid, user_rows in rows.groupby('UID', sort=False):
+            tail[uid] = pd.concat([tail[uid], user_rows], ignore_index=True) if uid in tail else user_rows
+        self._tail_rows += len(rows)
+
+        if self._tail_rows > self.MERGE_THRESHOLD:
+            self._snapshot = self._merged(base, tail)
+        else:
+            self._snapshot = (base, index, tail)
+
+    def _merged(self, base, tail):
+        self._tail_rows = 0
+        base = base.merged(pd.concat(list(tail.values()), ignore_index=True))
+        return (base, base.index, {})
+
+    def user_version(self, uid):
+        """
+        Get a version that changes exactly when a user's log rows change.
+
+        It is keyed by the signature of the loaded log rather than a local counter,
+        so worker processes that loaded the same log agree on it (see ETags in
+        responses).
+
+        Returns:
+            tuple: (load signature, appends for this UID since the load)
+        """
+        self.refresh()
+        return (self._load_signature, self._user_versions.get(uid.upper(), 0))
+
+    def dataset_version(self):
+        """
+        Get a version that changes whenever any log row changes.
+
+        Returns:
+            tuple: (load signature, appends since the load)
+        """
+        self.refresh()
+        return (self._load_signature, self._appends)
+
+    @property
+    def logs(self):
+        """
+        All rows grouped by UID, materialized on each access (UID is categorical).
+        """
+        self.refresh()
+        if self._snapshot[2]:
+            with self._lock:
+                base, _, tail = self._snapshot
+                if tail:
+                    self._snapshot = self._merged(base, tail)
+        return self._snapshot[0].take(None)
+
+    def get_user_logs(self, uid, start=None, end=None):
+        """
+        Get the log rows for a single user.
+
+        Args:
+            uid (str): RFID UID (case-insensitive)
+            start (datetime): Only swipes at or after this time
+            end (datetime): Only swipes before this time
+
+        Returns:
+            DataFrame: The user's rows (empty if the UID has never swiped)
+        """
+        self.refresh()
+        rows = self._user_logs(self._snapshot, uid.upper())
+        if start is not None or end is not None:
+            timestamps = rows['Timestamp']
+            in_range = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                in_range &= (timestamps >= pd.Timestamp(start)).to_numpy()
+            if end is not None:
+                in_range &= (timestamps < pd.Timestamp(end)).to_numpy()
+            rows = rows[in_range].reset_index(drop=True)
+        return rows
+
+    @staticmethod
+    def _user_logs(snapshot, uid):
+        base, index, tail = snapshot
+        start, stop = index.get(uid, (0, 0))
+        rows = base.rows(start, stop)
+        if uid in tail:
+            return pd.concat([rows, tail[uid]], ignore_index=True)
+        return rows
+
+    def _user_history(self, snapshot, uid):
+        return self._user_logs(snapshot, uid), None
+
+    def history(self):
+        """
+        Get every row along with the daily summaries of compacted days.
+
+        Only SQLite logs are compacted (see compaction); for the others every
+        swipe is a row and there are no summaries.
+
+        Returns:
+            tuple: (rows as from logs, features.DAY_SUMMARY_COLUMNS frame or None)
+        """
+        return self.logs, None
+
+    def get_user_history(self, uid, start=None, end=None):
+        """
+        Get a single user's rows (see get_user_logs) along with their daily summaries.
+
+        Returns:
+            tuple: (rows, features.DAY_SUMMARY_COLUMNS frame or None)
+        """
+        return self.get_user_logs(uid, start, end), None
+
+    def get_user_features(self, uid, today):
+        """
+        Get a user's features from their incrementally maintained accumulator.
+
+        The accumulator is built from the user's rows on first use; after that the
+        cost doesn't depend on how long the member has been swiping in.
+
+        Args:
+            uid (str): RFID UID (case-insensitive)
+            today (date): Reference date for the time-dependent features
+
+        Returns:
+            dict: The user's features, or None if the UID has never swiped
+        """
+        self.refresh()
+        uid = uid.upper()
+        with self._lock:
+            state = self._states.get(uid)
+            if state is None:
+                user_logs, summaries = self._user_history(self._snapshot, uid)
+                if user_logs.empty and (summaries is None or summaries.empty):
+                    return None
+                state = UserFeatureState.from_logs(uid, user_logs, summaries)
+                self._states[uid] = state
+            return state.features(today)
+
+    def get_occupancy(self):
+        """
+        Get the gym-wide occupancy cubes, building them on first use.
+
+        Returns:
+            OccupancyCubes: Kept current with every appended swipe until the next reload
+        """
+        self.refresh()
+        with self._lock:
+            if self._occupancy is None:
+                logs, summaries = self.history()
+                with stage_timer('occupancy_build'):
+                    self._occupancy = OccupancyCubes.from_logs(logs, summaries)
+            return self._occupancy
+
+    def get_users_logs(self, uids):
+        """
+        Get the log rows for several users in one frame.
+
+        Args:
+            uids (list): RFID UIDs (case-insensitive)
+
+        Returns:
+            DataFrame: The users' rows
+        """
+        self.refresh()
+        base, index, tail = self._snapshot
+        uids = [uid.upper() for uid in uids]
+        rows = base.take([index[uid] for uid in uids if uid in index])
+        extra = [tail[uid] for uid in uids if uid in tail]
+        if extra:
+            # Tail rows carry plain string UIDs, so drop the categorical before combining
+            rows = rows.astype({'UID': object})
+            return pd.concat([rows] + extra, ignore_index=True)
+        return rows
+
+    def get_users_history(self, uids):
+        """
+        Get several users' rows (see get_users_logs) along with their daily summaries.
+
+        Returns:
+            tuple: (rows, features.DAY_SUMMARY_COLUMNS frame or None)
+        """
+        return self.get_users_logs(uids), None
+
+    def uid_counts(self):
+        """
+        Get the number of records per UID, straight from the intern table and offsets.
+
+        Returns:
+            dict: {uid: record count}, ordered by UID
+        """
+        self.refresh()
+        base, _, tail = self._snapshot
+        counts = dict(zip(base.decoded_uids().tolist(), base.counts().tolist()))
+        if tail:
+            for uid, user_rows in tail.items():
+                counts[uid] = counts.get(uid, 0) + len(user_rows)
+            counts = dict(sorted(counts.items()))
+        return counts
+
+
+class SharedLogStore(RFIDLogStore):
+    """
+    Log store whose base rows are a memory-mapped shared snapshot (see shared_snapshot).
+
+    For pre-fork deployments: workers attach read-only to the version published in
+    snapshot_dir, so the history is held once in the page cache rather than once per
+    worker. Only the swipes a worker appended itself since the last publish are kept
+    in its own memory; they are dropped once a snapshot that includes them appears.
+    """
+
+    # Appends stay in the tail until the publisher folds them into the next snapshot
+    MERGE_THRESHOLD = float('inf')
+
+    def __init__(self, log_path=None, snapshot_dir=None, gym_id=DEFAULT_GYM_ID):
+        super().__init__(log_path, gym_id)
+        self.snapshot_dir = snapshot_dir
+        # (source size after the write, rows) for appends not yet seen in a snapshot
+        self._pending = []
+
+    def _current_signature(self):
+        return current_signature(self.snapshot_dir)
+
+    def _load(self, signature):
+        with stage_timer('snapshot_attach'):
+            snapshot = SharedSnapshot.attach(self.snapshot_dir)
+        self._install(snapshot, snapshot.index, signature)
+
+        # Re-add this worker's swipes that were written after the snapshot was taken
+        pending = [
+            (size, rows) for size, rows in self._pending
+            if size is None or size > snapshot.source_size
+        ]
+        self._pending = []
+        for size, rows in pending:
+            self._append(rows, size)
+
+    def append(self, rows, signature=None):
+        """
+        Add newly written swipes to this worker's tail.
+
+        Args:
+            rows (DataFrame): Normalized swipes (see normalize_logs)
+            signature (tuple): Source signature after the rows were written; its
+                size tells which future snapshot already includes them
+        """
+        with self._lock:
+            self._append(rows, signature[-1] if signature else None)
+
+    def _append(self, rows, size):
+        self._pending.append((size, rows))
+        super().append(rows)
+
+    @property
+    def logs(self):
+        """
+        All rows grouped by UID (materialized from the shared snapshot plus this worker's tail).
+        """
+        self.refresh()
+        base, _, tail = self._snapshot
+        if tail:
+            # Merge into a private copy; the tail stays until a snapshot includes it
+            base = base.merged(pd.concat(list(tail.values()), ignore_index=True))
+        return base.take(None)
+
+
+class SQLiteLogStore(RFIDLogStore):
+    """
+    Log store over a SQLite database (see log_sources.SQLiteLogSource) that keeps
+    no resident copy of the rows.
+
+    A user's rows, time ranges of them and the per-UID counts are indexed queries,
+    so scoring a member never reads the whole log. The whole log is only loaded
+    for the consumers that need every row (batch scoring of all members,
+    training, occupancy, the leaderboard), and kept until the next change.
+    Rows are raw swipes; the daily summaries of compacted days (see compaction)
+    come alongside them from history, get_user_history and get_users_history.
+
+    Appended swipes are already in the database by the time they reach append, so
+    only the versions, feature accumulators and listeners are updated.
+    """
+
+    def __init__(self, log_path=None, gym_id=DEFAULT_GYM_ID):
+        super().__init__(log_path, gym_id)
+        self._full = None
+        # (dataset version, {uid: count}) from the last count query
+        self._counts = (None, None)
+        # Last swipe id before the append in progress (see _user_logs)
+        self._written_before = None
+
+    def _load(self, signature):
+        # Nothing to read up front; just drop what was derived from the old contents
+        empty = CompactLogs.empty()
+        self._install(empty, empty.index, signature)
+        self._full = None
+
+    def _add_rows(self, rows):
+        self._full = None
+
+    def append(self, rows, signature=None):
+        """
+        Record swipes that were just written to the database.
+
+        Args:
+            rows (DataFrame): Normalized swipes (see normalize_logs)
+            signature (tuple): Source signature after the rows were written
+        """
+        with self._lock:
+            # Back-dated swipe checks need the rows from before this append
+            self._written_before = self._signature[-1] if self._signature else None
+            try:
+                super().append(rows, signature)
+            finally:
+                self._written_before = None
+
+    @staticmethod
+    def _user_rows(uid, timestamps):
+        return pd.DataFrame({
+            'UID': np.full(len(timestamps), uid, dtype=object),
+            'Timestamp': timestamps.astype('datetime64[s]'),
+        })
+
+    def _user_logs(self, snapshot, uid, start=None, end=None):
+        return self._user_rows(uid, self.source.user_timestamps(uid, start, end, max_id=self._written_before))
+
+    def _user_history(self, snapshot, uid, start=None, end=None):
+        timestamps, summaries = self.source.user_history(uid, start, end, max_id=self._written_before)
+        return self._user_rows(uid, timestamps), summaries
+
+    def get_user_logs(self, uid, start=None, end=None):
+        """
+        Get the log rows for a single user, with the time range applied in SQL.
+
+        Args:
+            uid (str): RFID UID (case-insensitive)
+            start (datetime): Only swipes at or after this time
+            end (datetime): Only swipes before this time
+
+        Returns:
+            DataFrame: The user's rows (empty if the UID has never swiped)
+        """
+        self.refresh()
+        return self._user_logs(
+            self._snapshot, uid.upper(),
+            pd.Timestamp(start).value // 10 ** 9 if start is not None else None,
+            pd.Timestamp(end).value // 10 ** 9 if end is not None else None,
+        )
+
+    def get_user_history(self, uid, start=None, end=None):
+        """
+        Get a single user's rows and the summaries of their compacted days that
+        start in [start, end), with the range applied in SQL.
+
+        Returns:
+            tuple: (rows, features.DAY_SUMMARY_COLUMNS frame)
+        """
+        self.refresh()
+        return self._user_history(
+            self._snapshot, uid.upper(),
+            pd.Timestamp(start).value // 10 ** 9 if start is not None else None,
+            pd.Timestamp(end).value // 10 ** 9 if end is not None else None,
+        )
+
+    def get_users_logs(self, uids):
+        self.refresh()
+        timestamps, found = self.source.users_arrays(list(dict.fromkeys(uid.upper() for uid in uids)))
+        return pd.DataFrame({'UID': found, 'Timestamp': timestamps.astype('datetime64[s]')})
+
+    def get_users_history(self, uids):
+        self.refresh()
+        timestamps, found, summaries = self.source.users_history(list(dict.fromkeys(uid.upper() for uid in uids)))
+        return pd.DataFrame({'UID': found, 'Timestamp': timestamps.astype('datetime64[s]')}), summaries
+
+    def uid_counts(self):
+        version = self.dataset_version()
+        counted_for, counts = self._counts
+        if counted_for != version:
+            counts = self.source.uid_counts()
+            self._counts = (version, counts)
+        return counts
+
+    @property
+    def logs(self):
+        """
+        All rows grouped by UID (UID is categorical), loaded from the database on
+        first use after a change.
+        """
+        return self.history()[0]
+
+    def history(self):
+        self.refresh()
+        full = self._full
+        if full is None:
+            with self._lock:
+                if self._full is None:
+                    with stage_timer('log_load'):
+                        arrays, summaries = self.source.load_history()
+                    with stage_timer('log_index'):
+                        self._full = (CompactLogs.from_arrays(*arrays), summaries)
+                full = self._full
+        return full[0].take(None), full[1]
+
+
+_stores = {}
+_store_lock = threading.Lock()
+_publishers = {}
+
+
+def open_log_store(log_path, gym_id=DEFAULT_GYM_ID):
+    """
+    Create a private log store for a log: a SQLiteLogStore for SQLite databases,
+    so the daily summaries of compacted days are read too, else an RFIDLogStore.
+    """
+    if isinstance(open_log_source(log_path), SQLiteLogSource):
+        return SQLiteLogStore(log_path, gym_id)
+    return RFIDLogStore(log_path, gym_id)
+
+
+def _create_store(site, interval=1.0):
+    if not site.snapshot_dir:
+        return open_log_store(site.log_path, site.gym_id)
+
+    store = SharedLogStore(site.log_path, site.snapshot_dir, site.gym_id)
+    if site.gym_id not in _publishers:
+        publisher = SnapshotPublisher(store.source, site.snapshot_dir, interval)
+        publisher.start()
+        atexit.register(publisher.close)
+        _publishers[site.gym_id] = publisher
+    return store
+
+
+def init_log_store(app):
+    """
+    Create a log store for every site the app serves and load the logs eagerly.
+
+    Each site has its own store, index and caches, so adding a site doesn't slow
+    down lookups for the others. With SHARED_SNAPSHOT_DIR set, each store attaches
+    to its site's memory-mapped snapshot shared by all worker processes, and one
+    elected worker keeps it published.
+
+    Returns:
+        RFIDLogStore: The default site's store (None if it isn't served)
+    """
+    global _stores
+
+    stores = {}
+    for gym_id, site in get_sites().items():
+        store = _create_store(site, app.config['SHARED_SNAPSHOT_INTERVAL'])
+        try:
+            store.refresh()
+        except FileNotFoundError:
+            # Loaded lazily once the file shows up
+            pass
+        stores[gym_id] = store
+
+    with _store_lock:
+        _stores = stores
+    app.extensions['rfid_log_stores'] = stores
+
+    try:
+        store = stores[get_site().gym_id]
+    except UnknownGymError:
+        store = None
+    app.extensions['rfid_log_store'] = store
+    return store
+
+
+def get_log_store(gym_id=None):
+    """
+    Get a site's log store, creating it on first use outside of create_app.
+
+    Args:
+        gym_id (str): Site id, or None for the default site
+
+    Raises:
+        UnknownGymError: If this process doesn't serve the site
+    """
+    site = get_site(gym_id)
+    store = _stores.get(site.gym_id)
+    if store is None:
+        with _store_lock:
+            store = _stores.get(site.gym_id)
+            if store is None:
+                store = _stores[site.gym_id] = _create_store(site)
+    return store
@@ -0,0 +1,273 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; fine-grained at the low end since most stages take well under a millisecond
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TRAINING_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + _format_labels(self.labels, key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition layout.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # {label values: [count per bucket (last is +Inf), sum]}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+
+        samples = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((
+                    self.name + '_bucket' + _format_labels(self.labels, key, [('le', _format_value(float(bound)))]),
+                    cumulative,
+                ))
+            samples.append((self.name + '_sum' + _format_labels(self.labels, key), total))
+            samples.append((self.name + '_count' + _format_labels(self.labels, key), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics, rendered in the Prometheus text format.
+
+    Collectors are callables run at scrape time that return
+    (name, kind, documentation, value) tuples for values owned elsewhere,
+    such as the score cache's hit counters.
+    """
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        return existing
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=STAGE_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector):
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name} {_format_value(value)}' for name, value in metric.samples())
+
+        for collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+                continue
+            for name, kind, documentation, value in collected:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = MetricsRegistry()
+
+STAGE_SECONDS = _metrics.histogram(
+    'gym_stage_duration_seconds', 'Time spent in each scoring/loading stage', ('stage',)
+)
+REQUEST_SECONDS = _metrics.histogram(
+    'gym_request_duration_seconds', 'Time to handle gym API requests', ('endpoint', 'method')
+)
+REQUESTS_TOTAL = _metrics.counter(
+    'gym_requests_total', 'Gym API requests by response status', ('endpoint', 'method', 'status')
+)
+TRAINING_STAGE_SECONDS = _metrics.histogram(
+    'gym_training_stage_duration_seconds', 'Time spent in each model training stage', ('stage',), TRAINING_BUCKETS
+)
+TRAINING_JOBS_TOTAL = _metrics.counter(
+    'gym_training_jobs_total', 'Finished model training jobs by outcome', ('status',)
+)
+
+
+def get_metrics():
+    """
+    Get the process-wide metrics registry.
+    """
+    return _metrics
+
+
+def observe_stage(stage, seconds):
+    """
+    Record the duration of a stage, and add it to the current request's Server-Timing.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Time the enclosed block as a named stage.
+
+    Usage:
+        with stage_timer('features'):
+            features = store.get_user_features(uid, today)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def start_request_timer():
+    """
+    before_request hook: note when the request started.
+    """
+    g.request_started = time.perf_counter()
+
+
+def record_request(response):
+    """
+    after_request hook: record request duration and status, and add a
+    Server-Timing header when SERVER_TIMING is enabled.
+
+    Streamed responses are timed up to the start of the body.
+    """
+    started = g.get('request_started')
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unknown'
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+
+    if current_app.config.get('SERVER_TIMING'):
+        timings = g.get('stage_timings', {})
+        entries = [f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in timings.items()]
+        entries.append(f'total;dur={elapsed * 1000:.3f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+        # Lets the browser's Performance API read the header cross-origin
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+
+def init_metrics(app):
+    """
+    Expose the process's metrics on GET /metrics.
+    """
+    from app.utils.score_cache import get_score_cache
+
+    def score_cache_metrics():
+        stats = get_score_cache().stats()
+        return [
+            ('gym_score_cache_hits_total', 'counter', 'Score cache hits', stats['hits']),
+            ('gym_score_cache_misses_total', 'counter', 'Score cache misses', stats['misses']),
+            ('gym_score_cache_entries', 'gauge', 'Entries in the score cache', stats['size']),
+        ]
+
+    _metrics.add_collector(score_cache_metrics)
+
+    def score_stream_metrics():
+        feeds = app.extensions.get('score_feeds', {}).values()
+        return [
+            ('gym_score_streams', 'gauge', 'Open score streams', sum(feed.stats()['subscribers'] for feed in feeds)),
+        ]
+
+    _metrics.add_collector(score_stream_metrics)
+
+    @app.route('/metrics')
+    def metrics():
+        return app.response_class(_metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    app.extensions['metrics'] = _metrics
+    return _metrics
@@ -0,0 +1,243 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# Model artifacts live in app/models, regardless of the working directory
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+MODEL_FILENAME = 'gym_consistency_model.joblib'
+SCALER_FILENAME = 'gym_consistency_scaler.joblib'
+# Scaler mean/scale and KMeans centroids exported from the joblib pair for sklearn-free serving
+INFERENCE_FILENAME = 'gym_consistency_inference.npz'
+
+ModelBundle = namedtuple('ModelBundle', ['model', 'scaler', 'version'])
+
+
+class ArrayScaler:
+    """
+    StandardScaler.transform as plain array arithmetic.
+    """
+
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.mean) / self.scale
+
+
+class CentroidModel:
+    """
+    KMeans.predict as plain array arithmetic: the index of the nearest centroid.
+    """
+
+    def __init__(self, centroids):
+        self.centroids = centroids
+
+    def predict(self, X):
+        distances = ((np.asarray(X, dtype=float)[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+
+def export_arrays(model, scaler):
+    """
+    Pull the arrays inference needs out of a fitted KMeans and StandardScaler.
+
+    Returns:
+        dict: mean, scale and centroids as float64 arrays
+    """
+    n_features = model.cluster_centers_.shape[1]
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(n_features)
+    return {
+        "mean": np.asarray(mean, dtype=float),
+        "scale": np.asarray(scale, dtype=float),
+        "centroids": np.asarray(model.cluster_centers_, dtype=float),
+    }
+
+
+def _bundle(arrays, version):
+    return ModelBundle(CentroidModel(arrays["centroids"]), ArrayScaler(arrays["mean"], arrays["scale"]), version)
+
+
+def _replace_atomically(path, write):
+    # Write to a temp file in the same directory and rename it over the target,
+    # so readers never see a half-written file
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the clustering model and scaler.
+
+    Serving only needs the scaler's mean/scale and the KMeans centroids, so those
+    are exported from the joblib artifacts into a small .npz and scored with
+    numpy alone; sklearn and joblib are only imported when the .npz is missing or
+    stale (it records a digest of the joblib pair it came from), or to save.
+
+    The bundle is reloaded only when an artifact's mtime or size changes. Its
+    version is the digest of the joblib pair, so it is the same in every process.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR):
+        self.models_dir = models_dir
+        self.model_path = os.path.join(models_dir, MODEL_FILENAME)
+        self.scaler_path = os.path.join(models_dir, SCALER_FILENAME)
+        self.inference_path = os.path.join(models_dir, INFERENCE_FILENAME)
+        self._signature = None
+        self._bundle = None
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        stats = []
+        for path in (self.model_path, self.scaler_path, self.inference_path):
+            try:
+                stat = os.stat(path)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return tuple(stats) if any(stats) else None
+
+    def _source_digest(self):
+        # Content digest of the joblib pair, or None if either is missing
+        digest = hashlib.sha1()
+        for path in (self.model_path, self.scaler_path):
+            try:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+            except FileNotFoundError:
+                return None
+        return digest.hexdigest()
+
+    def get(self):
+        """
+        Get the current model bundle, reloading it if the artifacts changed on disk.
+
+        Returns:
+            ModelBundle: (model, scaler, version), or None if no trained models exist
+        """
+        signature = self._current_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    try:
+                        self._load(signature)
+                    except Exception as e:
+                        # Keep serving the previous models until the artifacts change again
+                        print(f"Model reload error: {e}")
+                        self._signature = signature
+        return self._bundle
+
+    def _load(self, signature):
+        if signature is None:
+            self._bundle = None
+            self._signature = signature
+            return
+
+        source_digest = self._source_digest()
+        arrays = self._read_inference()
+        if arrays is not None and source_digest in (None, arrays["source_digest"]):
+            bundle = _bundle(arrays, arrays["source_digest"][:12])
+        elif source_digest is not None:
+            # No usable export yet: unpickle the sklearn objects once and export them
+            import joblib
+
+            arrays = export_arrays(joblib.load(self.model_path), joblib.load(self.scaler_path))
+            bundle = _bundle(arrays, source_digest[:12])
+            try:
+                self._write_inference(arrays, source_digest)
+            except OSError as e:
+                print(f"Could not export inference arrays: {e}")
+        else:
+            raise FileNotFoundError(f"Incomplete model artifacts in {self.models_dir}")
+
+        if self._source_digest() != source_digest:
+            # A new pair was swapped in while loading; pick it up on the next call
+            return
+        self._bundle = bundle
+        self._signature = self._current_signature()
+
+    def _read_inference(self):
+        try:
+            with np.load(self.inference_path) as data:
+                return {
+                    "mean": data["mean"],
+                    "scale": data["scale"],
+                    "centroids": data["centroids"],
+                    "source_digest": str(data["source_digest"]),
+                }
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    def _write_inference(self, arrays, source_digest):
+        _replace_atomically(
+            self.inference_path,
+            lambda f: np.savez(f, source_digest=np.array(source_digest), **arrays),
+        )
+
+    def save(self, model, scaler):
+        """
+        Persist newly trained artifacts and swap them in for serving.
+
+        Each artifact is written to a temp file in the models directory and renamed
+        over the old one, so readers never see a half-written file. The scaler is
+        swapped first, then the model, then the exported inference arrays.
+
+        Returns:
+            str: Version of the saved models
+        """
+        import joblib
+
+        os.makedirs(self.models_dir, exist_ok=True)
+        with self._lock:
+            for obj, path in ((scaler, self.scaler_path), (model, self.model_path)):
+                _replace_atomically(path, lambda f, obj=obj: joblib.dump(obj, f))
+
+            source_digest = self._source_digest()
+            arrays = export_arrays(model, scaler)
+            self._write_inference(arrays, source_digest)
+
+            self._bundle = _bundle(arrays, source_digest[:12])
+            self._signature = self._current_signature()
+        return self._bundle.version
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def get_model_registry(gym_id=None):
+    """
+    Get a site's model registry; every site has its own model artifacts.
+
+    Args:
+        gym_id (str): Site id, or None for the default site
+
+    Raises:
+        UnknownGymError: If this process doesn't serve the site
+    """
+    from app.utils.sites import get_site
+
+    site = get_site(gym_id)
+    registry = _registries.get(site.gym_id)
+    if registry is None or registry.models_dir != site.models_dir:
+        with _registry_lock:
+            registry = _registries.get(site.gym_id)
+            if registry is None or registry.models_dir != site.models_dir:
+                registry = _registries[site.gym_id] = ModelRegistry(site.models_dir)
+    return registry
@@ -0,0 +1,272 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from app.utils.features import DAY_NAMES
+
+PERIODS = ('day', 'week', 'month')
+
+
+def _weekday(day):
+    # 1970-01-01 was a Thursday; Monday is 0
+    return (day + 3) % 7
+
+
+def _week(day):
+    # Weeks start on Monday and are keyed by that Monday's day number
+    return day - _weekday(day)
+
+
+def _month(day):
+    # Months since 1970-01
+    return int(np.datetime64(int(day), 'D').astype('datetime64[M]').astype(np.int64))
+
+
+def period_key(period, day):
+    """
+    Key of the day/week/month a day number falls in.
+    """
+    if period == 'day':
+        return day
+    if period == 'week':
+        return _week(day)
+    return _month(day)
+
+
+def period_label(period, key):
+    """
+    ISO label of a period key: the date for days and weeks (the Monday), YYYY-MM for months.
+    """
+    if period == 'month':
+        return str(np.datetime64(int(key), 'M'))
+    return str(np.datetime64(int(key), 'D'))
+
+
+def _epoch_hours(logs):
+    return logs['Timestamp'].to_numpy().astype('datetime64[h]').astype(np.int64)
+
+
+def _summary_hours(summaries):
+    # (summary row, epoch hour) of every hour with swipes in daily summaries (see features.DAY_SUMMARY_COLUMNS)
+    masks = summaries['hours'].to_numpy().astype('<u4')
+    bits = np.unpackbits(masks.view(np.uint8).reshape(-1, 4), axis=1, bitorder='little')[:, :24]
+    row, hour = np.nonzero(bits)
+    return row, summaries['day'].to_numpy().astype(np.int64)[row] * 24 + hour
+
+
+class OccupancyCubes:
+    """
+    Gym-wide occupancy counts, pre-aggregated so queries cost the same at any log size.
+
+    A member swiping several times within one clock hour counts once for that hour
+    (a "visit-hour"). Maintained cubes:
+        hourly            {epoch hour: members present}, i.e. (date, hour) occupancy
+        weekday_hourly    7 x 24 all-time totals, Monday first
+        members[period]   {period key: distinct members} for day, week and month
+
+    Appends update the cubes in place. Each member's latest visit-hour is kept so
+    the common case (a swipe later than any before) needs no lookups; back-dated
+    swipes are checked against the member's existing rows.
+    """
+
+    def __init__(self):
+        self.hourly = Counter()
+        self.weekday_hourly = np.zeros((7, 24), dtype=np.int64)
+        self.members = {period: Counter() for period in PERIODS}
+        # First and last day with any visits, kept up to date so span() needs no scan
+        self.first_day = None
+        self.last_day = None
+        self._last_hour = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_logs(cls, logs, summaries=None):
+        """
+        Build the cubes from the whole log in one vectorized pass.
+
+        Args:
+            logs (DataFrame): Swipes with 'UID' and a parsed 'Timestamp' column
+            summaries (DataFrame): Daily summaries of compacted days
+                (features.DAY_SUMMARY_COLUMNS); their hour masks say which
+                hours the member was present
+        """
+        cubes = cls()
+        if logs.empty and (summaries is None or summaries.empty):
+            return cubes
+
+        codes, uids = pd.factorize(logs['UID'])
+        hours = _epoch_hours(logs)
+        if summaries is not None:
+            summary_codes, summary_uids = pd.factorize(summaries['UID'])
+            row, summary_hours = _summary_hours(summaries)
+            uids = np.asarray(uids, dtype=object)
+            merged = np.union1d(uids, np.asarray(summary_uids, dtype=object))
+            codes = np.concatenate((
+                # Swipes without a readable UID keep code -1
+                np.append(np.searchsorted(merged, uids), -1)[codes],
+                np.searchsorted(merged, np.asarray(summary_uids, dtype=object))[summary_codes[row]],
+            ))
+            hours = np.concatenate((hours, summary_hours))
+            uids = merged
+        # Swipes without a readable UID aren't a member visit
+        known = codes >= 0
+        codes, hours = codes[known], hours[known]
+
+        # One row per distinct (member, hour), sorted by member then hour
+        order = np.lexsort((hours, codes))
+        codes, hours = codes[order], hours[order]
+        first = np.ones(len(hours), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (hours[1:] != hours[:-1])
+        codes, hours = codes[first], hours[first]
+
+        unique_hours, counts = np.unique(hours, return_counts=True)
+        cubes.hourly.update(dict(zip(unique_hours.tolist(), counts.tolist())))
+        if len(unique_hours):
+            cubes.first_day = int(unique_hours[0]) // 24
+            cubes.last_day = int(unique_hours[-1]) // 24
+
+        days = hours // 24
+        np.add.at(cubes.weekday_hourly, (_weekday(days), hours % 24), 1)
+
+        keys = {
+            'day': days,
+            'week': _week(days),
+            'month': days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64),
+        }
+        for period, period_keys in keys.items():
+            # Rows are sorted by (member, hour), so period keys are non-decreasing per member
+            new_member = np.ones(len(period_keys), dtype=bool)
+            new_member[1:] = (codes[1:] != codes[:-1]) | (period_keys[1:] != period_keys[:-1])
+            unique_keys, counts = np.unique(period_keys[new_member], return_counts=True)
+            cubes.members[period].update(dict(zip(unique_keys.tolist(), counts.tolist())))
+
+        last = np.ones(len(codes), dtype=bool)
+        last[:-1] = codes[1:] != codes[:-1]
+        cubes._last_hour = dict(zip(uids[codes[last]].tolist(), hours[last].tolist()))
+        return cubes
+
+    def add(self, rows, user_history):
+        """
+        Fold newly appended swipes into the cubes.
+
+        Args:
+            rows (DataFrame): Normalized swipes (see normalize_logs)
+            user_history (callable): Returns a member's rows from before this
+                append and their daily summaries (or None); only called for
+                back-dated swipes
+        """
+        batch = pd.DataFrame({'UID': rows['UID'].to_numpy(), 'hour': _epoch_hours(rows)}).drop_duplicates()
+
+        with self._lock:
+            for uid, user_batch in batch.groupby('UID', sort=False):
+                new_hours = sorted(user_batch['hour'].tolist())
+                last_hour = self._last_hour.get(uid)
+
+                if last_hour is None or new_hours[0] > last_hour:
+                    # Common case: everything is later than the member's previous visit-hour
+                    known_hours = [last_hour] if last_hour is not None else []
+                else:
+                    user_logs, summaries = user_history(uid)
+                    known_hours = _epoch_hours(user_logs)
+                    if summaries is not None:
+                        known_hours = np.concatenate((known_hours, _summary_hours(summaries)[1]))
+                    known_hours = np.unique(known_hours).tolist()
+
+                self._add_member_hours(new_hours, known_hours)
+                self._last_hour[uid] = max(new_hours[-1], last_hour if last_hour is not None else new_hours[-1])
+
+    def _add_member_hours(self, new_hours, known_hours):
+        known = {'hour': set(known_hours)}
+        for period in PERIODS:
+            known[period] = {period_key(period, hour // 24) for hour in known_hours}
+
+        for hour in new_hours:
+            if hour in known['hour']:
+                continue
+            known['hour'].add(hour)
+            self.hourly[hour] += 1
+            day = hour // 24
+            self.weekday_hourly[_weekday(day), hour % 24] += 1
+            if self.first_day is None or day < self.first_day:
+                self.first_day = day
+            if self.last_day is None or day > self.last_day:
+                self.last_day = day
+
+            for period in PERIODS:
+                key = period_key(period, day)
+                if key not in known[period]:
+                    known[period].add(key)
+                    self.members[period][key] += 1
+
+    def span(self):
+        """
+        Get the first and last day with any visits.
+
+        Returns:
+            tuple: (first day, last day) as day numbers, or None if there are no visits
+        """
+        with self._lock:
+            if self.first_day is None:
+                return None
+            return self.first_day, self.last_day
+
+    def date_hourly(self, start_day, end_day):
+        """
+        Get members present per hour for each date in a range.
+
+        Returns:
+            list: (day number, [24 counts]) per date, inclusive of both ends
+        """
+        with self._lock:
+            return [
+                (day, [self.hourly.get(day * 24 + hour, 0) for hour in range(24)])
+                for day in range(start_day, end_day + 1)
+            ]
+
+    def weekday_hours(self, start_day=None, end_day=None):
+        """
+        Get visit-hours per (weekday, hour), all-time or rolled up over a date range.
+
+        Returns:
+            tuple: (7 x 24 nested list, Monday first; number of each weekday in the range)
+        """
+        span = self.span()
+        if span is None:
+            return [[0] * 24 for _ in DAY_NAMES], [0] * 7
+
+        if start_day is None and end_day is None:
+            with self._lock:
+                totals = self.weekday_hourly.tolist()
+            start_day, end_day = span
+        else:
+            start_day = span[0] if start_day is None else start_day
+            end_day = span[1] if end_day is None else end_day
+            totals = [[0] * 24 for _ in DAY_NAMES]
+            # Days outside the span have no visits, so only the overlap is walked
+            for day, hours in self.date_hourly(max(start_day, span[0]), min(end_day, span[1])):
+                row = totals[_weekday(day)]
+                for hour, count in enumerate(hours):
+                    row[hour] += count
+
+        # Every weekday occurs once per full week, plus once more for the leftover days
+        days = max(end_day - start_day + 1, 0)
+        weekdays_in_range = [days // 7] * 7
+        for offset in range(days % 7):
+            weekdays_in_range[_weekday(start_day + offset)] += 1
+        return totals, weekdays_in_range
+
+    def active_members(self, period, start_day, end_day):
+        """
+        Get distinct members per day, week or month over a date range.
+
+        Returns:
+            list: (period key, members) for every period overlapping the range
+        """
+        first_key = period_key(period, start_day)
+        last_key = period_key(period, end_day)
+        step = 7 if period == 'week' else 1
+        with self._lock:
+            counts = self.members[period]
+            return [(key, counts.get(key, 0)) for key in range(first_key, last_key + 1, step)]
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+
+from flask import current_app, make_response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # In requirements.txt; a bare install without it falls back to the standard json module
+    orjson = None
+
+# zlib level for compressed responses; higher levels cost far more CPU for a few percent
+GZIP_LEVEL = 5
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, several times faster than the json
+    module on the large list and batch payloads.
+
+    Output is equivalent to DefaultJSONProvider: keys are sorted, and dates,
+    UUIDs and dataclasses go through the same fallback. numpy scalars and
+    arrays are serialized natively.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def init_responses(app):
+    """
+    Use orjson for JSON responses when it is installed.
+    """
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+    else:
+        print("orjson is not installed (see requirements.txt); JSON responses use the standard json module")
+    return app.json
+
+
+def make_etag(*parts):
+    """
+    Build an ETag from everything a response depends on (site, UID, data and
+    model versions, date).
+
+    Returns:
+        str: Opaque tag (unquoted)
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def not_modified(etag):
+    """
+    Check the request's If-None-Match against an ETag.
+
+    Honored for POST as well, so clients polling POST /score can revalidate.
+
+    Returns:
+        Response: A 304 to return as-is, or None if the client needs the full response
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def with_etag(response, etag):
+    """
+    Tag a response so the client can revalidate it with If-None-Match.
+
+    Tags are weak: a gzipped body carries the same tag as the plain one.
+    """
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip large responses for clients that accept it.
+
+    Applies to complete 200 responses of at least GZIP_MIN_SIZE bytes; streamed
+    (NDJSON) responses are left alone.
+    """
+    min_size = current_app.config.get('GZIP_MIN_SIZE')
+    if (
+        not min_size
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ScoreCache:
+    """
+    Bounded LRU cache of score results with an optional TTL.
+
+    Callers key entries by everything the result depends on (UID, the user's data
+    version, model version, date), so a new swipe, a retrain or the day rolling over
+    simply stops matching the old entry, which then ages out of the LRU.
+    """
+
+    def __init__(self, max_size=4096, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached result.
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if not self.ttl or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Store a result, evicting the least recently used entries beyond max_size.
+        """
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get hit/miss counters and current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def init_score_cache(app):
+    """
+    Create the shared score cache with the app's configured size and TTL.
+    """
+    global _cache
+
+    cache = ScoreCache(app.config['SCORE_CACHE_SIZE'], app.config['SCORE_CACHE_TTL'])
+    with _cache_lock:
+        _cache = cache
+    app.extensions['score_cache'] = cache
+    return cache
+
+
+def get_score_cache():
+    """
+    Get the process-wide score cache, creating it on first use outside of create_app.
+    """
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScoreCache()
+    return _cache
@@ -0,0 +1,227 @@
+import atexit
+import json
+import threading
+
+from app.utils.gym_utils import calculate_consistency_score, score_version
+from app.utils.log_store import get_log_store
+from app.utils.responses import make_etag
+from app.utils.sites import get_site, get_sites
+
+# Sent when nothing changed for a while, so proxies keep the connection open and
+# a client that went away is noticed on the failed write
+KEEPALIVE_EVENT = b': keepalive\n\n'
+
+
+class SubscriberLimitError(RuntimeError):
+    """
+    Raised when a process already holds its maximum number of score streams.
+    """
+
+
+class _Channel:
+    """
+    The latest score event for one UID, shared by every subscriber to it.
+
+    Subscribers only remember the sequence number of the last event they sent,
+    so an open stream costs a generator and an int; the payload is computed and
+    encoded once per change however many clients are listening.
+    """
+
+    __slots__ = ('uid', 'subscribers', 'version', 'seq', 'etag', 'event', 'cond')
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.subscribers = 0
+        self.version = None
+        self.seq = 0
+        self.etag = None
+        self.event = None
+        self.cond = threading.Condition()
+
+    def publish(self, version, etag, event):
+        with self.cond:
+            self.version = version
+            self.etag = etag
+            self.event = event
+            self.seq += 1
+            self.cond.notify_all()
+
+    def wait(self, seq, timeout):
+        """
+        Wait for an event newer than seq.
+
+        Returns:
+            tuple: (seq, etag, encoded event), with no event if none arrived within timeout
+        """
+        with self.cond:
+            if self.seq == seq:
+                self.cond.wait(timeout)
+            if self.seq == seq:
+                return seq, None, None
+            return self.seq, self.etag, self.event
+
+
+class ScoreFeed:
+    """
+    Pushes a fresh score to subscribers of a UID whenever that member's score changes.
+
+    A background thread keeps one channel per subscribed UID. It wakes right away
+    when the site's log store records a swipe for one of them, and otherwise every
+    interval seconds to pick up changes made outside this process (other workers,
+    the RFID listener), a retrain or the day rolling over. A channel is recomputed
+    only when its score_version differs from the one last published.
+
+    Each open stream holds a server thread or greenlet; for thousands of
+    concurrent clients run the app under an async worker (e.g. gevent).
+    """
+
+    def __init__(self, gym_id, interval=1.0, max_subscribers=10000, dumps=json.dumps):
+        self.gym_id = gym_id
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.dumps = dumps
+        self._channels = {}
+        self._subscribers = 0
+        self._wake = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def subscribe(self, uid):
+        """
+        Start listening to a UID's score.
+
+        Returns:
+            _Channel: Pass to unsubscribe once the client disconnects
+
+        Raises:
+            SubscriberLimitError: If max_subscribers streams are already open
+        """
+        uid = uid.upper()
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                raise SubscriberLimitError(f"Too many open score streams (max {self.max_subscribers})")
+            channel = self._channels.get(uid)
+            if channel is None:
+                channel = self._channels[uid] = _Channel(uid)
+                self._wake = True
+                self._cond.notify()
+            channel.subscribers += 1
+            self._subscribers += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'score-feed-{self.gym_id}', daemon=True)
+                self._thread.start()
+        return channel
+
+    def unsubscribe(self, channel):
+        with self._cond:
+            channel.subscribers -= 1
+            self._subscribers -= 1
+            if not channel.subscribers and self._channels.get(channel.uid) is channel:
+                del self._channels[channel.uid]
+
+    def notify(self, uids):
+        """
+        Log store listener: wake the feed if any of the UIDs has subscribers.
+        """
+        with self._cond:
+            if not self._channels.keys().isdisjoint(uids):
+                self._wake = True
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {"subscribers": self._subscribers, "uids": len(self._channels)}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._wake and not self._closed:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return
+                self._wake = False
+                channels = list(self._channels.values())
+
+            for channel in channels:
+                try:
+                    self._update(channel)
+                except FileNotFoundError:
+                    # No log yet; members get their score once it shows up
+                    break
+                except Exception as e:
+                    print(f"Score feed error: {e}")
+
+    def _update(self, channel):
+        version = score_version(channel.uid, gym_id=self.gym_id)
+        if version == channel.version:
+            return
+
+        result = calculate_consistency_score(channel.uid, gym_id=self.gym_id)
+        etag = make_etag('score', *version)
+        # The event id is the /score ETag, so a reconnecting client isn't resent what it has
+        event = f'id: {etag}\nevent: score\ndata: {self.dumps(result)}\n\n'.encode()
+        channel.publish(version, etag, event)
+
+
+_feeds = {}
+_feed_lock = threading.Lock()
+
+
+def _create_feed(gym_id, **kwargs):
+    feed = ScoreFeed(gym_id, **kwargs)
+    get_log_store(gym_id).add_listener(feed.notify)
+    atexit.register(feed.close)
+    return feed
+
+
+def init_score_feeds(app):
+    """
+    Create a score feed for each site, attached to the site's log store.
+
+    Returns:
+        dict: {gym_id: ScoreFeed}
+    """
+    global _feeds
+
+    feeds = {
+        gym_id: _create_feed(
+            gym_id,
+            interval=app.config['SCORE_STREAM_INTERVAL'],
+            max_subscribers=app.config['SCORE_STREAM_MAX_SUBSCRIBERS'],
+            dumps=app.json.dumps,
+        )
+        for gym_id in get_sites()
+    }
+    with _feed_lock:
+        _feeds = feeds
+    app.extensions['score_feeds'] = feeds
+    return feeds
+
+
+def get_score_feed(gym_id=None):
+    """
+    Get a site's score feed, creating it on first use outside of create_app.
+
+    Args:
+        gym_id (str): Site id, or None for the default site
+
+    Raises:
+        UnknownGymError: If this process doesn't serve the site
+    """
+    site = get_site(gym_id)
+    feed = _feeds.get(site.gym_id)
+    if feed is None:
+        with _feed_lock:
+            feed = _feeds.get(site.gym_id)
+            if feed is None:
+                feed = _feeds[site.gym_id] = _create_feed(site.gym_id)
+    return feed
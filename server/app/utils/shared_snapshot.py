@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from app.utils.compact_logs import OFFSETS_FILENAME, TIMESTAMPS_FILENAME, UIDS_FILENAME, CompactLogs, load_compact
+from app.utils.metrics import stage_timer
+
+try:
+    import fcntl
+except ImportError:  # Windows: no publisher election, run a single worker
+    fcntl = None
+
+CURRENT_FILENAME = 'CURRENT'
+LOCK_FILENAME = 'publisher.lock'
+META_FILENAME = 'meta.json'
+
+
+def _map(path, dtype, count):
+    # np.memmap can't map an empty file
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def current_signature(snapshot_dir):
+    """
+    Get a cheap fingerprint of the published snapshot pointer.
+
+    Raises:
+        FileNotFoundError: If nothing has been published yet
+    """
+    stat = os.stat(os.path.join(snapshot_dir, CURRENT_FILENAME))
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class SharedSnapshot(CompactLogs):
+    """
+    An immutable, published version of the logs, memory-mapped read-only.
+
+    Layout of a version directory (the CompactLogs arrays plus metadata):
+        meta.json      Row/user counts, UID width and the source size it was built from
+        uids.bin       Sorted UIDs as fixed-width ASCII
+        offsets.i64    Row offset of each UID's first swipe (plus the total), int64
+        ts.i64         Swipe times as int64 epoch seconds, grouped by UID
+
+    Every worker maps the same files, so the pages live once in the page cache
+    instead of once per process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILENAME)) as f:
+            self.meta = json.load(f)
+
+        users = self.meta["users"]
+        super().__init__(
+            _map(os.path.join(path, UIDS_FILENAME), f'S{self.meta["uid_width"]}', users),
+            _map(os.path.join(path, OFFSETS_FILENAME), '<i8', users + 1) if users else np.zeros(1, dtype='<i8'),
+            _map(os.path.join(path, TIMESTAMPS_FILENAME), '<i8', self.meta["rows"]),
+        )
+
+    @classmethod
+    def attach(cls, snapshot_dir):
+        """
+        Map the currently published version.
+
+        Raises:
+            FileNotFoundError: If nothing has been published yet
+        """
+        with open(os.path.join(snapshot_dir, CURRENT_FILENAME)) as f:
+            name = f.read().strip()
+        return cls(os.path.join(snapshot_dir, name))
+
+    @property
+    def source_size(self):
+        return self.meta["source_size"]
+
+
+def publish_snapshot(source, snapshot_dir, keep=2):
+    """
+    Build a new snapshot version from a log source and make it current.
+
+    The version is written to a temp directory, renamed into place, and then
+    the CURRENT pointer is atomically replaced, so readers only ever see
+    complete versions. Older versions beyond `keep` are deleted; workers still
+    mapping them keep reading the unlinked files until they re-attach.
+
+    Returns:
+        str: Name of the published version
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # The signature is read before the load, so a swipe racing with it is at
+    # worst counted twice until the next publish, never dropped
+    source_signature = source.signature()
+    with stage_timer('snapshot_load'):
+        logs = load_compact(source)
+
+    with stage_timer('snapshot_publish'):
+        versions = sorted(name for name in os.listdir(snapshot_dir) if name.startswith('v'))
+        name = f'v{int(versions[-1][1:]) + 1 if versions else 1:010d}'
+
+        tmp_dir = tempfile.mkdtemp(dir=snapshot_dir, prefix='.tmp-')
+        try:
+            logs.write(tmp_dir)
+            with open(os.path.join(tmp_dir, META_FILENAME), 'w') as f:
+                json.dump({
+                    "rows": len(logs),
+                    "users": len(logs.uids),
+                    "uid_width": logs.uids.dtype.itemsize,
+                    "source_signature": list(source_signature),
+                    # Every source signature ends with the log's size in bytes
+                    "source_size": source_signature[-1],
+                    "created_at": time.time(),
+                }, f)
+            os.chmod(tmp_dir, 0o755)
+            os.rename(tmp_dir, os.path.join(snapshot_dir, name))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        fd, tmp_pointer = tempfile.mkstemp(dir=snapshot_dir, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(name + '\n')
+        os.chmod(tmp_pointer, 0o644)
+        os.replace(tmp_pointer, os.path.join(snapshot_dir, CURRENT_FILENAME))
+
+    for old in (versions + [name])[:-keep]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+    return name
+
+
+class SnapshotPublisher:
+    """
+    Republishes the shared snapshot whenever the log changes.
+
+    Every worker runs one, but only the process holding the publisher lock
+    (an exclusive flock in the snapshot directory) publishes; if it exits, the
+    lock is released and another worker takes over on its next poll.
+    """
+
+    def __init__(self, source, snapshot_dir, interval=1.0):
+        self.source = source
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self._lock_file = None
+        self._published_signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _acquire(self):
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return True
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.snapshot_dir, LOCK_FILENAME), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def poll(self):
+        """
+        Publish a new version if this process is the publisher and the log changed.
+
+        Returns:
+            bool: True if a version was published
+        """
+        if not self._acquire():
+            return False
+        if self._published_signature is None:
+            # A previous publisher may already have published the current log
+            self._published_signature = self._current_source_signature()
+        try:
+            signature = self.source.signature()
+        except FileNotFoundError:
+            return False
+        if signature == self._published_signature:
+            return False
+
+        publish_snapshot(self.source, self.snapshot_dir)
+        self._published_signature = signature
+        return True
+
+    def _current_source_signature(self):
+        try:
+            snapshot = SharedSnapshot.attach(self.snapshot_dir)
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+        return tuple(snapshot.meta.get("source_signature", ()))
+
+    def start(self):
+        """
+        Publish once right away (if elected), then keep polling in the background.
+        """
+        try:
+            self.poll()
+        except Exception as e:
+            print(f"Snapshot publish error: {e}")
+
+        self._thread = threading.Thread(target=self._run, name='snapshot-publisher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Snapshot publish error: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,140 @@
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from app.utils.log_sources import log_suffix, resolve_log_path
+from app.utils.model_registry import MODELS_DIR
+
+# Site of the single-gym layout (RFID_LOG_PATH and app/models)
+DEFAULT_GYM_ID = 'default'
+GYM_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+GymSite = namedtuple('GymSite', ['gym_id', 'log_path', 'models_dir', 'snapshot_dir'])
+
+
+class UnknownGymError(KeyError):
+    """
+    Raised for a gym_id this worker doesn't serve.
+    """
+
+    def __init__(self, gym_id):
+        super().__init__(gym_id)
+        self.gym_id = gym_id
+
+    def __str__(self):
+        if self.gym_id is None:
+            return "gym_id is required"
+        return f"Unknown gym: {self.gym_id}"
+
+
+def discover_gym_ids(data_dir, backend='csv'):
+    """
+    Find the sites with a log of the given backend in a data directory (e.g. <gym_id>.csv).
+    """
+    suffix = log_suffix(backend)
+    gym_ids = set()
+    for entry in os.scandir(data_dir):
+        name, extension = os.path.splitext(entry.name)
+        if extension == suffix and GYM_ID_PATTERN.match(name):
+            gym_ids.add(name)
+    return sorted(gym_ids)
+
+
+def site_log_path(data_dir, gym_id, backend='csv'):
+    """
+    Get a site's log in a data directory: <gym_id> plus the backend's suffix.
+    """
+    return os.path.join(data_dir, gym_id + log_suffix(backend))
+
+
+def configure_sites(config):
+    """
+    Work out which sites this process serves and where each one's data lives.
+
+    Without GYM_DATA_DIR there is one site (DEFAULT_GYM_ID) using RFID_LOG_PATH and
+    app/models. With it, each site has its own log in GYM_DATA_DIR, its own model
+    artifacts in app/models/<gym_id> and its own shared snapshot directory; GYM_IDS
+    limits the process to a subset of them. RFID_LOG_BACKEND picks the log format
+    wherever a path isn't given explicitly.
+
+    Returns:
+        OrderedDict: {gym_id: GymSite}
+    """
+    data_dir = config.get('GYM_DATA_DIR')
+    snapshot_root = config.get('SHARED_SNAPSHOT_DIR')
+    backend = config.get('RFID_LOG_BACKEND') or 'csv'
+    if not data_dir:
+        site = GymSite(DEFAULT_GYM_ID, resolve_log_path(config.get('RFID_LOG_PATH'), backend), MODELS_DIR, snapshot_root)
+        return OrderedDict([(DEFAULT_GYM_ID, site)])
+
+    gym_ids = [gym_id.strip() for gym_id in (config.get('GYM_IDS') or '').split(',') if gym_id.strip()]
+    if not gym_ids:
+        gym_ids = discover_gym_ids(data_dir, backend) if os.path.isdir(data_dir) else []
+
+    sites = OrderedDict()
+    for gym_id in gym_ids:
+        if not GYM_ID_PATTERN.match(gym_id):
+            raise ValueError(f"Invalid gym id: {gym_id!r}")
+        sites[gym_id] = GymSite(
+            gym_id,
+            site_log_path(data_dir, gym_id, backend),
+            os.path.join(MODELS_DIR, gym_id),
+            os.path.join(snapshot_root, gym_id) if snapshot_root else None,
+        )
+    return sites
+
+
+_sites = None
+_default_gym_id = DEFAULT_GYM_ID
+_sites_lock = threading.Lock()
+
+
+def init_sites(app):
+    """
+    Configure the sites served by this process from the app config.
+    """
+    global _sites, _default_gym_id
+
+    sites = configure_sites(app.config)
+    default_gym_id = app.config.get('DEFAULT_GYM_ID')
+    if not default_gym_id:
+        # A worker serving a single site needs no gym_id on requests
+        default_gym_id = next(iter(sites)) if len(sites) == 1 else DEFAULT_GYM_ID
+
+    with _sites_lock:
+        _sites = sites
+        _default_gym_id = default_gym_id
+    app.extensions['gym_sites'] = sites
+    return sites
+
+
+def get_sites():
+    """
+    Get the sites served by this process, configuring the single default site on
+    first use outside of create_app.
+    """
+    global _sites
+
+    if _sites is None:
+        with _sites_lock:
+            if _sites is None:
+                _sites = configure_sites({})
+    return _sites
+
+
+def get_site(gym_id=None):
+    """
+    Look up a served site.
+
+    Args:
+        gym_id (str): Site id, or None for the default site
+
+    Raises:
+        UnknownGymError: If this process doesn't serve the site
+    """
+    sites = get_sites()
+    site = sites.get(gym_id or _default_gym_id)
+    if site is None:
+        raise UnknownGymError(gym_id)
+    return site
@@ -0,0 +1,232 @@
+import atexit
+import datetime
+import re
+import threading
+import time
+
+import pandas as pd
+
+from app.utils.log_sources import LOG_COLUMNS, normalize_logs
+from app.utils.log_store import get_log_store
+from app.utils.sites import get_site, get_sites
+
+UID_PATTERN = re.compile(r'^[0-9A-F]{8,20}$')
+
+
+def make_swipe_row(uid, timestamp=None):
+    """
+    Build a log row for a swipe, deriving the Month/Week/Day columns server-side.
+
+    Args:
+        uid (str): RFID UID in hex (spaces and colons are ignored)
+        timestamp (str or datetime): When the card was swiped (defaults to now)
+
+    Returns:
+        list: [Month, Week, Day, Date, Time, UID]
+
+    Raises:
+        ValueError: If the UID or timestamp is invalid
+    """
+    if not isinstance(uid, str):
+        raise ValueError("UID is required")
+    uid = re.sub(r'[\s:]', '', uid).upper()
+    if not UID_PATTERN.match(uid):
+        raise ValueError(f"Invalid RFID UID: {uid!r}")
+
+    if timestamp is None:
+        timestamp = datetime.datetime.now()
+    elif isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    elif not isinstance(timestamp, datetime.datetime):
+        raise ValueError(f"Invalid timestamp: {timestamp!r}")
+
+    if timestamp.tzinfo is not None:
+        # The log stores local wall-clock time
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+
+    return [
+        timestamp.strftime('%B'),
+        timestamp.strftime('%U'),  # Week number of the year
+        timestamp.strftime('%A'),
+        timestamp.strftime('%Y-%m-%d'),
+        timestamp.strftime('%H:%M:%S'),
+        uid,
+    ]
+
+
+class _PendingSwipes:
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.error = None
+
+
+class SwipeWriter:
+    """
+    Buffers swipes and appends them to the log in group commits.
+
+    Swipes submitted while a commit is in flight, or within commit_interval of the
+    first pending swipe, are written together with a single append. The log is
+    fsynced at most every fsync_interval seconds (0 = after every commit), and each
+    commit is handed to the log store (if any) so readers see it without a reload.
+    """
+
+    def __init__(self, source, store=None, commit_interval=0.05, fsync_interval=1.0):
+        self.source = source
+        self.store = store
+        self.commit_interval = commit_interval
+        self.fsync_interval = fsync_interval
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def submit(self, rows, wait=True, timeout=None):
+        """
+        Queue swipes for the next group commit.
+
+        Args:
+            rows (list): Rows from make_swipe_row
+            wait (bool): Block until the rows are written to the log
+            timeout (float): Max seconds to wait
+
+        Returns:
+            bool: True if the rows were committed (always False with wait=False)
+        """
+        pending = _PendingSwipes(rows)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Swipe writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='swipe-writer', daemon=True)
+                self._thread.start()
+            self._pending.append(pending)
+            self._cond.notify()
+
+        if not wait:
+            return False
+        if not pending.done.wait(timeout):
+            return False
+        if pending.error is not None:
+            raise pending.error
+        return True
+
+    def close(self):
+        """
+        Commit anything still buffered, fsync and stop the writer thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    # Sync a dirty file once the fsync interval elapses, even if no more swipes arrive
+                    timeout = None
+                    if self._dirty:
+                        timeout = max(0, self._last_fsync + self.fsync_interval - time.monotonic())
+                    if not self._cond.wait(timeout) and self._dirty:
+                        self._fsync()
+
+                if not self._pending and self._closed:
+                    if self._dirty:
+                        self._fsync()
+                    return
+
+            # Let concurrent swipes join this group
+            if self.commit_interval and not self._closed:
+                time.sleep(self.commit_interval)
+
+            with self._cond:
+                batch, self._pending = self._pending, []
+
+            try:
+                self._commit([row for pending in batch for row in pending.rows])
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+
+    def _commit(self, rows):
+        if not rows:
+            return
+
+        if self.store is not None:
+            try:
+                # Pick up any external changes before our own write moves the signature
+                self.store.refresh()
+            except FileNotFoundError:
+                pass
+
+        self.source.append(rows)
+        self._dirty = True
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+        if self.store is not None:
+            self.store.append(normalize_logs(pd.DataFrame(rows, columns=LOG_COLUMNS)), self.source.signature())
+
+    def _fsync(self):
+        self.source.fsync()
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+
+_writers = {}
+_writer_lock = threading.Lock()
+
+
+def init_swipe_writer(app):
+    """
+    Create a swipe writer for each site's log store.
+
+    Returns:
+        dict: {gym_id: SwipeWriter}
+    """
+    global _writers
+
+    writers = {}
+    for gym_id in get_sites():
+        store = get_log_store(gym_id)
+        writer = SwipeWriter(
+            store.source,
+            store,
+            commit_interval=app.config['SWIPE_COMMIT_INTERVAL'],
+            fsync_interval=app.config['SWIPE_FSYNC_INTERVAL'],
+        )
+        atexit.register(writer.close)
+        writers[gym_id] = writer
+
+    with _writer_lock:
+        _writers = writers
+    app.extensions['swipe_writers'] = writers
+    return writers
+
+
+def get_swipe_writer(gym_id=None):
+    """
+    Get a site's swipe writer, creating it on first use outside of create_app.
+
+    Args:
+        gym_id (str): Site id, or None for the default site
+
+    Raises:
+        UnknownGymError: If this process doesn't serve the site
+    """
+    site = get_site(gym_id)
+    writer = _writers.get(site.gym_id)
+    if writer is None:
+        with _writer_lock:
+            writer = _writers.get(site.gym_id)
+            if writer is None:
+                store = get_log_store(site.gym_id)
+                writer = _writers[site.gym_id] = SwipeWriter(store.source, store)
+                atexit.register(writer.close)
+    return writer
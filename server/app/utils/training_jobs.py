@@ -0,0 +1,201 @@
+import datetime
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils.features import get_session_window, set_session_window
+from app.utils.metrics import TRAINING_JOBS_TOTAL, TRAINING_STAGE_SECONDS
+from app.utils.model_registry import get_model_registry
+
+
+def _run_training_job(job_id, log_path, models_dir, progress, memory_mb=0, session_window=None):
+    """
+    Entry point of a training job inside a worker process.
+    """
+    from app.utils.chunked_training import train_models_chunked
+    from app.utils.gym_utils import train_models_from_data
+    from app.utils.log_sources import open_log_source
+    from app.utils.log_store import open_log_store
+    from app.utils.model_registry import ModelRegistry
+
+    started_at = time.time()
+
+    def report(stage):
+        progress[job_id] = {"stage": stage, "started_at": started_at}
+
+    report('starting')
+    if session_window is not None:
+        # Spawned workers don't see the server's configuration
+        set_session_window(session_window)
+    registry = ModelRegistry(models_dir)
+    if memory_mb:
+        return train_models_chunked(open_log_source(log_path), memory_mb, progress=report, registry=registry)
+    return train_models_from_data(store=open_log_store(log_path), progress=report, registry=registry)
+
+
+def _timestamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds).isoformat(timespec='seconds') if seconds else None
+
+
+class TrainingJobs:
+    """
+    Runs model training in a background process pool and tracks job status.
+
+    Training never ties up a request thread; the registry picks up the new
+    artifacts (written atomically by ModelRegistry.save) as soon as a job finishes.
+    """
+
+    def __init__(self, max_workers=1, max_history=50, memory_mb=0):
+        self.max_workers = max_workers
+        self.memory_mb = memory_mb
+        self.max_history = max_history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._progress = None
+
+    def _ensure_pool(self):
+        if self._executor is None:
+            # Spawn rather than fork: the server process runs background threads
+            context = multiprocessing.get_context('spawn')
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def submit(self, site):
+        """
+        Queue a training job for one site; other sites' models are left alone.
+
+        Args:
+            site (GymSite): Site whose log to train on and whose models to replace
+
+        Returns:
+            dict: The job's status
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._ensure_pool()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "gym_id": site.gym_id,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "result": None,
+            }
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+            try:
+                future = self._executor.submit(
+                    _run_training_job, job_id, site.log_path, site.models_dir, self._progress, self.memory_mb,
+                    get_session_window()
+                )
+            except Exception:
+                # A broken pool is rebuilt on the next submission
+                self._executor = None
+                del self._jobs[job_id]
+                raise
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return self.get(job_id)
+
+    def _finish(self, job_id, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"error": str(e)}
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["status"] = "failed" if "error" in result else "succeeded"
+                job["finished_at"] = time.time()
+                job["result"] = result
+                gym_id = job["gym_id"]
+
+        # Training ran in another process, so its stage timings are exported from here
+        TRAINING_JOBS_TOTAL.inc(status="failed" if "error" in result else "succeeded")
+        for stage, seconds in (result.get("timings") or {}).items():
+            TRAINING_STAGE_SECONDS.observe(seconds, stage=stage)
+
+        if "error" not in result and job is not None:
+            # Swap the new models in for this process right away
+            get_model_registry(gym_id).get()
+
+    def get(self, job_id):
+        """
+        Get a job's status, progress and timing.
+
+        Returns:
+            dict: Job status, or None for an unknown job id
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+
+        progress = self._progress.get(job_id) if self._progress is not None else None
+        if progress is not None and job["status"] == "queued":
+            job["status"] = "running"
+
+        result = job.pop("result") or {}
+        started_at = progress["started_at"] if progress else None
+        finished_at = job["finished_at"] or time.time()
+        return {
+            "job_id": job_id,
+            "gym_id": job["gym_id"],
+            "status": job["status"],
+            "stage": progress["stage"] if progress and job["status"] == "running" else None,
+            "submitted_at": _timestamp(job["submitted_at"]),
+            "started_at": _timestamp(started_at),
+            "finished_at": _timestamp(job["finished_at"]),
+            "queued_seconds": round((started_at or finished_at) - job["submitted_at"], 3),
+            "run_seconds": round(finished_at - started_at, 3) if started_at else None,
+            "dataset": result.get("dataset"),
+            "timings": result.get("timings"),
+            "model_version": result.get("model_version"),
+            "error": result.get("error"),
+        }
+
+    def list(self):
+        """
+        Get the status of recent jobs, newest first.
+        """
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [job for job in (self.get(job_id) for job_id in reversed(job_ids)) if job is not None]
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def init_training_jobs(app):
+    """
+    Create the shared training job runner with the app's configured pool size.
+    """
+    global _jobs
+
+    jobs = TrainingJobs(max_workers=app.config['TRAINING_WORKERS'], memory_mb=app.config['TRAINING_MEMORY_MB'])
+    with _jobs_lock:
+        _jobs = jobs
+    app.extensions['training_jobs'] = jobs
+    return jobs
+
+
+def get_training_jobs():
+    """
+    Get the process-wide training job runner, creating it on first use outside of create_app.
+    """
+    global _jobs
+
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = TrainingJobs()
+    return _jobs
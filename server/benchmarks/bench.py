@@ -0,0 +1,337 @@
+"""
+Benchmarks for the scoring, listing and training paths at 1k, 100k and 10M swipes.
+
+Run from the server directory:
+    python -m benchmarks.bench run --output before.json
+    python -m benchmarks.bench run --output after.json --baseline before.json
+    python -m benchmarks.bench compare before.json after.json
+
+Datasets are generated once per seed and cached in benchmarks/data.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(SERVER_DIR, 'benchmarks', 'data')
+GENERATOR = os.path.join(SERVER_DIR, 'generate_rfid_data.py')
+
+# Target swipe counts per scale; the generator averages ~250 swipes per member per year
+SCALES = {'1k': 1_000, '100k': 100_000, '10m': 10_000_000}
+SWIPES_PER_USER = 250
+DATASET_START = '2024-01-01'
+DATASET_END = '2024-12-31'
+
+# Metrics compared between runs (bigger is worse); max_ms and rss_growth_mb are too noisy to gate on
+COMPARED_METRICS = ('mean_ms', 'p50_ms', 'p95_ms', 'startup_seconds', 'wall_seconds', 'peak_rss_mb')
+
+
+def dataset_path(scale, seed, log_format):
+    suffix = '.store' if log_format == 'store' else '.csv'
+    return os.path.join(DATA_DIR, f'rfid_{scale}_seed{seed}{suffix}')
+
+
+def ensure_dataset(scale, seed, log_format):
+    """
+    Generate a fixed-seed dataset for a scale unless it's already cached in benchmarks/data.
+
+    Returns:
+        str: Path of the dataset
+    """
+    path = dataset_path(scale, seed, log_format)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        users = max(1, round(SCALES[scale] / SWIPES_PER_USER))
+        subprocess.run([
+            sys.executable, GENERATOR,
+            '--users', str(users), '--start', DATASET_START, '--end', DATASET_END,
+            '--seed', str(seed), '--format', log_format, '--output', path,
+        ], check=True, cwd=SERVER_DIR)
+    return path
+
+
+def summarize(samples):
+    """
+    Summarize latency samples (seconds) in milliseconds.
+    """
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        "runs": len(samples_ms),
+        "mean_ms": round(float(samples_ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 4),
+        "max_ms": round(float(samples_ms.max()), 4),
+    }
+
+
+def time_calls(fn, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_serving(path, repeat, sample_users, seed):
+    """
+    Benchmark single-UID scoring and /available-rfids against one dataset.
+    """
+    from app import create_app
+    from app.utils.gym_utils import calculate_consistency_score
+    from app.utils.log_store import get_log_store
+    from app.utils.score_cache import init_score_cache
+
+    started = time.perf_counter()
+    # Score cache off, so every call does the full feature + model work
+    app = create_app({'RFID_LOG_PATH': path, 'SCORE_CACHE_SIZE': 0})
+    startup_seconds = time.perf_counter() - started
+
+    uid_counts = get_log_store().uid_counts()
+    rng = np.random.default_rng(seed)
+    uids = rng.choice(sorted(uid_counts), size=min(sample_users, len(uid_counts)), replace=False).tolist()
+    calls = [(uid,) for _ in range(repeat) for uid in uids]
+
+    with app.app_context():
+        # Warm up lazy model loading before timing
+        calculate_consistency_score(uids[0])
+        uncached = summarize(time_calls(calculate_consistency_score, calls))
+
+        app.config['SCORE_CACHE_SIZE'] = 4096
+        init_score_cache(app)
+        for uid in uids:
+            calculate_consistency_score(uid)
+        cached = summarize(time_calls(calculate_consistency_score, calls))
+
+    client = app.test_client()
+
+    def list_rfids():
+        response = client.get('/gym/v1/available-rfids')
+        assert response.status_code == 200, response.status_code
+        return response.get_data()
+
+    body = list_rfids()
+    available_rfids = summarize(time_calls(list_rfids, [()] * repeat))
+    available_rfids["response_bytes"] = len(body)
+
+    return {
+        "startup_seconds": round(startup_seconds, 4),
+        "users": len(uid_counts),
+        "score": {"uncached": uncached, "cached": cached, "sampled_users": len(uids)},
+        "available_rfids": available_rfids,
+    }
+
+
+def _memory_mb(field):
+    """
+    Read VmRSS or VmHWM (peak RSS) of this process in MiB.
+
+    ru_maxrss would carry over the parent's peak through fork+exec, so /proc is
+    preferred; other platforms fall back to ru_maxrss.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _train_in_child(path, memory_mb=0):
+    # Runs in a fresh process so peak RSS reflects this training run alone
+    from app.utils.chunked_training import train_models_chunked
+    from app.utils.gym_utils import train_models_from_data
+    from app.utils.log_sources import open_log_source
+    from app.utils.log_store import RFIDLogStore
+    from app.utils.model_registry import ModelRegistry
+
+    baseline_mb = _memory_mb('VmRSS')
+    with tempfile.TemporaryDirectory() as models_dir:
+        started = time.perf_counter()
+        if memory_mb:
+            result = train_models_chunked(open_log_source(path), memory_mb, registry=ModelRegistry(models_dir))
+        else:
+            result = train_models_from_data(store=RFIDLogStore(path), registry=ModelRegistry(models_dir))
+        wall_seconds = time.perf_counter() - started
+
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    peak_mb = _memory_mb('VmHWM')
+    return {
+        "wall_seconds": round(wall_seconds, 4),
+        "peak_rss_mb": round(peak_mb, 1),
+        "rss_growth_mb": round(peak_mb - baseline_mb, 1),
+        "dataset": result["dataset"],
+        "stage_seconds": result["timings"],
+    }
+
+
+def bench_training(path, memory_mb=0):
+    """
+    Benchmark training wall time and peak memory in a fresh process.
+
+    Uses chunked training under memory_mb if set, else train_models_from_data.
+    Models are written to a temp directory, never over app/models.
+    """
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(_train_in_child, (path, memory_mb))
+
+
+def environment():
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def run(args):
+    results = {
+        "created_at": datetime.datetime.now().isoformat(timespec='seconds'),
+        "environment": environment(),
+        "config": {
+            "seed": args.seed, "format": args.format, "repeat": args.repeat, "sample_users": args.sample_users,
+            "training_memory_mb": args.training_memory_mb,
+        },
+        "scales": {},
+    }
+
+    for scale in args.scales:
+        path = ensure_dataset(scale, args.seed, args.format)
+        print(f"[{scale}] benchmarking {path}", file=sys.stderr)
+        scale_results = bench_serving(path, args.repeat, args.sample_users, args.seed)
+        if not args.skip_training:
+            scale_results["training"] = bench_training(path, args.training_memory_mb)
+        results["scales"][scale] = scale_results
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            return report(compare(json.load(f), results, args.threshold))
+    return 0
+
+
+def flatten(results, prefix=''):
+    """
+    Flatten nested results into {"10m.score.uncached.p50_ms": value, ...}.
+    """
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare the timing and memory metrics of two result files.
+
+    Args:
+        baseline (dict): Earlier results
+        current (dict): New results
+        threshold (float): Relative slowdown that counts as a regression (0.1 = 10%)
+
+    Returns:
+        list: (metric, baseline value, current value, relative change, regressed) per shared metric
+    """
+    old = flatten(baseline["scales"])
+    new = flatten(current["scales"])
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        if metric.rsplit('.', 1)[-1] not in COMPARED_METRICS or not old[metric]:
+            continue
+        change = (new[metric] - old[metric]) / old[metric]
+        rows.append((metric, old[metric], new[metric], change, change > threshold))
+    return rows
+
+
+def report(rows):
+    """
+    Print a comparison table.
+
+    Returns:
+        int: Exit status, 1 if any metric regressed
+    """
+    width = max((len(row[0]) for row in rows), default=6)
+    print(f"\n{'metric':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>8}", file=sys.stderr)
+    for metric, old, new, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{metric:<{width}}  {old:>12.4f}  {new:>12.4f}  {change:>+8.1%}{flag}", file=sys.stderr)
+
+    regressions = sum(row[4] for row in rows)
+    print(f"\n{regressions} regression(s) in {len(rows)} compared metrics", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring, listing and training at several data scales")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run the benchmarks and write results as JSON")
+    run_parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES), help="Dataset sizes (swipes)")
+    run_parser.add_argument('--seed', type=int, default=42, help="Dataset seed")
+    run_parser.add_argument('--format', choices=['csv', 'store'], default='csv', help="Log format to benchmark")
+    run_parser.add_argument('--repeat', type=int, default=20, help="Timed calls per sampled UID / listing")
+    run_parser.add_argument('--sample-users', type=int, default=10, help="UIDs scored per dataset")
+    run_parser.add_argument('--skip-training', action='store_true', help="Only benchmark the serving paths")
+    run_parser.add_argument('--training-memory-mb', type=float, default=0, help="Benchmark chunked training under this memory budget")
+    run_parser.add_argument('--output', help="Write results to this JSON file")
+    run_parser.add_argument('--baseline', help="Compare against an earlier results file")
+    run_parser.add_argument('--threshold', type=float, default=0.1, help="Relative slowdown flagged as a regression")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare two results files")
+    compare_parser.add_argument('baseline', help="Earlier results")
+    compare_parser.add_argument('current', help="New results")
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="Relative slowdown flagged as a regression")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        sys.exit(run(args))
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    sys.exit(report(compare(baseline, current, args.threshold)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app.utils.compaction import compact_source
+from app.utils.log_sources import LOG_COLUMNS, CSVLogSource, SQLiteLogSource, normalize_logs, open_log_source, to_log_rows
+
+
+def import_csv(csv_path, store_path, chunk_size):
+    """
+    Convert RFID_logs.csv into a columnar store or SQLite database (picked by the
+    target's suffix), streaming the CSV in chunks.
+    """
+    if os.path.isfile(store_path) or (os.path.isdir(store_path) and os.listdir(store_path)):
+        sys.exit(f"{store_path} already exists and is not empty")
+
+    store = open_log_source(store_path)
+    if isinstance(store, CSVLogSource):
+        sys.exit(f"{store_path} must be a columnar store (*.store) or SQLite database (*.sqlite)")
+    total = 0
+    for chunk in pd.read_csv(csv_path, dtype={'Week': str, 'UID': str}, chunksize=chunk_size):
+        # Drop failed reads (swipes logged without a UID)
+        logs = normalize_logs(chunk.dropna(subset=['UID']))
+        store.append_arrays(
+            logs['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64),
+            logs['UID'].tolist(),
+        )
+        total += len(logs)
+    store.fsync()
+    print(f"Imported {total} swipes into {store_path}")
+
+
+def export_csv(store_path, csv_path):
+    """
+    Write a columnar store or SQLite database back out as a six-column CSV, in time order.
+    """
+    source = open_log_source(store_path)
+    logs = source.load()
+    if isinstance(source, SQLiteLogSource):
+        # Compacted days only kept swipes per hour; they're written out at the start of the hour
+        logs = pd.concat([source.load_summary_swipes(), logs], ignore_index=True)
+    logs = logs.sort_values('Timestamp', kind='mergesort')
+    to_log_rows(logs)[LOG_COLUMNS].to_csv(csv_path, index=False)
+    print(f"Exported {len(logs)} swipes to {csv_path}")
+
+
+def compact_db(db_path, retention_days):
+    """
+    Fold a SQLite database's swipes older than retention_days into daily summaries.
+    """
+    source = open_log_source(db_path)
+    if not isinstance(source, SQLiteLogSource):
+        sys.exit(f"{db_path} must be a SQLite database (*.sqlite)")
+    compacted = compact_source(source, retention_days)
+    print(f"Compacted {compacted} swipes in {db_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert RFID logs between CSV and the columnar store or SQLite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="CSV -> columnar store or SQLite")
+    import_parser.add_argument('csv_path', help="Source CSV (e.g. RFID_logs.csv)")
+    import_parser.add_argument('store_path', help="Target store directory or database (e.g. RFID_logs.store, RFID_logs.sqlite)")
+    import_parser.add_argument('--chunk-size', type=int, default=1_000_000, help="CSV rows per chunk")
+
+    export_parser = subparsers.add_parser('export', help="columnar store or SQLite -> CSV")
+    export_parser.add_argument('store_path', help="Source store directory or database")
+    export_parser.add_argument('csv_path', help="Target CSV")
+
+    compact_parser = subparsers.add_parser('compact', help="fold old swipes in SQLite into daily summaries")
+    compact_parser.add_argument('db_path', help="SQLite database (e.g. RFID_logs.sqlite)")
+    compact_parser.add_argument('--retention-days', type=int, required=True, help="Days of raw swipes to keep before today")
+
+    args = parser.parse_args()
+    if args.command == 'import':
+        import_csv(args.csv_path, args.store_path, args.chunk_size)
+    elif args.command == 'compact':
+        compact_db(args.db_path, args.retention_days)
+    else:
+        export_csv(args.store_path, args.csv_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,119 +1,171 @@
-import csv
-import random
+import argparse
 import datetime
+import multiprocessing
+import os
+import shutil
+import sys
+import time
 
-# Define UIDs for several users
-uids = [
-    "AA6A06B0",  # Existing user ID
-    "23FF6AAD",  # Existing user ID
-    "5F9E2C14",
-    "B7D8A621",
-    "3C41E9F5",
-    "76A2D0BE",
-    "9F83C475",
-    "12E5B94D"
-]
-
-# Define parameters for generating logs
-start_date = datetime.datetime(2025, 1, 1)  # Start from Jan 1, 2025
-end_date = datetime.datetime(2025, 4, 19)   # End at current date
-gym_open_hour = 6   # Gym opens at 6 AM
-gym_close_hour = 23 # Gym closes at 11 PM
-
-# Create user patterns (some users are morning people, some evening, some irregular)
-user_patterns = {
-    "AA6A06B0": {"frequency": 0.8, "morning": 0.7, "afternoon": 0.2, "evening": 0.1},  # Morning person, frequent
-    "23FF6AAD": {"frequency": 0.3, "morning": 0.1, "afternoon": 0.3, "evening": 0.6},  # Evening person, less frequent
-    "5F9E2C14": {"frequency": 0.6, "morning": 0.2, "afternoon": 0.6, "evening": 0.2},  # Afternoon person
-    "B7D8A621": {"frequency": 0.9, "morning": 0.4, "afternoon": 0.4, "evening": 0.2},  # Very frequent, varied times
-    "3C41E9F5": {"frequency": 0.2, "morning": 0.3, "afternoon": 0.3, "evening": 0.4},  # Infrequent
-    "76A2D0BE": {"frequency": 0.7, "morning": 0.1, "afternoon": 0.2, "evening": 0.7},  # Evening person, frequent
-    "9F83C475": {"frequency": 0.4, "morning": 0.5, "afternoon": 0.3, "evening": 0.2},  # Somewhat regular, morning
-    "12E5B94D": {"frequency": 0.5, "morning": 0.3, "afternoon": 0.4, "evening": 0.3}   # Average all around
-}
-
-# Generate logs
-logs = []
-
-# Add existing data from the file
-existing_logs = [
-    ["Month", "Week", "Day", "Date", "Time", "UID"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:10", "AA6A06B0"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:13", "23FF6AAD"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:15", "AA6A06B0"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:17", "AA6A06B0"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:19", "AA6A06B0"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:21", "23FF6AAD"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:24", "AA6A06B0"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:25", "AA6A06B0"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:27", "23FF6AAD"],
-    ["April", "15", "Saturday", "2025-04-19", "11:15:28", "23FF6AAD"]
-]
-
-logs.extend(existing_logs)
-
-# Generate new data
-current_date = start_date
-while current_date <= end_date:
-    # For each day
-    date_str = current_date.strftime("%Y-%m-%d")
-    day_name = current_date.strftime("%A")
-    month_name = current_date.strftime("%B")
-    week_num = current_date.strftime("%U")  # Week number of the year
-    
-    # For each user
-    for uid in uids:
-        pattern = user_patterns[uid]
-        
-        # Check if user visits the gym today based on their frequency
-        if random.random() < pattern["frequency"]:
-            # Determine what time of day they visit
-            time_of_day = random.choices(
-                ["morning", "afternoon", "evening"],
-                weights=[pattern["morning"], pattern["afternoon"], pattern["evening"]]
-            )[0]
-            
-            # Generate a time based on time of day
-            if time_of_day == "morning":
-                hour = random.randint(6, 11)
-            elif time_of_day == "afternoon":
-                hour = random.randint(12, 17)
-            else:  # evening
-                hour = random.randint(18, 22)
-                
-            minute = random.randint(0, 59)
-            second = random.randint(0, 59)
-            time_str = f"{hour:02d}:{minute:02d}:{second:02d}"
-            
-            # Add an entry for when they check in
-            logs.append([month_name, week_num, day_name, date_str, time_str, uid])
-            
-            # Sometimes add multiple swipes in succession (forgot something, etc.)
-            if random.random() < 0.3:
-                for _ in range(random.randint(1, 4)):
-                    # A few seconds later
-                    second = (second + random.randint(1, 10)) % 60
-                    time_str = f"{hour:02d}:{minute:02d}:{second:02d}"
-                    logs.append([month_name, week_num, day_name, date_str, time_str, uid])
-    
-    # Move to next day
-    current_date += datetime.timedelta(days=1)
-
-# Shuffle the non-header logs to make it more realistic
-header = logs[0]
-data = logs[1:]
-random.shuffle(data)
-logs = [header] + data
-
-# Ensure we have at least 500 entries by duplicating if needed
-while len(logs) < 500:
-    duplicate = random.choice(logs[1:])  # Skip header when choosing
-    logs.append(duplicate)
-
-# Write to CSV file
-with open('/home/navadeep/Documents/Projects/MPMC/server/RFID_logs.csv', 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    for row in logs:
-        writer.writerow(row)
-
-print(f"Generated {len(logs)} RFID log entries")
\ No newline at end of file
+import numpy as np
+import pandas as pd
+
+from app.utils.log_sources import COLUMNAR_SUFFIX, LOG_COLUMNS, ColumnarLogSource
+
+SECONDS_PER_DAY = 86400
+
+# Time-of-day windows: (first hour, number of hours) for morning, afternoon, evening
+TIME_OF_DAY_HOURS = np.array([[6, 6], [12, 6], [18, 5]])
+
+
+def make_uids(user_indices, seed):
+    """
+    Derive distinct 8-hex-digit UIDs for users.
+
+    Multiplying by an odd constant mod 2^32 is a bijection, so UIDs never collide
+    within a dataset and depend only on the seed and the user's index.
+    """
+    codes = (user_indices.astype(np.uint64) * 0x9E3779B1 + seed * 0x85EBCA77 + 0x2545F491) & 0xFFFFFFFF
+    return np.array([f"{code:08X}" for code in codes.tolist()], dtype=str)
+
+
+def generate_chunk(args):
+    """
+    Generate every swipe of a contiguous block of users.
+
+    Each chunk draws from its own RNG seeded by (seed, chunk index), so the output
+    is identical regardless of how many worker processes generate it.
+
+    Returns:
+        tuple: (epoch seconds, user indices) sorted by user, then time
+    """
+    seed, chunk_index, first_user, n_users, start_day, n_days = args
+    rng = np.random.default_rng([seed, chunk_index])
+
+    # Per-user behaviour profiles
+    frequency = rng.beta(2.0, 3.0, n_users)                         # share of days visited
+    weekday_weights = rng.dirichlet(np.full(7, 4.0), n_users) * 7   # preference per weekday
+    time_preferences = rng.dirichlet(np.ones(3), n_users)           # morning/afternoon/evening
+    burst_probability = rng.beta(3.0, 7.0, n_users)                 # chance of repeat taps
+
+    # Which days each user visits
+    day_of_week = (start_day + np.arange(n_days) + 3) % 7  # 1970-01-01 was a Thursday
+    visit_probability = np.minimum(1.0, frequency[:, None] * weekday_weights[:, day_of_week])
+    users, days = np.nonzero(rng.random((n_users, n_days)) < visit_probability)
+
+    # When during the day they check in
+    cumulative = np.cumsum(time_preferences[users], axis=1)
+    time_of_day = np.minimum((rng.random(len(users))[:, None] > cumulative).sum(axis=1), 2)
+    first_hour, n_hours = TIME_OF_DAY_HOURS[time_of_day].T
+    hours = first_hour + (rng.random(len(users)) * n_hours).astype(np.int64)
+    seconds = rng.integers(0, 3600, len(users))
+    timestamps = (start_day + days) * SECONDS_PER_DAY + hours * 3600 + seconds
+
+    # Sometimes add 1-4 swipes in succession a few seconds apart (forgot something, etc.)
+    repeats = np.where(rng.random(len(users)) < burst_probability[users], rng.integers(1, 5, len(users)), 0)
+    burst_source = np.repeat(np.arange(len(users)), repeats)
+    steps = rng.integers(1, 11, len(burst_source))
+    offsets = _grouped_cumsum(steps, repeats)
+
+    timestamps = np.concatenate([timestamps, timestamps[burst_source] + offsets])
+    users = np.concatenate([users, users[burst_source]]) + first_user
+
+    order = np.lexsort((timestamps, users))
+    return timestamps[order], users[order]
+
+
+def _grouped_cumsum(values, group_sizes):
+    # Running sum of values that restarts at every group boundary
+    totals = np.cumsum(values)
+    group_ends = np.cumsum(group_sizes)
+    group_starts = group_ends - group_sizes
+    nonempty = group_sizes > 0
+    before_group = np.zeros(len(group_sizes), dtype=totals.dtype)
+    before_group[nonempty] = totals[group_starts[nonempty]] - values[group_starts[nonempty]]
+    return totals - np.repeat(before_group, group_sizes)
+
+
+def format_chunk(args):
+    """
+    Generate a chunk and render it as CSV text in the RFID_logs.csv layout.
+    """
+    seed, _, _, _, start_day, n_days = args
+    timestamps, users = generate_chunk(args)
+
+    # Calendar strings only depend on the day, so build them once per day and index
+    dates = pd.to_datetime(np.arange(start_day, start_day + n_days + 1), unit='D')
+    day_index = timestamps // SECONDS_PER_DAY - start_day
+    second_of_day = timestamps % SECONDS_PER_DAY
+    times = np.array([f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60)])
+
+    unique_users, user_index = np.unique(users, return_inverse=True)
+    rows = pd.DataFrame({
+        'Month': dates.strftime('%B').to_numpy()[day_index],
+        'Week': dates.strftime('%U').to_numpy()[day_index],
+        'Day': dates.strftime('%A').to_numpy()[day_index],
+        'Date': dates.strftime('%Y-%m-%d').to_numpy()[day_index],
+        'Time': times[second_of_day],
+        'UID': make_uids(unique_users, seed)[user_index.reshape(-1)] if len(users) else np.array([], dtype=str),
+    })
+    return rows.to_csv(index=False, header=False), len(rows)
+
+
+def main():
+    default_output = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RFID_logs.csv')
+
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic RFID swipe log")
+    parser.add_argument('--users', type=int, default=8, help="Number of members")
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=datetime.date(2025, 1, 1), help="First day (YYYY-MM-DD)")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date(2025, 4, 19), help="Last day (YYYY-MM-DD)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed reproduces the same file")
+    parser.add_argument('--format', choices=['csv', 'store'], default='csv', help="CSV log or columnar store directory")
+    parser.add_argument('--output', default=default_output, help="Output path (a *.store directory for --format store)")
+    parser.add_argument('--chunk-users', type=int, default=2000, help="Members generated per chunk")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    args = parser.parse_args()
+
+    if args.end < args.start:
+        sys.exit("--end must not be before --start")
+
+    start_day = (args.start - datetime.date(1970, 1, 1)).days
+    n_days = (args.end - args.start).days + 1
+    chunks = [
+        (args.seed, index, first_user, min(args.chunk_users, args.users - first_user), start_day, n_days)
+        for index, first_user in enumerate(range(0, args.users, args.chunk_users))
+    ]
+
+    started = time.perf_counter()
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 and len(chunks) > 1 else None
+    map_chunks = pool.imap if pool is not None else map
+    total = 0
+
+    try:
+        if args.format == 'csv':
+            with open(args.output, 'w', newline='') as f:
+                f.write(','.join(LOG_COLUMNS) + '\n')
+                # imap keeps chunk order, so the file is the same for any worker count
+                for text, count in map_chunks(format_chunk, chunks):
+                    f.write(text)
+                    total += count
+        else:
+            if not args.output.endswith(COLUMNAR_SUFFIX):
+                sys.exit(f"Columnar store paths must end in {COLUMNAR_SUFFIX}")
+            if os.path.exists(args.output):
+                shutil.rmtree(args.output)
+
+            store = ColumnarLogSource(args.output)
+            # Intern every UID up front so a member's code is their index
+            store.intern_uids(make_uids(np.arange(args.users), args.seed))
+            for timestamps, users in map_chunks(generate_chunk, chunks):
+                store.append_codes(timestamps, users)
+                total += len(timestamps)
+            store.fsync()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(f"Generated {total} RFID log entries for {args.users} users in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
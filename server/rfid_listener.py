@@ -0,0 +1,68 @@
+import argparse
+import re
+import sys
+
+from app.utils.log_sources import open_log_source
+from app.utils.swipe_writer import SwipeWriter, make_swipe_row
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+
+def read_lines(args):
+    """
+    Yield raw lines from the serial port, or from stdin if no port is given.
+    """
+    if args.port:
+        if serial is None:
+            sys.exit("pyserial is required for serial mode: pip install pyserial")
+        with serial.Serial(args.port, args.baud, timeout=1) as port:
+            while True:
+                line = port.readline()
+                if line:
+                    yield line.decode('ascii', errors='ignore')
+    else:
+        yield from sys.stdin
+
+
+def parse_uid(line):
+    """
+    Extract the UID from a reader line such as "UID: AA 6A 06 B0" or "AA6A06B0".
+    """
+    line = re.sub(r'^\s*(card\s*)?uid\s*:?', '', line, flags=re.IGNORECASE)
+    return re.sub(r'[^0-9A-Fa-f]', '', line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log RFID swipes from a serial reader or stdin")
+    parser.add_argument('--port', help="Serial port of the reader (e.g. /dev/ttyUSB0); reads stdin if omitted")
+    parser.add_argument('--baud', type=int, default=9600, help="Serial baud rate")
+    parser.add_argument('--log', help="Path to the RFID log CSV, columnar store or SQLite database (defaults to server/RFID_logs.csv)")
+    parser.add_argument('--commit-interval', type=float, default=0.05, help="Seconds to group swipes into one append")
+    parser.add_argument('--fsync-interval', type=float, default=1.0, help="Max seconds between fsyncs (0 = every commit)")
+    args = parser.parse_args()
+
+    writer = SwipeWriter(open_log_source(args.log), commit_interval=args.commit_interval, fsync_interval=args.fsync_interval)
+    try:
+        for line in read_lines(args):
+            uid = parse_uid(line)
+            if not uid:
+                continue
+            try:
+                row = make_swipe_row(uid)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                continue
+            # Don't wait for the commit so bursts at the reader are grouped together
+            writer.submit([row], wait=False)
+            print(f"Logged {row[5]} at {row[3]} {row[4]}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    main()
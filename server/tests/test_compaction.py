@@ -0,0 +1,74 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.utils.compaction import compact_source
+from app.utils.features import build_feature_matrix
+from app.utils.log_sources import SQLiteLogSource
+from app.utils.log_store import open_log_store
+from app.utils.occupancy import PERIODS, OccupancyCubes
+from app.utils.training_jobs import _run_training_job
+
+TODAY = datetime.date(2024, 7, 1)
+
+
+def _write_log(path, members=40, days=180, seed=7):
+    # Two-tap visits (check-in, check-out) on random days over the half year before TODAY
+    rng = np.random.default_rng(seed)
+    start = int(datetime.datetime.combine(TODAY - datetime.timedelta(days=days), datetime.time()).timestamp())
+    timestamps, uids = [], []
+    for member in range(members):
+        uid = f'{member:08X}'
+        visit_days = np.sort(rng.choice(days, size=rng.integers(2, 60), replace=False))
+        arrivals = start + visit_days * 86400 + rng.integers(6 * 3600, 21 * 3600, size=len(visit_days))
+        for arrival in arrivals.tolist():
+            timestamps += [arrival, arrival + int(rng.integers(1800, 7200))]
+            uids += [uid, uid]
+    source = SQLiteLogSource(str(path))
+    source.append_arrays(timestamps, uids)
+    return source
+
+
+def _train(path, models_dir):
+    # The same entry point the training job pool runs, without chunking
+    result = _run_training_job('job', str(path), str(models_dir), {})
+    assert 'error' not in result, result
+    return result['dataset']
+
+
+def test_training_dataset_unchanged_by_compaction(tmp_path):
+    path = tmp_path / 'RFID_logs.sqlite'
+    source = _write_log(path)
+    before = _train(path, tmp_path / 'before')
+
+    assert compact_source(source, 30, today=TODAY) > 0
+    after = _train(path, tmp_path / 'after')
+
+    assert after['swipes'] == before['swipes']
+    assert after['users'] == before['users']
+    assert after['trained_users'] == before['trained_users']
+
+
+def _features_and_occupancy(path):
+    # Everything derived from the whole history: every member's features and the occupancy cubes
+    logs, summaries = open_log_store(str(path)).history()
+    return build_feature_matrix(logs, TODAY, summaries), OccupancyCubes.from_logs(logs, summaries)
+
+
+def test_features_and_occupancy_unchanged_by_compaction(tmp_path):
+    path = tmp_path / 'RFID_logs.sqlite'
+    source = _write_log(path)
+    features_before, occupancy_before = _features_and_occupancy(path)
+
+    assert compact_source(source, 30, today=TODAY) > 0
+    features_after, occupancy_after = _features_and_occupancy(path)
+
+    assert len(features_before) == 40
+    pd.testing.assert_frame_equal(features_after, features_before)
+
+    assert occupancy_after.hourly == occupancy_before.hourly
+    assert occupancy_after.weekday_hourly.tolist() == occupancy_before.weekday_hourly.tolist()
+    for period in PERIODS:
+        assert occupancy_after.members[period] == occupancy_before.members[period]
+    assert occupancy_after.span() == occupancy_before.span()
@@ -0,0 +1,19 @@
+import datetime
+import os
+
+from app.utils.feature_state import UserFeatureState
+from app.utils.features import build_feature_matrix
+from app.utils.log_sources import CSVLogSource
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'RFID_logs.csv')
+
+
+def test_features_match_feature_matrix():
+    logs = CSVLogSource(SAMPLE_LOG).load()
+    today = datetime.date(2025, 6, 1)
+    matrix = build_feature_matrix(logs, today)
+
+    for uid in matrix.index:
+        features = UserFeatureState.from_logs(uid, logs[logs['UID'] == uid]).features(today)
+        assert features == {column: matrix.at[uid, column].item() for column in matrix.columns}
+        assert all(type(value) is type(matrix.at[uid, column].item()) for column, value in features.items())
@@ -0,0 +1,73 @@
+import multiprocessing
+
+import pandas as pd
+
+from app.utils.log_sources import LOG_COLUMNS, ColumnarLogSource, CSVLogSource
+
+WRITERS = 4
+BATCHES = 20
+# Rows per append; larger than the write buffer, so one append takes several writes
+BATCH_ROWS = 500
+
+
+def _rows(writer):
+    return [['March', '11', 'Wednesday', '2025-03-19', '07:30:31', f'{writer:04X}{row:04X}'] for row in range(BATCH_ROWS)]
+
+
+def _append_batches(source, writer):
+    for _ in range(BATCHES):
+        source.append(_rows(writer))
+
+
+def _swipes(writer, batch):
+    # Each swipe's time encodes its writer, batch and row; its UID is shared by every writer
+    first = 1_700_000_000 + (writer * BATCHES + batch) * BATCH_ROWS
+    return list(range(first, first + BATCH_ROWS)), [f'{batch:04X}{row:04X}' for row in range(BATCH_ROWS)]
+
+
+def _append_swipes(source, writer):
+    for batch in range(BATCHES):
+        source.append_arrays(*_swipes(writer, batch))
+
+
+def _run_writers(source, target=_append_batches):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=target, args=(source, writer)) for writer in range(WRITERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+
+def test_csv_appends_from_several_processes_do_not_interleave(tmp_path):
+    path = tmp_path / 'RFID_logs.csv'
+    _run_writers(CSVLogSource(str(path)))
+
+    df = pd.read_csv(path, dtype=str)
+    assert list(df.columns) == LOG_COLUMNS
+    assert len(df) == WRITERS * BATCHES * BATCH_ROWS
+    # Every append's rows stay together and in order
+    expected = [f'{row:04X}' for row in range(BATCH_ROWS)]
+    for start in range(0, len(df), BATCH_ROWS):
+        batch = df['UID'].iloc[start:start + BATCH_ROWS]
+        assert batch.str[:4].nunique() == 1
+        assert batch.str[4:].tolist() == expected
+
+
+def test_columnar_appends_from_several_processes_agree_on_codes(tmp_path):
+    source = ColumnarLogSource(str(tmp_path / 'RFID_logs.store'))
+    _run_writers(source, _append_swipes)
+
+    uids = source.load_uids()
+    assert len(uids) == len(set(uids.tolist())) == BATCHES * BATCH_ROWS
+
+    timestamps, codes, uids = source.load_arrays()
+    loaded = sorted(zip(timestamps.tolist(), uids[codes].tolist()))
+    expected = sorted(
+        swipe
+        for writer in range(WRITERS)
+        for batch in range(BATCHES)
+        for swipe in zip(*_swipes(writer, batch))
+    )
+    assert loaded == expected
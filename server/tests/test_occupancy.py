@@ -0,0 +1,32 @@
+import pandas as pd
+
+from app.utils.occupancy import OccupancyCubes
+
+
+def _swipes(*rows):
+    return pd.DataFrame({
+        'UID': [uid for uid, _ in rows],
+        'Timestamp': pd.to_datetime([timestamp for _, timestamp in rows]),
+    })
+
+
+def _scanned_span(cubes):
+    return min(cubes.hourly) // 24, max(cubes.hourly) // 24
+
+
+def test_span_follows_appends():
+    logs = _swipes(('AAAA0001', '2024-03-10 08:15'), ('AAAA0002', '2024-03-12 19:40'))
+    cubes = OccupancyCubes.from_logs(logs)
+    assert cubes.span() == _scanned_span(cubes)
+
+    def user_history(uid):
+        return logs[logs['UID'] == uid], None
+
+    # A later swipe, then one back-dated before the first day
+    for timestamp in ('2024-04-02 07:05', '2024-02-28 18:30'):
+        cubes.add(_swipes(('AAAA0001', timestamp)), user_history)
+        assert cubes.span() == _scanned_span(cubes)
+
+
+def test_span_of_empty_cubes():
+    assert OccupancyCubes.from_logs(_swipes()).span() is None
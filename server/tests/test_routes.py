@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pytest
+
+from app import create_app
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'RFID_logs.csv')
+
+
+@pytest.fixture
+def client(tmp_path):
+    log_path = tmp_path / 'RFID_logs.csv'
+    shutil.copy(SAMPLE_LOG, log_path)
+    app = create_app({'RFID_LOG_PATH': str(log_path)})
+    return app.test_client()
+
+
+@pytest.mark.parametrize('body', [[1, 2], 'all', 3])
+def test_scores_rejects_non_object_body(client, body):
+    response = client.post('/gym/v1/scores', json=body)
+    assert response.status_code == 400
+    assert response.json == {"error": "Request body must be a JSON object"}
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/gym/v1/score', [1]),
+    ('/gym/v1/score', {"uid": "3C41E9F5", "gym_id": [1]}),
+    ('/gym/v1/scores', {"uids": "all", "gym_id": [1]}),
+    ('/gym/v1/scores', {"uids": "all", "gym_id": 7}),
+    ('/gym/v1/v1/train-models', [1]),
+    ('/gym/v1/v1/train-models', {"gym_id": {"a": 1}}),
+])
+def test_invalid_gym_id_or_body_is_a_bad_request(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_unknown_gym_id_is_not_found(client):
+    response = client.post('/gym/v1/scores', json={"uids": "all", "gym_id": "elsewhere"})
+    assert response.status_code == 404
+    assert response.json == {"error": "Unknown gym: elsewhere"}
+
+
+def test_leaderboard_scores_match_score(client):
+    members = client.get('/gym/v1/leaderboard?limit=1000').json['members']
+    assert members
+    for member in members:
+        assert client.post('/gym/v1/score', json={"uid": member['uid']}).json['score'] == member['score']